@@ -1,9 +1,10 @@
+import json
 from datetime import date, timedelta
 from os import getenv, path
 from pathlib import Path
 
 from dotenv import load_dotenv
-from loguru import logger
+from kombu import Exchange, Queue
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve(strict=True).parent.parent.parent
@@ -57,6 +58,8 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 
 MIDDLEWARE = [
+    "core_apps.common.middleware.TracingMiddleware",
+    "core_apps.common.middleware.RequestInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -155,6 +158,8 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AUTH_USER_MODEL = "user_auth.User"
 
+AUTHENTICATION_BACKENDS = ["core_apps.user_auth.backends.UserAuthBackend"]
+
 
 REST_FRAMEWORK = {"DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema"}
 
@@ -167,7 +172,7 @@ SPECTACULAR_SETTINGS = {
 }
 
 if USE_TZ:
-    CELERY_TIMEZONE = USE_TZ
+    CELERY_TIMEZONE = TIME_ZONE
 
 CELERY_BROKER_URL = getenv("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = getenv("CELERY_RESULT_BACKEND")
@@ -183,10 +188,279 @@ CELERY_TASK_SOFT_TIME_LIMIT = 5 * 60
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
 CELERY_WORKER_SEND_TASK_EVENTS = True
 
+# Queues by latency class, each drained by its own worker pool (see the
+# celeryworker services in local.yml), so a burst of batch work never delays
+# an OTP email whose code expires after OTP_EXPIRATION. Routes and
+# priorities (higher first, within a queue) are in core_apps.common.routing.
+CELERY_TASK_DEFAULT_QUEUE = "default"
+CELERY_TASK_QUEUES = [
+    Queue(name, Exchange(name), routing_key=name)
+    for name in ("auth_notifications", "bulk_notifications", "default", "batch")
+]
+CELERY_TASK_ROUTES = ["core_apps.common.routing.route_task"]
+CELERY_TASK_QUEUE_MAX_PRIORITY = 9
+
+# Query counting on admin changelists. "RAISE" turns an exceeded budget into
+# an error, which is what the test settings want.
+ADMIN_QUERY_BUDGETS = {
+    "ENABLED": getenv("ADMIN_QUERY_BUDGETS_ENABLED", getenv("DEBUG", "False"))
+    == "True",
+    "RAISE": getenv("ADMIN_QUERY_BUDGETS_RAISE", "False") == "True",
+    "CHANGELIST": int(getenv("ADMIN_CHANGELIST_QUERY_BUDGET", "20")),
+}
+
+# Query counting and timing per request. SAMPLE_RATE of requests are
+# measured, HEADERS adds X-DB-* headers to those responses and RAISE turns an
+# exceeded @query_budget into an error, which is what the test settings want.
+REQUEST_INSTRUMENTATION = {
+    "ENABLED": getenv("REQUEST_INSTRUMENTATION_ENABLED", "True") == "True",
+    "SAMPLE_RATE": float(getenv("REQUEST_INSTRUMENTATION_SAMPLE_RATE", "0.05")),
+    "HEADERS": getenv("REQUEST_INSTRUMENTATION_HEADERS", getenv("DEBUG", "False"))
+    == "True",
+    "RAISE": getenv("REQUEST_BUDGETS_RAISE", "False") == "True",
+}
+
+# Counters and histograms served on /metrics. Each process buffers its
+# samples and adds them to a Redis hash every FLUSH_INTERVAL seconds, so one
+# scrape covers every gunicorn and Celery worker. The scraper sends TOKEN
+# as a bearer token; without one the endpoint only exists with DEBUG on.
+METRICS = {
+    "BACKEND": getenv("METRICS_BACKEND", "redis"),
+    "FLUSH_INTERVAL": float(getenv("METRICS_FLUSH_INTERVAL", "5")),
+    "TOKEN": getenv("METRICS_TOKEN", ""),
+}
+
+# Spans for requests, Celery tasks, queries, storage and SMTP. SAMPLE_RATE of
+# the traces started here are recorded (an incoming traceparent header
+# decides for its own trace). "jsonl" appends them to JSONL_PATH, "otlp"
+# posts them to an OTLP/HTTP collector, e.g. `manage.py trace_collector`.
+TRACING = {
+    "ENABLED": getenv("TRACING_ENABLED", "True") == "True",
+    "SAMPLE_RATE": float(getenv("TRACING_SAMPLE_RATE", "0.01")),
+    "EXPORTER": getenv("TRACING_EXPORTER", "jsonl"),
+    "JSONL_PATH": LOGS_DIR / "traces.jsonl",
+    "OTLP_ENDPOINT": getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"),
+    "SERVICE_NAME": getenv("TRACING_SERVICE_NAME", "hober-bank"),
+    "FLUSH_INTERVAL": float(getenv("TRACING_FLUSH_INTERVAL", "2")),
+    "MAX_BUFFERED": int(getenv("TRACING_MAX_BUFFERED", "10000")),
+}
+
+# Changelists using keyset pagination show the planner's row estimate once
+# it passes this many rows instead of running COUNT(*).
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(
+    getenv("ADMIN_ESTIMATED_COUNT_THRESHOLD", "10000")
+)
+ADMIN_DATE_HIERARCHY_CACHE_TIMEOUT = int(
+    getenv("ADMIN_DATE_HIERARCHY_CACHE_TIMEOUT", "600")
+)
+
+REDIS_URL = getenv("REDIS_URL", "redis://redis:6379/0")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": REDIS_URL,
+        "KEY_PREFIX": "hober",
+    }
+}
+
+# "cached_db" reads sessions from the Redis cache above and writes through
+# to the database; "db" is Django's default, "cache" skips the table.
+SESSION_ENGINE = getenv("SESSION_ENGINE", "django.contrib.sessions.backends.cached_db")
+
+# Read-through cache for hot rows: a per-process LRU in front of Redis
+# ("local" keeps both tiers in-process, for tests). Entries are dropped when
+# their row is saved or deleted; L1 copies in other processes may lag by up
+# to L1_TIMEOUT seconds, which a namespace can lower (0 skips L1). A
+# namespace TIMEOUT of 0 disables it.
+TIERED_CACHE = {
+    "BACKEND": getenv("TIERED_CACHE_BACKEND", "redis"),
+    "L1_MAX_ENTRIES": int(getenv("TIERED_CACHE_L1_MAX_ENTRIES", "10000")),
+    "L1_TIMEOUT": int(getenv("TIERED_CACHE_L1_TIMEOUT", "5")),
+    "LOCK_TIMEOUT": int(getenv("TIERED_CACHE_LOCK_TIMEOUT", "5")),
+    "NAMESPACES": {
+        # A lock or password change has to reach every process at once, so
+        # resolved users are shared through L2 only.
+        "user": {
+            "TIMEOUT": int(getenv("AUTH_USER_CACHE_TIMEOUT", "60")),
+            "L1_TIMEOUT": int(getenv("AUTH_USER_CACHE_L1_TIMEOUT", "0")),
+        },
+        "party": {"TIMEOUT": 300},
+        "party_roles": {"TIMEOUT": 300},
+        "individual_profile": {"TIMEOUT": 300},
+    },
+}
+
+# Opt-in write buffering for ContentView.record_view. "local" keeps the buffer
+# in the web process and flushes it inline, "redis" shares it between
+# processes and leaves flushing to the beat task below. A Redis batch still
+# unacknowledged DRAIN_TIMEOUT seconds after it was drained is assumed lost
+# with its worker and merged back into the buffer.
+CONTENT_VIEW_BUFFER = {
+    "ENABLED": getenv("CONTENT_VIEW_BUFFER_ENABLED", "False") == "True",
+    "BACKEND": getenv("CONTENT_VIEW_BUFFER_BACKEND", "redis"),
+    "FLUSH_INTERVAL": int(getenv("CONTENT_VIEW_FLUSH_INTERVAL", "10")),
+    "MAX_SIZE": int(getenv("CONTENT_VIEW_BUFFER_SIZE", "1000")),
+    "DRAIN_TIMEOUT": int(getenv("CONTENT_VIEW_DRAIN_TIMEOUT", "300")),
+}
+
+# Pending one-time codes. "local" is an in-process stand-in for tests.
+OTP_STORE = {
+    "BACKEND": getenv("OTP_STORE_BACKEND", "redis"),
+}
+
+BANK_NAME = getenv("BANK_NAME", "")
+
+# Usernames are reserved from a database sequence this many at a time.
+USERNAME_BLOCK_SIZE = int(getenv("USERNAME_BLOCK_SIZE", "100"))
+
+# Sliding-window counters for failed logins, per user and per client IP.
+# Reaching the per-user limit locks the account for LOCKOUT_DURATION.
+LOGIN_THROTTLE = {
+    "BACKEND": getenv("LOGIN_THROTTLE_BACKEND", "redis"),
+    "WINDOW": timedelta(seconds=int(getenv("LOGIN_THROTTLE_WINDOW", "900"))),
+    "MAX_FAILURES_PER_USER": int(getenv("LOGIN_THROTTLE_MAX_PER_USER", "3")),
+    "MAX_FAILURES_PER_IP": int(getenv("LOGIN_THROTTLE_MAX_PER_IP", "20")),
+}
+
+# Argon2 runs on a bounded pool ("thread", "process" or "inline"). Each
+# secret type has its own cost profile; changing one rehashes stored values
+# on their next successful check. Logins the saturated pool turns away get
+# a 503 asking the client to retry after RETRY_AFTER seconds.
+HASHING = {
+    "EXECUTOR": getenv("HASHING_EXECUTOR", "thread"),
+    "MAX_WORKERS": int(getenv("HASHING_MAX_WORKERS", "4")),
+    "MAX_QUEUED": int(getenv("HASHING_MAX_QUEUED", "64")),
+    "TIMEOUT": float(getenv("HASHING_TIMEOUT", "10")),
+    "RETRY_AFTER": int(getenv("HASHING_RETRY_AFTER", "2")),
+    "PROFILES": {
+        "password": {
+            "time_cost": int(getenv("PASSWORD_HASH_TIME_COST", "2")),
+            "memory_cost": int(getenv("PASSWORD_HASH_MEMORY_COST", "102400")),
+            "parallelism": int(getenv("PASSWORD_HASH_PARALLELISM", "8")),
+        },
+        "security_answer": {
+            "time_cost": int(getenv("SECURITY_ANSWER_HASH_TIME_COST", "3")),
+            "memory_cost": int(getenv("SECURITY_ANSWER_HASH_MEMORY_COST", "65536")),
+            "parallelism": int(getenv("SECURITY_ANSWER_HASH_PARALLELISM", "4")),
+        },
+    },
+}
+
+# Transactional email is queued per channel and sent in micro-batches over
+# pooled SMTP connections. Messages are flushed LINGER seconds after they are
+# queued, a full batch straight away, and every channel is swept each
+# SWEEP_INTERVAL seconds for anything a failed flush left behind. A channel's
+# TTL is how long its messages may wait: older ones are dropped unsent, and
+# the Redis list expires when nothing was queued for that long, so a stalled
+# queue does not keep one-time codes past their OTP_EXPIRATION.
+EMAIL_DISPATCH = {
+    "BACKEND": getenv("EMAIL_DISPATCH_BACKEND", "redis"),
+    "SMTP_BACKEND": getenv(
+        "EMAIL_SMTP_BACKEND", "django.core.mail.backends.smtp.EmailBackend"
+    ),
+    "BATCH_SIZE": int(getenv("EMAIL_DISPATCH_BATCH_SIZE", "50")),
+    "POOL_IDLE_TIMEOUT": int(getenv("EMAIL_POOL_IDLE_TIMEOUT", "30")),
+    "LOCKOUT_DEDUPE_WINDOW": int(getenv("EMAIL_LOCKOUT_DEDUPE_WINDOW", "3600")),
+    "SWEEP_INTERVAL": int(getenv("EMAIL_DISPATCH_SWEEP_INTERVAL", "15")),
+    "CHANNELS": {
+        "auth": {
+            "LINGER": 0.2,
+            "TTL": int(getenv("EMAIL_AUTH_QUEUE_TTL", "120")),
+            "QUEUE": "auth_notifications",
+            "PRIORITY": 9,
+        },
+        "bulk": {"LINGER": 5, "QUEUE": "bulk_notifications", "PRIORITY": 5},
+    },
+}
+
+# Hourly/daily view counters maintained alongside ContentView.
+CONTENT_VIEW_ROLLUPS_ENABLED = getenv("CONTENT_VIEW_ROLLUPS_ENABLED", "True") == "True"
+
+# How a new user gets their individual party: "immediate" creates it in the
+# user's own transaction, "deferred" collects the transaction's new users
+# and creates theirs in bulk from a Celery task after commit.
+PARTY_BOOTSTRAP = {
+    "MODE": getenv("PARTY_BOOTSTRAP_MODE", "immediate"),
+    "BATCH_SIZE": int(getenv("PARTY_BOOTSTRAP_BATCH_SIZE", "1000")),
+}
+
+# Grants past valid_to are deactivated every INTERVAL seconds, BATCH_SIZE
+# rows per transaction and at most MAX_BATCHES per run.
+PARTY_ROLE_EXPIRY = {
+    "INTERVAL": int(getenv("PARTY_ROLE_EXPIRY_INTERVAL", "300")),
+    "BATCH_SIZE": int(getenv("PARTY_ROLE_EXPIRY_BATCH_SIZE", "1000")),
+    "MAX_BATCHES": int(getenv("PARTY_ROLE_EXPIRY_MAX_BATCHES", "100")),
+}
+
+# Security events are buffered per process and written in bulk by a
+# background thread every FLUSH_INTERVAL seconds (or BATCH_SIZE events);
+# "inline" writes each one as it happens. The table is partitioned by month;
+# PARTITIONS_AHEAD months are created in advance and months older than
+# RETENTION_MONTHS are dropped.
+SECURITY_EVENTS = {
+    "BACKEND": getenv("SECURITY_EVENTS_BACKEND", "buffered"),
+    "FLUSH_INTERVAL": float(getenv("SECURITY_EVENTS_FLUSH_INTERVAL", "1")),
+    "BATCH_SIZE": int(getenv("SECURITY_EVENTS_BATCH_SIZE", "500")),
+    "MAX_BUFFERED": int(getenv("SECURITY_EVENTS_MAX_BUFFERED", "50000")),
+    "PARTITIONS_AHEAD": int(getenv("SECURITY_EVENTS_PARTITIONS_AHEAD", "2")),
+    "RETENTION_MONTHS": int(getenv("SECURITY_EVENTS_RETENTION_MONTHS", "24")),
+}
+
+# Domain events are written to the outbox table in the transaction that
+# raises them and relayed to the broker after commit. "celery" publishes them
+# as tasks; "local" runs their handlers in-process straight after commit.
+# A commit schedules a relay LINGER seconds later; the beat relay every
+# RELAY_INTERVAL seconds catches whatever that misses.
+OUTBOX = {
+    "BACKEND": getenv("OUTBOX_BACKEND", "celery"),
+    "BATCH_SIZE": int(getenv("OUTBOX_BATCH_SIZE", "500")),
+    "MAX_BATCHES": int(getenv("OUTBOX_MAX_BATCHES", "20")),
+    "MAX_ATTEMPTS": int(getenv("OUTBOX_MAX_ATTEMPTS", "10")),
+    "LINGER": float(getenv("OUTBOX_LINGER", "0.05")),
+    "RELAY_INTERVAL": int(getenv("OUTBOX_RELAY_INTERVAL", "5")),
+    "RETENTION_DAYS": int(getenv("OUTBOX_RETENTION_DAYS", "7")),
+}
+
+CELERY_BEAT_SCHEDULE = {
+    "flush-content-views": {
+        "task": "core_apps.common.tasks.flush_content_views",
+        "schedule": timedelta(seconds=CONTENT_VIEW_BUFFER["FLUSH_INTERVAL"]),
+    },
+    "restore-stale-content-views": {
+        "task": "core_apps.common.tasks.restore_stale_content_views",
+        "schedule": timedelta(seconds=CONTENT_VIEW_BUFFER["DRAIN_TIMEOUT"]),
+    },
+    "expire-party-role-grants": {
+        "task": "core_apps.user_profile.tasks.expire_party_role_grants",
+        "schedule": timedelta(seconds=PARTY_ROLE_EXPIRY["INTERVAL"]),
+    },
+    "relay-outbox": {
+        "task": "core_apps.common.tasks.relay_outbox",
+        "schedule": timedelta(seconds=OUTBOX["RELAY_INTERVAL"]),
+    },
+    "purge-outbox": {
+        "task": "core_apps.common.tasks.purge_outbox",
+        "schedule": timedelta(days=1),
+    },
+    "maintain-security-event-partitions": {
+        "task": "core_apps.user_auth.tasks.maintain_security_event_partitions",
+        "schedule": timedelta(days=1),
+    },
+    **{
+        f"flush-email-queue-{channel}": {
+            "task": "core_apps.common.tasks.flush_email_queue",
+            "schedule": timedelta(seconds=EMAIL_DISPATCH["SWEEP_INTERVAL"]),
+            "args": [channel],
+        }
+        for channel in EMAIL_DISPATCH["CHANNELS"]
+    },
+}
+
 
 STORAGES = {
     "default": {
-        "BACKEND": "storages.backends.s3.S3Storage",
+        "BACKEND": "core_apps.common.storage.TracedS3Storage",
         "OPTIONS": {
             "bucket_name": getenv("MINIO_BUCKET", "banker"),
             "access_key": getenv("MINIO_ROOT_USER"),
@@ -203,7 +477,7 @@ STORAGES = {
         "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
     },
     "celery": {
-        "BACKEND": "storages.backends.s3.S3Storage",
+        "BACKEND": "core_apps.common.storage.TracedS3Storage",
         "OPTIONS": {
             "bucket_name": "banker",
             "access_key": getenv("MINIO_ROOT_USER"),
@@ -221,47 +495,37 @@ STORAGES = {
 }
 
 
-LOGURU_LOGGING = {
-    "handlers": [
-        {
-            "level": "DEBUG",
-            "sink": BASE_DIR / "logs/debug.log",
-            "filter": lambda record: record["level"].no <= logger.level("WARNING").no,
-            "format": "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}",
-            "rotation": "10MB",
-            "retention": "30 days",
-            "compression": "zip",
-        },
-        {
-            "level": "ERROR",
-            "sink": BASE_DIR / "logs/error.log",
-            # "filter": lambda record: record["level"].no <= logger.level("WARNING").no,
-            "format": "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}",
-            "rotation": "10MB",
-            "retention": "30 days",
-            "compression": "zip",
-            "backtrace": True,
-            "diagnose": True,
-        },
-    ],
+# "sync" writes log files on the calling thread; "async" queues records to
+# a background writer. FORMAT is "text" or "json" (one object per line).
+# SAMPLING keeps a fraction and RATE_LIMITS a number per second of the
+# records below WARNING, by module prefix, e.g. {"django.db.backends": 0.01}.
+# STDLIB_LEVEL applies to records from the logging module (Django, Celery,
+# libraries): at DEBUG, django.db.backends logs every query when DEBUG is on.
+LOG_PIPELINE = {
+    "MODE": getenv("LOG_MODE", "sync"),
+    "FORMAT": getenv("LOG_FORMAT", "text"),
+    "LEVEL": getenv("LOG_LEVEL", "DEBUG"),
+    "STDLIB_LEVEL": getenv("LOG_STDLIB_LEVEL", "INFO"),
+    "DIAGNOSE": getenv("LOG_DIAGNOSE", "True") == "True",
+    "SAMPLING": json.loads(getenv("LOG_SAMPLING", "{}")),
+    "RATE_LIMITS": json.loads(getenv("LOG_RATE_LIMITS", "{}")),
 }
 
-# Configure logger with error handling for permission issues
-try:
-    logger.configure(**LOGURU_LOGGING)
-except PermissionError:
-    # Fallback to console logging if file logging fails
-    logger.configure(handlers=[{"level": "INFO", "sink": "sys.stderr"}])
-
 LOGGING_CONFIG = None
 
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
     "handlers": {"loguru": {"class": "interceptor.InterceptHandler"}},
-    "root": {"handlers": ["loguru"], "level": "DEBUG"},
+    # Records below STDLIB_LEVEL are dropped by the logging module before a
+    # LogRecord is even built.
+    "root": {"handlers": ["loguru"], "level": LOG_PIPELINE["STDLIB_LEVEL"]},
 }
 
+# With LOGGING_CONFIG = None Django applies neither its defaults nor
+# LOGGING. CommonConfig.ready() installs the loguru handlers and this
+# bridge once the app registry is loaded, not on import of the settings.
+
 
 DEFAULT_DATE = date.today()
 DEFAULT_EXPIRY = date.today() + timedelta(days=365)
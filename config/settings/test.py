@@ -0,0 +1,71 @@
+from os import getenv
+
+from .local import *
+from .local import (
+    ADMIN_QUERY_BUDGETS,
+    CONTENT_VIEW_BUFFER,
+    EMAIL_DISPATCH,
+    HASHING,
+    LOGIN_THROTTLE,
+    METRICS,
+    OTP_STORE,
+    OUTBOX,
+    REQUEST_INSTRUMENTATION,
+    SECURITY_EVENTS,
+    TIERED_CACHE,
+    TRACING,
+)
+
+# Run with `python manage.py test --settings=config.settings.test`. Only
+# PostgreSQL is needed: every store that talks to Redis uses its in-process
+# stand-in, and Celery tasks run eagerly.
+
+SECRET_KEY = getenv("SECRET_KEY", "test-secret-key")
+ADMIN_URL = getenv("ADMIN_URL", "admin/")
+DEBUG = False
+ALLOWED_HOSTS = ["testserver"]
+
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+CELERY_BROKER_URL = "memory://"
+CELERY_RESULT_BACKEND = "cache+memory://"
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_TASK_EAGER_PROPAGATES = True
+# For the tests that start real workers on the in-memory broker.
+CELERY_BROKER_TRANSPORT_OPTIONS = {"polling_interval": 0.01}
+
+EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+EMAIL_DISPATCH = {
+    **EMAIL_DISPATCH,
+    "BACKEND": "local",
+    "SMTP_BACKEND": "django.core.mail.backends.locmem.EmailBackend",
+}
+
+# Cheap hashes; the pool and its limits stay as configured.
+HASHING = {
+    **HASHING,
+    "PROFILES": {
+        name: {"time_cost": 1, "memory_cost": 8, "parallelism": 1}
+        for name in HASHING["PROFILES"]
+    },
+}
+
+CONTENT_VIEW_BUFFER = {**CONTENT_VIEW_BUFFER, "BACKEND": "local"}
+OTP_STORE = {**OTP_STORE, "BACKEND": "local"}
+LOGIN_THROTTLE = {**LOGIN_THROTTLE, "BACKEND": "local"}
+TIERED_CACHE = {**TIERED_CACHE, "BACKEND": "local"}
+OUTBOX = {**OUTBOX, "BACKEND": "local"}
+SECURITY_EVENTS = {**SECURITY_EVENTS, "BACKEND": "inline"}
+METRICS = {**METRICS, "BACKEND": "local"}
+TRACING = {**TRACING, "ENABLED": False}
+
+# Every request and changelist is measured, and an exceeded budget fails the
+# test that made it.
+REQUEST_INSTRUMENTATION = {
+    **REQUEST_INSTRUMENTATION,
+    "ENABLED": True,
+    "SAMPLE_RATE": 1.0,
+    "HEADERS": True,
+    "RAISE": True,
+}
+ADMIN_QUERY_BUDGETS = {**ADMIN_QUERY_BUDGETS, "ENABLED": True, "RAISE": True}
@@ -1,14 +1,18 @@
 from django.conf import settings
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularRedocView,
     SpectacularSwaggerView,
 )
 
+from core_apps.common.views import metrics_view
+
 urlpatterns = [
     path(settings.ADMIN_URL, admin.site.urls),
+    path("api/v1/auth/", include("core_apps.user_auth.urls")),
+    path("metrics", metrics_view, name="metrics"),
     path("api/v1/schema", SpectacularAPIView.as_view(), name="schema"),
     path("api/v1/schema/redoc", SpectacularRedocView.as_view(), name="redoc"),
     path(
@@ -21,4 +25,3 @@ urlpatterns = [
 admin.site.site_header = "Hober Bank Admin"
 admin.site.site_title = "Hober Bank Admin Portal"
 admin.site.index_title = "Welcome to Hosseini's Bank :) Admin Portal"
-
@@ -5,11 +5,13 @@ from django.contrib.contenttypes.admin import GenericTabularInline
 from django.http import HttpRequest
 from django.utils.translation import gettext_lazy as _
 
-from .models import ContentView
+from .admin_base import BaseModelAdmin
+from .pagination import KeysetPaginationMixin
+from .models import ContentView, ContentViewRollup, OutboxEvent, UserViewRollup
 
 
 @admin.register(ContentView)
-class ContentViewAdmin(admin.ModelAdmin):
+class ContentViewAdmin(KeysetPaginationMixin, BaseModelAdmin):
     list_display = [
         "content_object",
         "content_type",
@@ -18,8 +20,12 @@ class ContentViewAdmin(admin.ModelAdmin):
         "last_viewed",
         "created_at",
     ]
-    list_filter = ["content_object", "content_type", "user", "viewer_ip", "last_viewed"]
+    list_filter = ["content_type", "last_viewed"]
+    search_fields = ["user__email", "viewer_ip"]
+    list_prefetch_generic = ["content_object"]
+    keyset_ordering = ("-last_viewed", "-id")
     date_hierarchy = "last_viewed"
+    cache_date_hierarchy = True
     readonly_fields = [
         "content_object",
         "object_id",
@@ -50,8 +56,66 @@ class ContentViewAdmin(admin.ModelAdmin):
 class ContentViewInline(GenericTabularInline):
     model = ContentView
     extra = 0
-    readonly_fields = ["user", "viewer_ip", "last_viewed", "cerated_at"]
+    readonly_fields = ["user", "viewer_ip", "last_viewed", "created_at"]
     can_delete = False
 
     def has_add_permission(self, request: HttpRequest) -> bool:
         return False
+
+
+class ViewRollupAdmin(BaseModelAdmin):
+    """Read-only browser over the precomputed view buckets."""
+
+    list_filter = ["period", "content_type"]
+    ordering = ["-bucket_start"]
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        return False
+
+    def has_change_permission(
+        self, request: HttpRequest, obj: Any | None = ...
+    ) -> bool:
+        return False
+
+
+@admin.register(ContentViewRollup)
+class ContentViewRollupAdmin(ViewRollupAdmin):
+    list_display = ["content_type", "object_id", "period", "bucket_start", "views"]
+    search_fields = ["object_id"]
+
+
+@admin.register(UserViewRollup)
+class UserViewRollupAdmin(ViewRollupAdmin):
+    list_display = ["user", "content_type", "period", "bucket_start", "views"]
+    search_fields = ["user__email"]
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(KeysetPaginationMixin, BaseModelAdmin):
+    list_display = ["topic", "created_at", "delivered_at", "attempts"]
+    list_filter = ["topic"]
+    keyset_ordering = ("-id",)
+    readonly_fields = [
+        "topic",
+        "payload",
+        "created_at",
+        "delivered_at",
+        "attempts",
+        "last_error",
+    ]
+    actions = ["retry_events"]
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        return False
+
+    def has_change_permission(
+        self, request: HttpRequest, obj: Any | None = ...
+    ) -> bool:
+        return False
+
+    @admin.action(description=_("Retry selected undelivered events"))
+    def retry_events(self, request: HttpRequest, queryset) -> None:
+        retried = queryset.filter(delivered_at__isnull=True).update(
+            attempts=0, last_error=""
+        )
+        self.message_user(request, _("%d events queued for retry.") % retried)
@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
 
@@ -6,3 +7,12 @@ class CommonConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core_apps.common"
     verbose_name = _("Commom")
+
+    def ready(self) -> None:
+        from interceptor import configure_logging
+
+        configure_logging(settings.LOG_PIPELINE, settings.LOGS_DIR, settings.LOGGING)
+
+        import core_apps.common.metrics  # noqa: F401
+        import core_apps.common.middleware  # noqa: F401
+        import core_apps.common.tracing  # noqa: F401
@@ -0,0 +1,79 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, TypeVar
+
+from loguru import logger
+
+V = TypeVar("V", bound=Callable[..., Any])
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a page or request runs more queries than it is allowed."""
+
+
+def _exceeded(message: str, raise_on_exceed: bool) -> bool:
+    if raise_on_exceed:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+    return False
+
+
+def enforce_query_budget(
+    label: str, query_count: int, budget: int | None, raise_on_exceed: bool
+) -> bool:
+    """Check ``query_count`` against ``budget``.
+
+    Returns ``True`` when the budget holds. Otherwise logs a warning, or
+    raises ``QueryBudgetExceeded`` when ``raise_on_exceed`` is set (tests).
+    """
+    if budget is None or query_count <= budget:
+        return True
+    return _exceeded(
+        f"{label} ran {query_count} queries (budget {budget})", raise_on_exceed
+    )
+
+
+def enforce_db_time_budget(
+    label: str, db_time_ms: float, budget_ms: float | None, raise_on_exceed: bool
+) -> bool:
+    """Like ``enforce_query_budget``, for milliseconds spent in the database."""
+    if budget_ms is None or db_time_ms <= budget_ms:
+        return True
+    return _exceeded(
+        f"{label} spent {db_time_ms:.1f}ms in the database (budget {budget_ms}ms)",
+        raise_on_exceed,
+    )
+
+
+@dataclass(frozen=True)
+class ViewBudget:
+    queries: Optional[int] = None
+    db_time_ms: Optional[float] = None
+
+
+def query_budget(
+    queries: Optional[int] = None, db_time_ms: Optional[float] = None
+) -> Callable[[V], V]:
+    """Give a view (function or class) a per-request budget.
+
+    Checked by ``RequestInstrumentationMiddleware`` on the requests it
+    samples.
+    """
+
+    def decorate(view: V) -> V:
+        view.query_budget = ViewBudget(queries, db_time_ms)
+        return view
+
+    return decorate
+
+
+def get_view_budget(view: Callable[..., Any]) -> Optional[ViewBudget]:
+    # as_view() returns a new function; the budget sits on the class.
+    for candidate in (
+        view,
+        getattr(view, "view_class", None),
+        getattr(view, "cls", None),
+    ):
+        budget = getattr(candidate, "query_budget", None)
+        if isinstance(budget, ViewBudget):
+            return budget
+    return None
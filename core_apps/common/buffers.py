@@ -0,0 +1,350 @@
+import json
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from redis.exceptions import ResponseError
+
+from .redis_client import get_async_redis_connection, get_redis_connection
+
+
+@dataclass
+class PendingView:
+    """A coalesced view of one content object waiting to be flushed."""
+
+    content_type_id: int
+    object_id: str
+    user_id: Optional[str]
+    viewer_ip: Optional[str]
+    last_viewed: datetime
+    hits: int = 1
+
+    @property
+    def key(self) -> str:
+        return f"{self.content_type_id}:{self.object_id}"
+
+    def merge(self, other: "PendingView") -> None:
+        self.hits += other.hits
+        if other.last_viewed >= self.last_viewed:
+            self.user_id = other.user_id
+            self.viewer_ip = other.viewer_ip
+            self.last_viewed = other.last_viewed
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        data["last_viewed"] = self.last_viewed.isoformat(timespec="microseconds")
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, raw: str | bytes) -> "PendingView":
+        data = json.loads(raw)
+        data["last_viewed"] = parse_datetime(data["last_viewed"])
+        return cls(**data)
+
+    def tally(self) -> "ViewTally":
+        return ViewTally(
+            content_type_id=self.content_type_id,
+            object_id=self.object_id,
+            user_id=self.user_id,
+            bucket_start=self.last_viewed.replace(minute=0, second=0, microsecond=0),
+            hits=self.hits,
+        )
+
+
+@dataclass
+class ViewTally:
+    """Number of views of one object by one viewer within one hour."""
+
+    content_type_id: int
+    object_id: str
+    user_id: Optional[str]
+    bucket_start: datetime
+    hits: int = 1
+
+    @property
+    def key(self) -> str:
+        return "|".join(
+            [
+                str(self.content_type_id),
+                self.object_id,
+                self.user_id or "",
+                self.bucket_start.isoformat(),
+            ]
+        )
+
+    @classmethod
+    def from_key(cls, key: str | bytes, hits: int | bytes) -> "ViewTally":
+        if isinstance(key, bytes):
+            key = key.decode()
+        content_type_id, object_id, user_id, bucket_start = key.split("|")
+        return cls(
+            content_type_id=int(content_type_id),
+            object_id=object_id,
+            user_id=user_id or None,
+            bucket_start=parse_datetime(bucket_start),
+            hits=int(hits),
+        )
+
+
+@dataclass
+class BufferedBatch:
+    """Everything drained from a buffer in one go."""
+
+    views: list[PendingView] = field(default_factory=list)
+    tallies: list[ViewTally] = field(default_factory=list)
+    # Where the buffer parked the batch until it is acknowledged.
+    keys: list[str] = field(default_factory=list)
+
+
+class ViewBuffer:
+    """Collects views in memory until they are flushed in bulk."""
+
+    # Whether the request that fills the buffer should write it out itself
+    # instead of leaving it to the periodic Celery task.
+    flush_inline = False
+
+    def add(self, view: PendingView) -> int:
+        """Buffer a view and return the number of distinct pending objects."""
+        raise NotImplementedError
+
+    async def aadd(self, view: PendingView) -> int:
+        # In-process buffers are cheap enough to fill from the event loop.
+        return self.add(view)
+
+    def drain(self) -> BufferedBatch:
+        """Take every pending view and hourly tally out of the buffer.
+
+        The batch stays parked until ``ack`` or ``restore`` is called.
+        """
+        raise NotImplementedError
+
+    def ack(self, batch: BufferedBatch) -> None:
+        """Forget a drained batch once it has been committed."""
+
+    def restore(self, batch: BufferedBatch) -> None:
+        """Merge a drained batch back into the buffer after a failed flush."""
+        raise NotImplementedError
+
+    def should_flush(self, size: int) -> bool:
+        return size >= settings.CONTENT_VIEW_BUFFER["MAX_SIZE"]
+
+    async def ashould_flush(self, size: int) -> bool:
+        return self.should_flush(size)
+
+    def restore_stale(self, older_than: float) -> int:
+        """Restore batches drained over ``older_than`` seconds ago that were
+        never acknowledged, such as one whose worker died mid-flush; returns
+        how many were restored."""
+        return 0
+
+
+class LocalViewBuffer(ViewBuffer):
+    """Per-process buffer.
+
+    Celery workers cannot see it, so it flushes itself once it is full or
+    older than the flush interval.
+    """
+
+    flush_inline = True
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: dict[str, PendingView] = {}
+        self._tallies: Counter[str] = Counter()
+        self._opened_at = time.monotonic()
+
+    def add(self, view: PendingView) -> int:
+        with self._lock:
+            self._tallies[view.tally().key] += view.hits
+            self._merge(view)
+            return len(self._pending)
+
+    def _merge(self, view: PendingView) -> None:
+        current = self._pending.get(view.key)
+        if current is None:
+            self._pending[view.key] = view
+        else:
+            current.merge(view)
+
+    def drain(self) -> BufferedBatch:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            tallies, self._tallies = self._tallies, Counter()
+            self._opened_at = time.monotonic()
+        return BufferedBatch(
+            views=list(pending.values()),
+            tallies=[ViewTally.from_key(key, hits) for key, hits in tallies.items()],
+        )
+
+    def restore(self, batch: BufferedBatch) -> None:
+        with self._lock:
+            for view in batch.views:
+                self._merge(view)
+            for tally in batch.tallies:
+                self._tallies[tally.key] += tally.hits
+
+    def should_flush(self, size: int) -> bool:
+        interval = settings.CONTENT_VIEW_BUFFER["FLUSH_INTERVAL"]
+        return super().should_flush(size) or (
+            time.monotonic() - self._opened_at >= interval
+        )
+
+
+class RedisViewBuffer(ViewBuffer):
+    """Buffer shared by every web process, drained by the Celery beat task."""
+
+    # Merge the incoming view into the stored one so concurrent writers never
+    # lose hits and the most recent viewer wins.
+    MERGE_VIEW = """
+    local function merge_view(key, field, raw)
+        local current = redis.call('HGET', key, field)
+        local incoming = cjson.decode(raw)
+        if current then
+            local stored = cjson.decode(current)
+            incoming['hits'] = incoming['hits'] + stored['hits']
+            if stored['last_viewed'] > incoming['last_viewed'] then
+                incoming['user_id'] = stored['user_id']
+                incoming['viewer_ip'] = stored['viewer_ip']
+                incoming['last_viewed'] = stored['last_viewed']
+            end
+        end
+        redis.call('HSET', key, field, cjson.encode(incoming))
+    end
+    """
+
+    ADD_SCRIPT = MERGE_VIEW + """
+    redis.call('HINCRBY', KEYS[2], ARGV[3], 1)
+    merge_view(KEYS[1], ARGV[1], ARGV[2])
+    return redis.call('HLEN', KEYS[1])
+    """
+
+    # Fold a draining pair of hashes back into the live ones, in one step so
+    # views added meanwhile are merged rather than overwritten.
+    RESTORE_SCRIPT = MERGE_VIEW + """
+    local views = redis.call('HGETALL', KEYS[3])
+    for i = 1, #views, 2 do
+        merge_view(KEYS[1], views[i], views[i + 1])
+    end
+    local tallies = redis.call('HGETALL', KEYS[4])
+    for i = 1, #tallies, 2 do
+        redis.call('HINCRBY', KEYS[2], tallies[i], tallies[i + 1])
+    end
+    redis.call('DEL', KEYS[3], KEYS[4])
+    return redis.call('HLEN', KEYS[1])
+    """
+
+    def __init__(self, key: str = "content_views:pending") -> None:
+        self.key = key
+        self.tallies_key = f"{key}:tallies"
+        self.flush_flag_key = f"{key}:flush-scheduled"
+        self.client = get_redis_connection()
+        self._add = self.client.register_script(self.ADD_SCRIPT)
+        self._restore = self.client.register_script(self.RESTORE_SCRIPT)
+
+    def add(self, view: PendingView) -> int:
+        return int(
+            self._add(
+                keys=[self.key, self.tallies_key],
+                args=[view.key, view.to_json(), view.tally().key],
+            )
+        )
+
+    async def aadd(self, view: PendingView) -> int:
+        script = get_async_redis_connection().register_script(self.ADD_SCRIPT)
+        return int(
+            await script(
+                keys=[self.key, self.tallies_key],
+                args=[view.key, view.to_json(), view.tally().key],
+            )
+        )
+
+    def drain(self) -> BufferedBatch:
+        # Renaming is atomic, so views that arrive while we flush land in a
+        # fresh hash instead of being deleted with the drained one. The
+        # suffix records when, for restore_stale.
+        suffix = f"draining:{int(time.time())}:{uuid.uuid4().hex}"
+        draining, draining_tallies = (
+            f"{self.key}:{suffix}",
+            f"{self.tallies_key}:{suffix}",
+        )
+        pipe = self.client.pipeline()
+        pipe.delete(self.flush_flag_key)
+        pipe.rename(self.key, draining)
+        pipe.rename(self.tallies_key, draining_tallies)
+        try:
+            pipe.execute()
+        except ResponseError:
+            # Nothing has been buffered since the last drain.
+            return BufferedBatch()
+
+        pipe = self.client.pipeline()
+        pipe.hvals(draining)
+        pipe.hgetall(draining_tallies)
+        raw_views, raw_tallies = pipe.execute()
+        return BufferedBatch(
+            views=[PendingView.from_json(raw) for raw in raw_views],
+            tallies=[
+                ViewTally.from_key(key, hits) for key, hits in raw_tallies.items()
+            ],
+            keys=[draining, draining_tallies],
+        )
+
+    def ack(self, batch: BufferedBatch) -> None:
+        if batch.keys:
+            self.client.delete(*batch.keys)
+
+    def restore(self, batch: BufferedBatch) -> None:
+        if batch.keys:
+            self._restore(keys=[self.key, self.tallies_key, *batch.keys])
+
+    # Repeat views do not grow the hash, so once it is full every add would
+    # ask for a flush. The flag lets only the first of them schedule one
+    # until the next drain clears it, or its TTL passes if the task is lost.
+
+    def _flush_flag(self) -> dict:
+        ttl = settings.CONTENT_VIEW_BUFFER["FLUSH_INTERVAL"]
+        return {"name": self.flush_flag_key, "value": 1, "nx": True, "ex": ttl}
+
+    def should_flush(self, size: int) -> bool:
+        return super().should_flush(size) and bool(
+            self.client.set(**self._flush_flag())
+        )
+
+    async def ashould_flush(self, size: int) -> bool:
+        return super().should_flush(size) and bool(
+            await get_async_redis_connection().set(**self._flush_flag())
+        )
+
+    def restore_stale(self, older_than: float) -> int:
+        cutoff = time.time() - older_than
+        restored = 0
+        for key in self.client.scan_iter(match=f"{self.key}:draining:*"):
+            suffix = key.decode().removeprefix(f"{self.key}:")
+            drained_at = suffix.split(":")[1]
+            if drained_at.isdigit() and int(drained_at) <= cutoff:
+                self.restore(
+                    BufferedBatch(
+                        keys=[f"{self.key}:{suffix}", f"{self.tallies_key}:{suffix}"]
+                    )
+                )
+                restored += 1
+        return restored
+
+
+BUFFER_BACKENDS = {
+    "local": LocalViewBuffer,
+    "redis": RedisViewBuffer,
+}
+
+
+@lru_cache(maxsize=None)
+def get_view_buffer() -> ViewBuffer:
+    backend = settings.CONTENT_VIEW_BUFFER["BACKEND"]
+    return BUFFER_BACKENDS[backend]()
@@ -0,0 +1,465 @@
+import asyncio
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+
+from .redis_client import get_async_redis_connection, get_redis_connection
+
+MISSING = object()
+
+
+class L1Cache:
+    """Bounded per-process LRU whose entries also expire."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: Any, timeout: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class CacheBackend:
+    """Shared (L2) store of serialised values and namespace versions."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, timeout: int) -> None:
+        raise NotImplementedError
+
+    def add(self, key: str, value: bytes, timeout: int) -> bool:
+        """Set ``key`` only if it is absent; returns whether it was set."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def delete_many(self, keys: list[str]) -> None:
+        for key in keys:
+            self.delete(key)
+
+    def version(self, key: str) -> int:
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    # The in-memory backend never blocks, so its async variants just call
+    # the sync ones; network backends override them.
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return self.get(key)
+
+    async def aset(self, key: str, value: bytes, timeout: int) -> None:
+        self.set(key, value, timeout)
+
+    async def aadd(self, key: str, value: bytes, timeout: int) -> bool:
+        return self.add(key, value, timeout)
+
+    async def adelete(self, key: str) -> None:
+        self.delete(key)
+
+    async def aversion(self, key: str) -> int:
+        return self.version(key)
+
+
+class LocalCacheBackend(CacheBackend):
+    """In-process stand-in for tests and single-process deployments."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: dict[str, tuple[float, bytes]] = {}
+        self._versions: dict[str, int] = {}
+
+    def _live(self, key: str) -> Optional[bytes]:
+        entry = self._values.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self._values.pop(key, None)
+            return None
+        return entry[1]
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._live(key)
+
+    def set(self, key: str, value: bytes, timeout: int) -> None:
+        with self._lock:
+            self._values[key] = (time.monotonic() + timeout, value)
+
+    def add(self, key: str, value: bytes, timeout: int) -> bool:
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._values[key] = (time.monotonic() + timeout, value)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+    def version(self, key: str) -> int:
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            return self._versions[key]
+
+
+class RedisCacheBackend(CacheBackend):
+    def __init__(self) -> None:
+        self.client = get_redis_connection()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, timeout: int) -> None:
+        self.client.set(key, value, ex=timeout)
+
+    def add(self, key: str, value: bytes, timeout: int) -> bool:
+        return bool(self.client.set(key, value, ex=timeout, nx=True))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+    def delete_many(self, keys: list[str]) -> None:
+        if keys:
+            self.client.delete(*keys)
+
+    def version(self, key: str) -> int:
+        return int(self.client.get(key) or 0)
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(key))
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return await get_async_redis_connection().get(key)
+
+    async def aset(self, key: str, value: bytes, timeout: int) -> None:
+        await get_async_redis_connection().set(key, value, ex=timeout)
+
+    async def aadd(self, key: str, value: bytes, timeout: int) -> bool:
+        client = get_async_redis_connection()
+        return bool(await client.set(key, value, ex=timeout, nx=True))
+
+    async def adelete(self, key: str) -> None:
+        await get_async_redis_connection().delete(key)
+
+    async def aversion(self, key: str) -> int:
+        return int(await get_async_redis_connection().get(key) or 0)
+
+
+CACHE_BACKENDS = {
+    "local": LocalCacheBackend,
+    "redis": RedisCacheBackend,
+}
+
+
+class TieredCache:
+    """Read-through cache with a per-process LRU (L1) in front of L2.
+
+    Values live under ``<namespace>:v<version>:<key>``. Deleting a key
+    drops it from both tiers; bumping a namespace's version orphans every
+    key in it at once. Other processes may serve an L1 copy for up to
+    ``L1_TIMEOUT`` seconds after either, which is the price of skipping
+    the network on hot keys; a namespace that cannot afford that sets its
+    own ``L1_TIMEOUT``, down to 0 to bypass L1.
+
+    Both tiers hold pickled bytes, so every hit returns a fresh object and
+    callers can never mutate a cached value in place.
+
+    ``get_or_set`` computes a missing value once: threads of one process
+    queue on a striped lock, and other processes wait for the holder of an
+    L2 lock to fill the key, recomputing themselves only if it does not
+    within ``LOCK_TIMEOUT``.
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        namespaces: dict[str, dict[str, int]],
+        l1_max_entries: int,
+        l1_timeout: int,
+        lock_timeout: int,
+        prefix: str = "cache",
+    ) -> None:
+        self.backend = backend
+        self.namespaces = namespaces
+        self.l1 = L1Cache(l1_max_entries)
+        self.l1_timeout = l1_timeout
+        self.lock_timeout = lock_timeout
+        self.prefix = prefix
+        self._stripes = [threading.Lock() for _ in range(64)]
+        self._metrics_lock = threading.Lock()
+        self._metrics: dict[str, Counter] = {}
+
+    def _timeout(self, namespace: str) -> int:
+        return self.namespaces[namespace]["TIMEOUT"]
+
+    def _record(self, namespace: str, event: str) -> None:
+        with self._metrics_lock:
+            self._metrics.setdefault(namespace, Counter())[event] += 1
+
+    def metrics(self) -> dict[str, dict[str, int]]:
+        """Per-namespace event counts for this process since start-up."""
+        with self._metrics_lock:
+            return {name: dict(counts) for name, counts in self._metrics.items()}
+
+    def _version_key(self, namespace: str) -> str:
+        return f"{self.prefix}:{namespace}:version"
+
+    def _versioned(self, namespace: str, key: Any, version: int) -> str:
+        return f"{self.prefix}:{namespace}:v{version}:{key}"
+
+    def _key(self, namespace: str, key: Any) -> str:
+        version_key = self._version_key(namespace)
+        version = self.l1.get(version_key)
+        if version is MISSING:
+            version = self.backend.version(version_key)
+            self.l1.set(version_key, version, self.l1_timeout)
+        return self._versioned(namespace, key, version)
+
+    async def _akey(self, namespace: str, key: Any) -> str:
+        version_key = self._version_key(namespace)
+        version = self.l1.get(version_key)
+        if version is MISSING:
+            version = await self.backend.aversion(version_key)
+            self.l1.set(version_key, version, self.l1_timeout)
+        return self._versioned(namespace, key, version)
+
+    def _l1_timeout(self, namespace: str) -> int:
+        config = self.namespaces[namespace]
+        return min(config.get("L1_TIMEOUT", self.l1_timeout), config["TIMEOUT"])
+
+    def _set_l1(self, namespace: str, full_key: str, data: bytes) -> None:
+        timeout = self._l1_timeout(namespace)
+        if timeout > 0:
+            self.l1.set(full_key, data, timeout)
+
+    def _from_l1(self, namespace: str, full_key: str) -> Any:
+        data = self.l1.get(full_key)
+        if data is MISSING:
+            return MISSING
+        self._record(namespace, "l1_hits")
+        return pickle.loads(data)
+
+    def _fill_l1(self, namespace: str, full_key: str, data: Optional[bytes]) -> Any:
+        if data is None:
+            return MISSING
+        self._record(namespace, "l2_hits")
+        self._set_l1(namespace, full_key, data)
+        return pickle.loads(data)
+
+    def get(self, namespace: str, key: Any, default: Any = None) -> Any:
+        value = self._lookup(namespace, self._key(namespace, key))
+        return default if value is MISSING else value
+
+    def _lookup(self, namespace: str, full_key: str) -> Any:
+        if not self._timeout(namespace):
+            return MISSING
+        value = self._from_l1(namespace, full_key)
+        if value is MISSING:
+            value = self._fill_l1(namespace, full_key, self.backend.get(full_key))
+        return value
+
+    def _store(self, namespace: str, full_key: str, value: Any) -> None:
+        timeout = self._timeout(namespace)
+        if not timeout:
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self.backend.set(full_key, data, timeout)
+        self._set_l1(namespace, full_key, data)
+
+    def set(self, namespace: str, key: Any, value: Any) -> None:
+        self._store(namespace, self._key(namespace, key), value)
+
+    def get_or_set(self, namespace: str, key: Any, compute: Callable[[], Any]) -> Any:
+        full_key = self._key(namespace, key)
+        value = self._lookup(namespace, full_key)
+        if value is not MISSING:
+            return value
+        if not self._timeout(namespace):
+            return compute()
+
+        stripe = self._stripes[hash(full_key) % len(self._stripes)]
+        with stripe:
+            # Another thread may have filled the key while this one queued.
+            value = self._lookup(namespace, full_key)
+            if value is not MISSING:
+                return value
+            self._record(namespace, "misses")
+
+            lock_key = f"{full_key}:lock"
+            locked = self.backend.add(lock_key, b"1", self.lock_timeout)
+            if not locked:
+                self._record(namespace, "lock_waits")
+                deadline = time.monotonic() + self.lock_timeout
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    data = self.backend.get(full_key)
+                    if data is not None:
+                        return self._fill_l1(namespace, full_key, data)
+            try:
+                value = compute()
+                self._store(namespace, full_key, value)
+            finally:
+                if locked:
+                    self.backend.delete(lock_key)
+            return value
+
+    def delete(self, namespace: str, key: Any) -> None:
+        full_key = self._key(namespace, key)
+        self.l1.delete(full_key)
+        self.backend.delete(full_key)
+        self._record(namespace, "invalidations")
+
+    def delete_many(self, namespace: str, keys: Iterable[Any]) -> None:
+        full_keys = [self._key(namespace, key) for key in keys]
+        for full_key in full_keys:
+            self.l1.delete(full_key)
+        self.backend.delete_many(full_keys)
+        self._record(namespace, "invalidations")
+
+    def delete_on_commit(self, namespace: str, key: Any) -> None:
+        """Delete now and, inside a transaction, again once it commits.
+
+        The second delete drops a stale copy that a concurrent reader may
+        have cached from the not yet committed row.
+        """
+        self.delete(namespace, key)
+        if connection.in_atomic_block:
+            transaction.on_commit(lambda: self.delete(namespace, key))
+
+    def invalidate_namespace(self, namespace: str) -> int:
+        version_key = self._version_key(namespace)
+        version = self.backend.incr(version_key)
+        self.l1.delete(version_key)
+        self._record(namespace, "invalidations")
+        return version
+
+    async def aget(self, namespace: str, key: Any, default: Any = None) -> Any:
+        value = await self._alookup(namespace, await self._akey(namespace, key))
+        return default if value is MISSING else value
+
+    async def _alookup(self, namespace: str, full_key: str) -> Any:
+        if not self._timeout(namespace):
+            return MISSING
+        value = self._from_l1(namespace, full_key)
+        if value is MISSING:
+            data = await self.backend.aget(full_key)
+            value = self._fill_l1(namespace, full_key, data)
+        return value
+
+    async def _astore(self, namespace: str, full_key: str, value: Any) -> None:
+        timeout = self._timeout(namespace)
+        if not timeout:
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        await self.backend.aset(full_key, data, timeout)
+        self._set_l1(namespace, full_key, data)
+
+    async def aset(self, namespace: str, key: Any, value: Any) -> None:
+        await self._astore(namespace, await self._akey(namespace, key), value)
+
+    async def aget_or_set(
+        self, namespace: str, key: Any, compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        full_key = await self._akey(namespace, key)
+        value = await self._alookup(namespace, full_key)
+        if value is not MISSING:
+            return value
+        if not self._timeout(namespace):
+            return await compute()
+        self._record(namespace, "misses")
+
+        # No in-process stripe here: a thread lock would block the loop,
+        # so coroutines of one process rely on the L2 lock alone.
+        lock_key = f"{full_key}:lock"
+        locked = await self.backend.aadd(lock_key, b"1", self.lock_timeout)
+        if not locked:
+            self._record(namespace, "lock_waits")
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                data = await self.backend.aget(full_key)
+                if data is not None:
+                    return self._fill_l1(namespace, full_key, data)
+        try:
+            value = await compute()
+            await self._astore(namespace, full_key, value)
+        finally:
+            if locked:
+                await self.backend.adelete(lock_key)
+        return value
+
+    async def adelete(self, namespace: str, key: Any) -> None:
+        full_key = await self._akey(namespace, key)
+        self.l1.delete(full_key)
+        await self.backend.adelete(full_key)
+        self._record(namespace, "invalidations")
+
+
+@lru_cache(maxsize=None)
+def get_tiered_cache() -> TieredCache:
+    config = settings.TIERED_CACHE
+    return TieredCache(
+        backend=CACHE_BACKENDS[config["BACKEND"]](),
+        namespaces=config["NAMESPACES"],
+        l1_max_entries=config["L1_MAX_ENTRIES"],
+        l1_timeout=config["L1_TIMEOUT"],
+        lock_timeout=config["LOCK_TIMEOUT"],
+    )
+
+
+def invalidate_on(
+    model: Any, namespace: str, keys: Callable[[Any], Iterable[Any]]
+) -> None:
+    """Drop ``keys(instance)`` from ``namespace`` whenever ``model`` is
+    saved or deleted.
+
+    ``model`` may be a class or an ``"app_label.Model"`` string. Bulk
+    writes send no signals, so code using ``update()`` or ``bulk_create``
+    on these models has to invalidate explicitly.
+    """
+
+    def invalidate(sender: Any, instance: Any, **kwargs: Any) -> None:
+        cache = get_tiered_cache()
+        for key in keys(instance):
+            cache.delete_on_commit(namespace, key)
+
+    uid = f"tiered_cache:{namespace}:{model}"
+    post_save.connect(invalidate, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(invalidate, sender=model, weak=False, dispatch_uid=uid)
@@ -0,0 +1,19 @@
+from typing import Any
+
+from django.db import models
+
+from .ids import uuid7
+
+
+class TimeOrderedUUIDField(models.UUIDField):
+    """UUID column whose default is a time-ordered (version 7) UUID.
+
+    Stored exactly like ``UUIDField``, so switching an existing model to it
+    needs no table rewrite: old rows keep their random keys and new rows are
+    appended in time order.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        kwargs.setdefault("default", uuid7)
+        kwargs.setdefault("editable", False)
+        super().__init__(*args, **kwargs)
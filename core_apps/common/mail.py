@@ -0,0 +1,389 @@
+import json
+import threading
+import time
+from functools import lru_cache
+from smtplib import SMTPException, SMTPRecipientsRefused, SMTPResponseException
+from typing import Any, Optional
+
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.utils.html import strip_tags
+from loguru import logger
+
+from .metrics import email_send_failures, emails_queued, emails_sent
+from .redis_client import get_redis_connection
+from .tracing import start_span
+
+
+@lru_cache(maxsize=None)
+def _compiled_template(template_name: str):
+    # The template engine only caches compiled templates when DEBUG is off;
+    # mail templates never change at runtime, so cache them regardless.
+    try:
+        return get_template(template_name)
+    except TemplateDoesNotExist:
+        return None
+
+
+@lru_cache(maxsize=1024)
+def _html_to_text(html: str) -> str:
+    return strip_tags(html)
+
+
+def render_email(template_name: str, context: dict[str, Any]) -> tuple[str, str]:
+    """Render the HTML body and its plain-text variant.
+
+    The plain text comes from a ``.txt`` template next to the HTML one when
+    there is one, so ``strip_tags`` only runs for templates without it.
+    """
+    with start_span("email.render", template=template_name):
+        html = _compiled_template(template_name).render(context)
+        text_template = _compiled_template(template_name.rsplit(".", 1)[0] + ".txt")
+        if text_template is not None:
+            return html, text_template.render(context).strip()
+        return html, _html_to_text(html)
+
+
+def serialize_email(message: EmailMultiAlternatives, queued_at: float) -> str:
+    return json.dumps(
+        {
+            "queued_at": queued_at,
+            "subject": message.subject,
+            "body": message.body,
+            "from_email": message.from_email,
+            "to": message.to,
+            "alternatives": [list(alternative) for alternative in message.alternatives],
+        }
+    )
+
+
+def deserialize_email(payload: str | bytes) -> tuple[EmailMultiAlternatives, float]:
+    """The message and the time it was queued."""
+    data = json.loads(payload)
+    queued_at = data.pop("queued_at")
+    alternatives = data.pop("alternatives")
+    message = EmailMultiAlternatives(
+        alternatives=[tuple(alternative) for alternative in alternatives], **data
+    )
+    return message, queued_at
+
+
+class ConnectionPool:
+    """One open SMTP session per channel and worker process.
+
+    Sessions are reused across flushes and reopened after ``idle_timeout``
+    seconds, since servers drop idle clients on their own schedule.
+    """
+
+    def __init__(self, backend: str, idle_timeout: float) -> None:
+        self.backend = backend
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._connections: dict[str, tuple[BaseEmailBackend, float]] = {}
+
+    def acquire(self, channel: str) -> BaseEmailBackend:
+        with self._lock:
+            connection, last_used = self._connections.pop(channel, (None, 0.0))
+        if connection is not None and time.monotonic() - last_used > self.idle_timeout:
+            connection.close()
+            connection = None
+        if connection is None:
+            connection = get_connection(self.backend, fail_silently=False)
+            connection.open()
+        return connection
+
+    def release(self, channel: str, connection: BaseEmailBackend) -> None:
+        with self._lock:
+            self._connections[channel] = (connection, time.monotonic())
+
+    def discard(self, connection: BaseEmailBackend) -> None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close_all(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, {}
+        for connection, _ in connections.values():
+            self.discard(connection)
+
+
+class EmailQueue:
+    """Holds serialised messages per channel until they are sent in bulk."""
+
+    # Whether the dispatcher should send right away instead of scheduling
+    # the Celery flush task.
+    flush_inline = False
+
+    def push(self, channel: str, payload: str, ttl: Optional[int] = None) -> int:
+        """Queue a message and return the channel's queue length.
+
+        With ``ttl`` the channel's queue is dropped once nothing has been
+        queued on it for ``ttl`` seconds.
+        """
+        raise NotImplementedError
+
+    def pop(self, channel: str, count: int) -> list[str]:
+        raise NotImplementedError
+
+    def requeue(
+        self, channel: str, payloads: list[str], ttl: Optional[int] = None
+    ) -> None:
+        raise NotImplementedError
+
+    def claim(self, key: str, window: float) -> bool:
+        """Return True the first time ``key`` is seen within ``window``."""
+        raise NotImplementedError
+
+
+class LocalEmailQueue(EmailQueue):
+    """In-process stand-in; the dispatcher flushes it inline."""
+
+    flush_inline = True
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._queues: dict[str, list[str]] = {}
+        self._claims: dict[str, float] = {}
+
+    def push(self, channel: str, payload: str, ttl: Optional[int] = None) -> int:
+        # Flushed inline, so nothing stays queued long enough to expire.
+        with self._lock:
+            queue = self._queues.setdefault(channel, [])
+            queue.append(payload)
+            return len(queue)
+
+    def pop(self, channel: str, count: int) -> list[str]:
+        with self._lock:
+            queue = self._queues.get(channel, [])
+            batch, self._queues[channel] = queue[:count], queue[count:]
+            return batch
+
+    def requeue(
+        self, channel: str, payloads: list[str], ttl: Optional[int] = None
+    ) -> None:
+        with self._lock:
+            self._queues[channel] = payloads + self._queues.get(channel, [])
+
+    def claim(self, key: str, window: float) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self._claims.get(key, 0) > now:
+                return False
+            self._claims[key] = now + window
+            return True
+
+
+class RedisEmailQueue(EmailQueue):
+    """Queue shared by web processes and drained by Celery workers."""
+
+    def __init__(self, prefix: str = "mail") -> None:
+        self.prefix = prefix
+        self.client = get_redis_connection()
+
+    def _write(self, command: str, channel: str, payloads: list[str], ttl) -> int:
+        key = f"{self.prefix}:queue:{channel}"
+        pipeline = self.client.pipeline()
+        getattr(pipeline, command)(key, *payloads)
+        if ttl:
+            pipeline.expire(key, ttl)
+        return int(pipeline.execute()[0])
+
+    def push(self, channel: str, payload: str, ttl: Optional[int] = None) -> int:
+        return self._write("rpush", channel, [payload], ttl)
+
+    def pop(self, channel: str, count: int) -> list[str]:
+        return self.client.lpop(f"{self.prefix}:queue:{channel}", count) or []
+
+    def requeue(
+        self, channel: str, payloads: list[str], ttl: Optional[int] = None
+    ) -> None:
+        if payloads:
+            self._write("lpush", channel, list(reversed(payloads)), ttl)
+
+    def claim(self, key: str, window: float) -> bool:
+        return bool(
+            self.client.set(
+                f"{self.prefix}:claim:{key}", 1, nx=True, px=max(int(window * 1000), 1)
+            )
+        )
+
+
+QUEUE_BACKENDS = {
+    "local": LocalEmailQueue,
+    "redis": RedisEmailQueue,
+}
+
+
+class EmailDispatcher:
+    """Renders, queues and sends transactional email in micro-batches.
+
+    Every message queued asks for a flush after the channel's linger time,
+    and one flush task is scheduled per linger window; messages queued in
+    the meantime ride along, and the flush sends them all over one pooled
+    SMTP session. A full batch also asks for one straight away. A message
+    the server refuses for good is dropped; on any other failure the
+    messages not yet sent go back on the queue for the next flush, and the
+    beat sweep flushes each channel regularly in case scheduling failed.
+
+    A channel's ``TTL`` bounds how long its messages may wait in Redis:
+    one-time codes are useless, and should not be kept, past their expiry.
+    """
+
+    def __init__(self, queue: EmailQueue, pool: ConnectionPool, config: dict) -> None:
+        self.queue = queue
+        self.pool = pool
+        self.batch_size = config["BATCH_SIZE"]
+        self.channels = config["CHANNELS"]
+
+    def send(
+        self,
+        subject: str,
+        template_name: str,
+        context: dict[str, Any],
+        to: list[str],
+        channel: str = "auth",
+        dedupe_key: Optional[str] = None,
+        dedupe_window: int = 0,
+    ) -> bool:
+        """Queue one message; returns False if it was deduplicated."""
+        if dedupe_key and not self.queue.claim(dedupe_key, dedupe_window):
+            logger.debug("Skipped duplicate email {}", dedupe_key)
+            emails_queued.inc(channel=channel, outcome="deduplicated")
+            return False
+
+        html, text = render_email(template_name, context)
+        message = EmailMultiAlternatives(
+            str(subject), text, settings.DEFAULT_FROM_EMAIL, to
+        )
+        message.attach_alternative(html, "text/html")
+        size = self.queue.push(
+            channel,
+            serialize_email(message, time.time()),
+            self.channels[channel].get("TTL"),
+        )
+        emails_queued.inc(channel=channel, outcome="queued")
+
+        if self.queue.flush_inline:
+            self.flush(channel)
+            return True
+        try:
+            self._schedule_flush(channel, size)
+        except Exception as e:
+            # The message is queued; the next message or the sweep sends it.
+            logger.warning("Failed to schedule the {} email flush: {!r}", channel, e)
+        return True
+
+    def _schedule_flush(self, channel: str, size: int) -> None:
+        from .tasks import flush_email_queue
+
+        # One flush per window and kind. As in OutboxRelay.schedule, the
+        # linger key outlives no message: anything queued while it is set
+        # was queued before the flush it scheduled starts reading.
+        window = max(self.channels[channel]["LINGER"], 0.001)
+        if size >= self.batch_size and self.queue.claim(f"flush-now:{channel}", window):
+            countdown = 0
+        elif self.queue.claim(f"flush:{channel}", window):
+            countdown = self.channels[channel]["LINGER"]
+        else:
+            return
+        flush_email_queue.apply_async(args=[channel], countdown=countdown)
+
+    def flush(self, channel: str) -> int:
+        """Send everything queued on ``channel``; returns messages sent."""
+        sent = 0
+        ttl = self.channels[channel].get("TTL")
+        while payloads := self.queue.pop(channel, self.batch_size):
+            payloads, messages = self._unexpired(channel, payloads, ttl)
+            if not messages:
+                continue
+            connection = self.pool.acquire(channel)
+            with start_span(
+                "smtp.send", "client", channel=channel, messages=len(messages)
+            ):
+                # One message at a time over the session, so a failure is
+                # pinned to its message and nothing is sent twice.
+                for index, message in enumerate(messages):
+                    try:
+                        sent += self._send_one(channel, connection, message)
+                    except Exception:
+                        email_send_failures.inc(channel=channel, permanent=False)
+                        self.pool.discard(connection)
+                        self.queue.requeue(channel, payloads[index:], ttl)
+                        raise
+            self.pool.release(channel, connection)
+        return sent
+
+    def _send_one(
+        self,
+        channel: str,
+        connection: BaseEmailBackend,
+        message: EmailMultiAlternatives,
+    ) -> int:
+        """Send one message; a permanent failure drops it and returns 0."""
+        try:
+            count = connection.send_messages([message]) or 0
+        except Exception as e:
+            if not is_permanent_failure(e):
+                raise
+            email_send_failures.inc(channel=channel, permanent=True)
+            logger.error("Dropped {} email to {}: {!r}", channel, message.to, e)
+            return 0
+        emails_sent.inc(count, channel=channel)
+        return count
+
+    def _unexpired(
+        self, channel: str, payloads: list[str], ttl: Optional[int]
+    ) -> tuple[list[str], list[EmailMultiAlternatives]]:
+        """Drop messages queued more than ``ttl`` seconds ago."""
+        cutoff = time.time() - ttl if ttl else None
+        kept, messages = [], []
+        for payload in payloads:
+            message, queued_at = deserialize_email(payload)
+            if cutoff is None or queued_at >= cutoff:
+                kept.append(payload)
+                messages.append(message)
+        if len(kept) < len(payloads):
+            logger.warning(
+                "Dropped {} {} emails queued longer than {}s",
+                len(payloads) - len(kept),
+                channel,
+                ttl,
+            )
+        return kept, messages
+
+
+def is_permanent_failure(error: Exception) -> bool:
+    """Whether resending the message can never succeed.
+
+    Refused recipients and 5xx replies are permanent; dropped connections,
+    timeouts and 4xx replies are worth retrying.
+    """
+    if isinstance(error, SMTPRecipientsRefused):
+        return True
+    if isinstance(error, SMTPResponseException):
+        return error.smtp_code >= 500
+    # Anything but SMTP and socket errors comes from the message itself,
+    # such as an address that cannot be encoded.
+    return not isinstance(error, (SMTPException, OSError))
+
+
+@lru_cache(maxsize=None)
+def get_email_dispatcher() -> EmailDispatcher:
+    config = settings.EMAIL_DISPATCH
+    return EmailDispatcher(
+        queue=QUEUE_BACKENDS[config["BACKEND"]](),
+        pool=ConnectionPool(config["SMTP_BACKEND"], config["POOL_IDLE_TIMEOUT"]),
+        config=config,
+    )
+
+
+@worker_process_shutdown.connect
+def close_pooled_connections(**kwargs: Any) -> None:
+    if get_email_dispatcher.cache_info().currsize:
+        get_email_dispatcher().pool.close_all()
@@ -0,0 +1,174 @@
+import logging
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from loguru import logger
+
+from interceptor import InterceptHandler, build_loguru_handlers, configure_logging
+
+STDLIB_LOGGER = "benchmark_logging"
+
+
+class LegacyInterceptHandler(logging.Handler):
+    """The bridge as it was: a level lookup under loguru's lock per record
+    and a frame walk whose condition never matches."""
+
+    def emit(self, record):
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+
+        frame, depth = logging.currentframe(), 2
+        while frame.f_code == logging.__file__:
+            frame = frame.f_back
+            depth += 1
+
+        logger.opt(depth=depth, exception=record.exc_info).log(
+            level, record.getMessage()
+        )
+
+
+def legacy_handlers(logs_dir: Path) -> list[dict]:
+    log_format = (
+        "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | "
+        "{name}:{function}:{line} - {message}"
+    )
+    common = {
+        "format": log_format,
+        "rotation": "10MB",
+        "retention": "30 days",
+        "compression": "zip",
+    }
+    return [
+        {
+            **common,
+            "level": "DEBUG",
+            "sink": logs_dir / "debug.log",
+            "filter": lambda record: record["level"].no <= logger.level("WARNING").no,
+        },
+        {
+            **common,
+            "level": "ERROR",
+            "sink": logs_dir / "error.log",
+            "backtrace": True,
+            "diagnose": True,
+        },
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the per-record cost of logging on the calling thread with "
+        "the old synchronous setup and the async/JSON pipeline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--records", type=int, default=5000)
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=5,
+            help="Rounds per scenario; the one with the lowest mean is reported",
+        )
+        parser.add_argument(
+            "--sample-rate",
+            type=float,
+            default=0.01,
+            help="Fraction kept in the sampled scenario",
+        )
+
+    def handle(self, *args, **options):
+        records = options["records"]
+        stdlib = logging.getLogger(STDLIB_LOGGER)
+        stdlib.propagate = False
+        stdlib.setLevel(logging.DEBUG)
+
+        pipeline = {
+            "MODE": "async",
+            "FORMAT": "json",
+            "LEVEL": "DEBUG",
+            "DIAGNOSE": False,
+            "SAMPLING": {},
+            "RATE_LIMITS": {},
+        }
+        scenarios = [
+            ("before: sync text", legacy_handlers, LegacyInterceptHandler),
+            (
+                "after: async json",
+                lambda logs_dir: build_loguru_handlers(pipeline, logs_dir),
+                InterceptHandler,
+            ),
+            (
+                "after: async json, sampled",
+                lambda logs_dir: build_loguru_handlers(
+                    {
+                        **pipeline,
+                        "SAMPLING": {
+                            __name__: options["sample_rate"],
+                            STDLIB_LOGGER: options["sample_rate"],
+                        },
+                    },
+                    logs_dir,
+                ),
+                InterceptHandler,
+            ),
+        ]
+
+        self.stdout.write(
+            f"{'scenario':<28}{'source':<9}{'mean us':>9}{'p50 us':>9}"
+            f"{'p99 us':>9}{'drain ms':>10}"
+        )
+        try:
+            for label, handlers, bridge in scenarios:
+                stdlib.handlers = [bridge()]
+                for source, emit in (
+                    (
+                        "loguru",
+                        lambda i: logger.info("record {} of {}", i, records),
+                    ),
+                    (
+                        "stdlib",
+                        lambda i: stdlib.info("record %s of %s", i, records),
+                    ),
+                ):
+                    with tempfile.TemporaryDirectory() as logs_dir:
+                        logger.configure(handlers=handlers(Path(logs_dir)))
+                        timings = min(
+                            (
+                                self._time(emit, records)
+                                for _ in range(options["rounds"])
+                            ),
+                            key=statistics.fmean,
+                        )
+                        # Removing the handlers waits for queued records to
+                        # reach the file, which is the cost moved off the
+                        # calling thread.
+                        started = time.perf_counter()
+                        logger.remove()
+                        drain = (time.perf_counter() - started) * 1000
+                    self._report(label, source, timings, drain)
+        finally:
+            stdlib.handlers = []
+            configure_logging(
+                settings.LOG_PIPELINE, settings.LOGS_DIR, settings.LOGGING
+            )
+
+    def _time(self, emit, records: int) -> list[float]:
+        timings = []
+        for i in range(records):
+            started = time.perf_counter_ns()
+            emit(i)
+            timings.append((time.perf_counter_ns() - started) / 1000)
+        return timings
+
+    def _report(self, label: str, source: str, timings: list[float], drain: float):
+        cuts = statistics.quantiles(timings, n=100, method="inclusive")
+        self.stdout.write(
+            f"{label:<28}{source:<9}{statistics.fmean(timings):>9.1f}"
+            f"{cuts[49]:>9.1f}{cuts[98]:>9.1f}{drain:>10.1f}"
+        )
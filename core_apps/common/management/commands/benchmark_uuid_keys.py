@@ -0,0 +1,68 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from psycopg2.extras import execute_values
+
+from core_apps.common.ids import uuid7
+
+GENERATORS = {
+    "uuid4": uuid.uuid4,
+    "uuid7": uuid7,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare insert throughput and primary-key index size of random "
+        "(uuid4) and time-ordered (uuid7) keys using temporary tables"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500_000)
+        parser.add_argument("--batch-size", type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("This benchmark needs PostgreSQL.")
+
+        rows, batch_size = options["rows"], options["batch_size"]
+        self.stdout.write(f"Inserting {rows} rows in batches of {batch_size}\n")
+        self.stdout.write(
+            f"{'key':<8}{'rows/s':>12}{'seconds':>10}{'index MB':>10}{'table MB':>10}"
+        )
+
+        for name, generate in GENERATORS.items():
+            table = f"bench_{name}"
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TEMP TABLE {table} "
+                    "(id uuid PRIMARY KEY, created_at timestamptz DEFAULT now(), "
+                    "payload text)"
+                )
+                started = time.perf_counter()
+                for offset in range(0, rows, batch_size):
+                    batch = [
+                        (str(generate()), "x" * 64)
+                        for _ in range(min(batch_size, rows - offset))
+                    ]
+                    execute_values(
+                        cursor.cursor,
+                        f"INSERT INTO {table} (id, payload) VALUES %s",
+                        batch,
+                        page_size=batch_size,
+                    )
+                elapsed = time.perf_counter() - started
+
+                cursor.execute(
+                    "SELECT pg_relation_size(%s), pg_relation_size(%s)",
+                    [f"{table}_pkey", table],
+                )
+                index_size, table_size = cursor.fetchone()
+                cursor.execute(f"DROP TABLE {table}")
+
+            self.stdout.write(
+                f"{name:<8}{rows / elapsed:>12,.0f}{elapsed:>10.2f}"
+                f"{index_size / 2**20:>10.1f}{table_size / 2**20:>10.1f}"
+            )
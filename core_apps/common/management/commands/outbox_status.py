@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core_apps.common.outbox import get_outbox_relay
+
+
+class Command(BaseCommand):
+    help = "Show the outbox backlog, relay lag and recent throughput"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--relay", action="store_true", help="Relay pending events first"
+        )
+
+    def handle(self, *args, **options):
+        relay = get_outbox_relay()
+        if options["relay"]:
+            self.stdout.write(f"Relayed {relay.relay()} events.")
+
+        metrics = relay.metrics()
+        self.stdout.write(f"Pending:    {metrics['pending']}")
+        self.stdout.write(f"Parked:     {metrics['parked']}")
+        self.stdout.write(f"Lag:        {metrics['lag_seconds']:.1f}s")
+        self.stdout.write(
+            f"Throughput: {metrics['delivered_per_second']:.1f} events/s "
+            "(last 5 minutes)"
+        )
@@ -0,0 +1,94 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def _value(value: dict):
+    return next(iter(value.values()), None)
+
+
+def flatten_spans(payload: dict):
+    """The spans of an OTLP/JSON export request, as flat dicts."""
+    for resource_spans in payload.get("resourceSpans", []):
+        resource = {
+            attribute["key"]: _value(attribute["value"])
+            for attribute in resource_spans.get("resource", {}).get("attributes", [])
+        }
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for span in scope_spans.get("spans", []):
+                start = int(span["startTimeUnixNano"])
+                end = int(span["endTimeUnixNano"])
+                yield {
+                    "trace_id": span["traceId"],
+                    "span_id": span["spanId"],
+                    "parent_id": span.get("parentSpanId"),
+                    "name": span["name"],
+                    "service": resource.get("service.name"),
+                    "pid": resource.get("process.pid"),
+                    "start_ns": start,
+                    "duration_ms": (end - start) / 1e6,
+                    "attributes": {
+                        attribute["key"]: _value(attribute["value"])
+                        for attribute in span.get("attributes", [])
+                    },
+                    "error": span.get("status", {}).get("message"),
+                }
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a stand-in OTLP/HTTP collector for development: accepts JSON "
+        "exports on /v1/traces and appends the spans to a JSONL file"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=4318)
+        parser.add_argument(
+            "--output", default=str(Path(settings.LOGS_DIR) / "collected-traces.jsonl")
+        )
+
+    def handle(self, *args, **options):
+        output = Path(options["output"])
+        stdout = self.stdout
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != "/v1/traces":
+                    self.send_error(404)
+                    return
+                try:
+                    body = self.rfile.read(int(self.headers["Content-Length"]))
+                    spans = list(flatten_spans(json.loads(body)))
+                except (TypeError, ValueError, KeyError):
+                    self.send_error(400)
+                    return
+                with output.open("a", encoding="utf8") as out:
+                    out.writelines(json.dumps(span) + "\n" for span in spans)
+                for span in spans:
+                    stdout.write(
+                        f"{span['trace_id'][:8]} {span['duration_ms']:9.2f}ms "
+                        f"{span['name']}"
+                    )
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((options["host"], options["port"]), Handler)
+        self.stdout.write(
+            f"Collecting spans on http://{options['host']}:{options['port']}"
+            f"/v1/traces into {output}"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
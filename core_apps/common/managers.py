@@ -0,0 +1,68 @@
+from datetime import datetime
+from typing import Any, Optional
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.db.models import Sum
+
+
+class ViewRollupQuerySet(models.QuerySet):
+    def between(
+        self, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> "ViewRollupQuerySet":
+        queryset = self
+        if since is not None:
+            queryset = queryset.filter(bucket_start__gte=since)
+        if until is not None:
+            queryset = queryset.filter(bucket_start__lt=until)
+        return queryset
+
+    def series(
+        self,
+        period: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> list[tuple[datetime, int]]:
+        """Return ``(bucket_start, views)`` pairs, summed by the database."""
+        rows = (
+            self.filter(period=period)
+            .between(since, until)
+            .values("bucket_start")
+            .annotate(total=Sum("views"))
+            .order_by("bucket_start")
+            .values_list("bucket_start", "total")
+        )
+        return list(rows)
+
+    def total(
+        self,
+        period: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> int:
+        result = (
+            self.filter(period=period)
+            .between(since, until)
+            .aggregate(total=Sum("views"))
+        )
+        return result["total"] or 0
+
+
+class ContentViewRollupQuerySet(ViewRollupQuerySet):
+    def for_object(self, content_object: Any) -> "ContentViewRollupQuerySet":
+        return self.filter(
+            content_type=ContentType.objects.get_for_model(content_object),
+            object_id=content_object.pk,
+        )
+
+
+class UserViewRollupQuerySet(ViewRollupQuerySet):
+    def for_user(self, user: Any) -> "UserViewRollupQuerySet":
+        return self.filter(user=user)
+
+    def for_content_type(self, model: Any) -> "UserViewRollupQuerySet":
+        return self.filter(content_type=ContentType.objects.get_for_model(model))
+
+
+ContentViewRollupManager = models.Manager.from_queryset(ContentViewRollupQuerySet)
+UserViewRollupManager = models.Manager.from_queryset(UserViewRollupQuerySet)
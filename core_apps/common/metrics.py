@@ -0,0 +1,380 @@
+import atexit
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+
+from celery.signals import (
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+    task_retry,
+    worker_process_shutdown,
+)
+from django.conf import settings
+from loguru import logger
+
+from .redis_client import get_redis_connection
+
+_registry: dict[str, "Metric"] = {}
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _series(name: str, labels: Iterable[tuple[str, Any]]) -> str:
+    """The sample name as written in the exposition format, e.g.
+    ``http_request_duration_seconds_bucket{route="login",le="0.1"}``."""
+    pairs = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return f"{name}{{{pairs}}}" if pairs else name
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        if _registry.setdefault(name, self) is not self:
+            raise ValueError(f"Metric {name!r} is already registered")
+
+    def _labels(self, labels: dict[str, Any]) -> tuple[tuple[str, str], ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def sample_names(self) -> tuple[str, ...]:
+        return (self.name,)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        get_metrics_recorder().add({_series(self.name, self._labels(labels)): amount})
+
+
+class Histogram(Metric):
+    """Cumulative buckets, kept as one counter per bucket like Prometheus'."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = (),
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Sample names per label set: the buckets (+Inf last), sum and count.
+        self._names: dict[tuple, tuple[list[str], str, str]] = {}
+
+    def _sample_names(self, labels: tuple) -> tuple[list[str], str, str]:
+        names = self._names.get(labels)
+        if names is None:
+            buckets = [
+                _series(f"{self.name}_bucket", (*labels, ("le", bound)))
+                for bound in (*map(repr, map(float, self.buckets)), "+Inf")
+            ]
+            names = self._names[labels] = (
+                buckets,
+                _series(f"{self.name}_sum", labels),
+                _series(f"{self.name}_count", labels),
+            )
+        return names
+
+    def observe(self, value: float, **labels: Any) -> None:
+        buckets, sum_name, count_name = self._sample_names(self._labels(labels))
+        deltas = dict.fromkeys(buckets[bisect_left(self.buckets, value) :], 1)
+        deltas[sum_name] = value
+        deltas[count_name] = 1
+        get_metrics_recorder().add(deltas)
+
+    def sample_names(self) -> tuple[str, ...]:
+        return tuple(f"{self.name}_{suffix}" for suffix in ("bucket", "sum", "count"))
+
+
+class MetricsStore:
+    """Where every process adds its samples and the exporter reads them."""
+
+    # Whether samples should be added as they are recorded instead of in
+    # batches from the flush thread.
+    flush_inline = False
+
+    def add(self, deltas: dict[str, float]) -> None:
+        raise NotImplementedError
+
+    def collect(self) -> dict[str, float]:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class LocalMetricsStore(MetricsStore):
+    """In-process stand-in; a scrape only sees the process serving it."""
+
+    flush_inline = True
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: dict[str, float] = {}
+
+    def add(self, deltas: dict[str, float]) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                self._values[name] = self._values.get(name, 0) + delta
+
+    def collect(self) -> dict[str, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class RedisMetricsStore(MetricsStore):
+    """One Redis hash shared by every web and Celery worker process.
+
+    HINCRBYFLOAT is atomic, so processes add their deltas without
+    coordinating and any of them can serve the totals.
+    """
+
+    def __init__(self, key: str = "metrics") -> None:
+        self.key = key
+        self.client = get_redis_connection()
+
+    def add(self, deltas: dict[str, float]) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        for name, delta in deltas.items():
+            pipeline.hincrbyfloat(self.key, name, delta)
+        pipeline.execute()
+
+    def collect(self) -> dict[str, float]:
+        return {
+            name.decode(): float(value)
+            for name, value in self.client.hgetall(self.key).items()
+        }
+
+    def clear(self) -> None:
+        self.client.delete(self.key)
+
+
+METRICS_BACKENDS = {
+    "local": LocalMetricsStore,
+    "redis": RedisMetricsStore,
+}
+
+
+class MetricsRecorder:
+    """Per-process buffer of sample deltas flushed by a background thread.
+
+    Recording is a few dict additions under a lock; every
+    ``flush_interval`` seconds the thread sends the accumulated deltas to
+    the store in one round trip, and the buffer is flushed again when the
+    process exits. If the store is unreachable the deltas are kept and
+    merged into the next flush.
+    """
+
+    def __init__(self, store: MetricsStore, flush_interval: float) -> None:
+        self.store = store
+        self.flush_interval = flush_interval
+        self._reset()
+        # A forked worker must not send its parent's samples a second time.
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.flush)
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, deltas: dict[str, float]) -> None:
+        if self.store.flush_inline:
+            self.store.add(deltas)
+            return
+        with self._lock:
+            pending = self._pending
+            for name, delta in deltas.items():
+                pending[name] = pending.get(name, 0) + delta
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="metrics-flusher", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush metrics")
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            self.store.add(pending)
+        except Exception:
+            with self._lock:
+                for name, delta in pending.items():
+                    self._pending[name] = self._pending.get(name, 0) + delta
+            raise
+
+    def collect(self) -> dict[str, float]:
+        """Totals across every process, this one's pending samples included."""
+        self.flush()
+        return self.store.collect()
+
+
+@lru_cache(maxsize=None)
+def get_metrics_recorder() -> MetricsRecorder:
+    config = settings.METRICS
+    return MetricsRecorder(
+        METRICS_BACKENDS[config["BACKEND"]](), config["FLUSH_INTERVAL"]
+    )
+
+
+_LE = re.compile(r'le="([^"]+)"')
+
+
+def _sort_key(sample: str) -> tuple:
+    # Buckets in numeric order within each label set.
+    match = _LE.search(sample)
+    if match is None:
+        return (sample, 0.0)
+    return (sample[: match.start()], float(match.group(1)))
+
+
+def render_metrics(values: dict[str, float]) -> str:
+    """Prometheus text exposition of ``values`` for the registered metrics."""
+    by_sample_name: dict[str, list[str]] = {}
+    for sample in values:
+        by_sample_name.setdefault(sample.split("{", 1)[0], []).append(sample)
+
+    lines = []
+    for metric in _registry.values():
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for sample_name in metric.sample_names():
+            for sample in sorted(by_sample_name.get(sample_name, ()), key=_sort_key):
+                lines.append(f"{sample} {values[sample]:g}")
+    return "\n".join(lines) + "\n"
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time to handle a request, by route.",
+    ["route", "method", "status"],
+    LATENCY_BUCKETS,
+)
+http_sampled_requests = Counter(
+    "http_sampled_requests_total",
+    "Requests whose queries were counted, by route.",
+    ["route"],
+)
+http_db_queries = Counter(
+    "http_db_queries_total", "Queries run by sampled requests.", ["route"]
+)
+http_duplicate_queries = Counter(
+    "http_duplicate_queries_total",
+    "Queries that repeated an earlier one in the same sampled request.",
+    ["route"],
+)
+http_db_seconds = Counter(
+    "http_db_seconds_total", "Database time of sampled requests.", ["route"]
+)
+http_budget_exceeded = Counter(
+    "http_budget_exceeded_total",
+    "Sampled requests over their view's query budget.",
+    ["route"],
+)
+otp_issued = Counter("otp_issued_total", "One-time codes issued.")
+otp_verifications = Counter(
+    "otp_verifications_total", "One-time code checks, by outcome.", ["outcome"]
+)
+account_lockouts = Counter("account_lockouts_total", "Accounts locked.")
+content_views_recorded = Counter(
+    "content_views_recorded_total", "ContentView.record_view calls.", ["buffered"]
+)
+emails_queued = Counter(
+    "emails_queued_total", "Emails handed to the dispatcher.", ["channel", "outcome"]
+)
+emails_sent = Counter("emails_sent_total", "Emails sent over SMTP.", ["channel"])
+email_send_failures = Counter(
+    "email_send_failures_total",
+    "Failed SMTP sends; permanent failures are dropped.",
+    ["channel", "permanent"],
+)
+celery_tasks = Counter(
+    "celery_tasks_total", "Finished task runs, by final state.", ["task", "state"]
+)
+celery_task_retries = Counter(
+    "celery_task_retries_total", "Task retries requested.", ["task"]
+)
+celery_task_runtime = Histogram(
+    "celery_task_runtime_seconds", "Task run time.", ["task"], TASK_BUCKETS
+)
+celery_task_queue_wait = Histogram(
+    "celery_task_queue_wait_seconds",
+    "Time from publish (or ETA) until a worker starts the task.",
+    ["task"],
+    TASK_BUCKETS,
+)
+
+_task_started: dict[str, float] = {}
+
+
+@before_task_publish.connect
+def stamp_published_at(headers: Optional[dict] = None, **kwargs: Any) -> None:
+    if headers is not None:
+        headers.setdefault("published_at", time.time())
+
+
+@task_prerun.connect
+def start_task_timer(task_id: str, task: Any, **kwargs: Any) -> None:
+    _task_started[task_id] = time.perf_counter()
+    published_at = getattr(task.request, "published_at", None)
+    if published_at is None:
+        return
+    ready_at = published_at
+    eta = getattr(task.request, "eta", None)
+    if eta:
+        ready_at = max(ready_at, datetime.fromisoformat(eta).timestamp())
+    celery_task_queue_wait.observe(max(time.time() - ready_at, 0), task=task.name)
+
+
+@task_postrun.connect
+def stop_task_timer(
+    task_id: str, task: Any, state: Optional[str] = None, **kwargs: Any
+) -> None:
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        celery_task_runtime.observe(time.perf_counter() - started, task=task.name)
+    celery_tasks.inc(task=task.name, state=state or "UNKNOWN")
+
+
+@task_retry.connect
+def count_task_retry(sender: Any = None, **kwargs: Any) -> None:
+    celery_task_retries.inc(task=getattr(sender, "name", "unknown"))
+
+
+@worker_process_shutdown.connect
+def flush_metrics(**kwargs: Any) -> None:
+    if get_metrics_recorder.cache_info().currsize:
+        get_metrics_recorder().flush()
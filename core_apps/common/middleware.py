@@ -0,0 +1,224 @@
+import random
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpRequest, HttpResponse
+
+from .budgets import enforce_db_time_budget, enforce_query_budget, get_view_budget
+from .metrics import (
+    http_budget_exceeded,
+    http_db_queries,
+    http_db_seconds,
+    http_duplicate_queries,
+    http_request_duration,
+    http_sampled_requests,
+)
+from .tracing import start_root_span
+
+# Anything else is reported as "other" to keep the label set bounded.
+HTTP_METHODS = frozenset(
+    ["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "TRACE"]
+)
+
+
+class RequestStats:
+    """Queries run while handling one request, timed as they execute."""
+
+    __slots__ = ("queries", "db_time", "statements")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements: Counter = Counter()
+
+    def __call__(self, execute, sql, params, many, context) -> Any:
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.statements[(sql, repr(params))] += 1
+
+    @property
+    def duplicates(self) -> int:
+        """Queries that repeated an earlier one, parameters included."""
+        return sum(count - 1 for count in self.statements.values())
+
+
+_current_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def _record_query(execute, sql, params, many, context) -> Any:
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs) -> None:
+    # One wrapper per connection for its whole life rather than
+    # connection.execute_wrapper() per request: connections are per thread,
+    # and an async view's queries run on a worker thread whose connection
+    # the middleware never sees. The context variable follows the request
+    # there, and unsampled requests pay one lookup per query.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class RequestInstrumentationMiddleware:
+    """Times every request and counts the queries of a sample of them.
+
+    Every request's duration goes to ``http_request_duration_seconds`` by
+    route. ``settings.REQUEST_INSTRUMENTATION["SAMPLE_RATE"]`` of requests
+    are also measured: query count, database time and duplicate queries
+    go to the ``http_db_*`` metrics, to ``X-DB-*`` response headers when
+    ``HEADERS`` is on, and are checked against the view's
+    ``@query_budget``. Put it first in ``MIDDLEWARE`` so the session and
+    user lookups are counted too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        self.config = settings.REQUEST_INSTRUMENTATION
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self) -> bool:
+        return self.config["ENABLED"] and random.random() < self.config["SAMPLE_RATE"]
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        if not self._sampled():
+            response = self.get_response(request)
+            return self._finish(request, response, None, started)
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        return self._finish(request, response, stats, started)
+
+    async def __acall__(self, request: HttpRequest) -> Any:
+        started = time.perf_counter()
+        if not self._sampled():
+            response = await self.get_response(request)
+            return self._finish(request, response, None, started)
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        return self._finish(request, response, stats, started)
+
+    def _finish(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        stats: Optional[RequestStats],
+        started: float,
+    ) -> HttpResponse:
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        route = (match.view_name or match._func_path) if match else "unresolved"
+        http_request_duration.observe(
+            elapsed,
+            route=route,
+            method=request.method if request.method in HTTP_METHODS else "other",
+            status=response.status_code,
+        )
+        if stats is None:
+            return response
+
+        http_sampled_requests.inc(route=route)
+        http_db_queries.inc(stats.queries, route=route)
+        http_duplicate_queries.inc(stats.duplicates, route=route)
+        http_db_seconds.inc(stats.db_time, route=route)
+
+        budget = get_view_budget(match.func) if match else None
+        if budget is not None:
+            raise_on_exceed = self.config["RAISE"]
+            queries_ok = enforce_query_budget(
+                route, stats.queries, budget.queries, raise_on_exceed
+            )
+            db_time_ok = enforce_db_time_budget(
+                route, stats.db_time * 1000, budget.db_time_ms, raise_on_exceed
+            )
+            if not (queries_ok and db_time_ok):
+                http_budget_exceeded.inc(route=route)
+
+        if self.config["HEADERS"]:
+            response["X-DB-Queries"] = str(stats.queries)
+            response["X-DB-Duplicate-Queries"] = str(stats.duplicates)
+            response["X-DB-Time-Ms"] = f"{stats.db_time * 1000:.1f}"
+            response["X-Request-Time-Ms"] = f"{elapsed * 1000:.1f}"
+        return response
+
+
+class TracingMiddleware:
+    """Opens the root span of each request, or continues the trace of an
+    incoming ``traceparent`` header.
+
+    Queries, storage calls, email sends and the Celery tasks queued while
+    handling the request become its children. Recorded traces return
+    their id as ``X-Trace-Id``. Put it first in ``MIDDLEWARE``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _span(self, request: HttpRequest):
+        return start_root_span(
+            f"{request.method} {request.path}",
+            "server",
+            request.headers.get("traceparent"),
+            **{"http.method": request.method, "http.target": request.path},
+        )
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self._span(request) as span:
+            response = self.get_response(request)
+            self._finish(request, response, span)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> Any:
+        with self._span(request) as span:
+            response = await self.get_response(request)
+            self._finish(request, response, span)
+        return response
+
+    def _finish(self, request: HttpRequest, response: HttpResponse, span) -> None:
+        if span is None or not span.sampled:
+            return
+        match = request.resolver_match
+        if match:
+            route = match.view_name or match._func_path
+            span.name = f"{request.method} {route}"
+            span.set_attribute("http.route", route)
+        span.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.error = f"HTTP {response.status_code}"
+        response["X-Trace-Id"] = span.trace_id
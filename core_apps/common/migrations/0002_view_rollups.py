@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0001_initial'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentViewRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4, verbose_name='Period')),
+                ('bucket_start', models.DateTimeField(verbose_name='Bucket start')),
+                ('views', models.PositiveBigIntegerField(default=0, verbose_name='Views')),
+                ('object_id', models.UUIDField(verbose_name='Object Id')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='Content Type')),
+            ],
+            options={
+                'verbose_name': 'Content View Rollup',
+                'verbose_name_plural': 'Content View Rollups',
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id', 'period', 'bucket_start'), name='unique_content_view_rollup_bucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserViewRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4, verbose_name='Period')),
+                ('bucket_start', models.DateTimeField(verbose_name='Bucket start')),
+                ('views', models.PositiveBigIntegerField(default=0, verbose_name='Views')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='Content Type')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_rollups', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'User View Rollup',
+                'verbose_name_plural': 'User View Rollups',
+                'constraints': [models.UniqueConstraint(fields=('user', 'period', 'bucket_start', 'content_type'), name='unique_user_view_rollup_bucket')],
+            },
+        ),
+    ]
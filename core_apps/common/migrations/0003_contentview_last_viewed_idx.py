@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0002_view_rollups'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contentview',
+            index=models.Index(fields=['last_viewed', 'id'], name='contentview_last_viewed_idx'),
+        ),
+    ]
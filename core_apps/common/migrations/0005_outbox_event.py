@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:22
+
+import core_apps.common.fields
+import core_apps.common.ids
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0004_time_ordered_uuid_pk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', core_apps.common.fields.TimeOrderedUUIDField(default=core_apps.common.ids.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('topic', models.CharField(max_length=100, verbose_name='Topic')),
+                ('payload', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Payload')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='Delivered at')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('last_error', models.TextField(blank=True, verbose_name='Last error')),
+            ],
+            options={
+                'verbose_name': 'Outbox Event',
+                'verbose_name_plural': 'Outbox Events',
+                'indexes': [models.Index(condition=models.Q(('delivered_at__isnull', True)), fields=['id'], name='outboxevent_pending_idx'), models.Index(condition=models.Q(('delivered_at__isnull', False)), fields=['delivered_at'], name='outboxevent_delivered_idx')],
+            },
+        ),
+    ]
@@ -1,18 +1,41 @@
-import uuid
-from typing import Any, Optional
+from typing import Any, Iterable, Optional
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import IntegrityError, models
+from django.core.exceptions import SynchronousOnlyOperation
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .buffers import (
+    BufferedBatch,
+    PendingView,
+    ViewBuffer,
+    ViewTally,
+    get_view_buffer,
+)
+from .fields import TimeOrderedUUIDField
+from .managers import ContentViewRollupManager, UserViewRollupManager
+from .metrics import content_views_recorded
+
 User = get_user_model()
 
 
+async def _aget_content_type(content_object: Any) -> ContentType:
+    # get_for_model caches per process; only the first lookup of a model
+    # touches the database and needs a worker thread.
+    try:
+        return ContentType.objects.get_for_model(content_object)
+    except SynchronousOnlyOperation:
+        return await sync_to_async(ContentType.objects.get_for_model)(content_object)
+
+
 class TimeStampedModel(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = TimeOrderedUUIDField(primary_key=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -43,6 +66,12 @@ class ContentView(TimeStampedModel):
         verbose_name = _("Content View")
         verbose_name_plural = _("Content Views")
         unique_together = ["content_type", "object_id"]
+        indexes = [
+            # Backs the admin's keyset pagination and date drill-down.
+            models.Index(
+                fields=["last_viewed", "id"], name="contentview_last_viewed_idx"
+            )
+        ]
 
     def __str__(self) -> str:
         return (
@@ -52,9 +81,21 @@ class ContentView(TimeStampedModel):
 
     @classmethod
     def record_view(
-        cls, content_object: Any, user: Optional[User], viewer_ip: Optional["str"]
+        cls,
+        content_object: Any,
+        user: Optional[User],
+        viewer_ip: Optional["str"],
+        buffered: Optional[bool] = None,
     ) -> None:
+        if buffered is None:
+            buffered = settings.CONTENT_VIEW_BUFFER["ENABLED"]
+        content_views_recorded.inc(buffered=buffered)
+        if buffered:
+            cls._buffer_view(content_object, user, viewer_ip)
+            return
+
         content_type = ContentType.objects.get_for_model(content_object)
+        viewed_at = timezone.now()
 
         try:
             view, create = cls.objects.get_or_create(
@@ -63,11 +104,272 @@ class ContentView(TimeStampedModel):
                 defaults={
                     "user": user,
                     "viewer_ip": viewer_ip,
-                    "last_viewed": timezone.now(),
+                    "last_viewed": viewed_at,
                 },
             )
             if not create:
-                view.last_viewed = timezone.now()
+                view.last_viewed = viewed_at
                 view.save()
         except IntegrityError:
             pass
+
+        if settings.CONTENT_VIEW_ROLLUPS_ENABLED:
+            from .rollups import increment_view_rollups
+
+            increment_view_rollups(
+                [
+                    ViewTally(
+                        content_type_id=content_type.pk,
+                        object_id=str(content_object.id),
+                        user_id=str(user.pk) if user else None,
+                        bucket_start=viewed_at,
+                    )
+                ]
+            )
+
+    @classmethod
+    async def arecord_view(
+        cls,
+        content_object: Any,
+        user: Optional[User],
+        viewer_ip: Optional[str],
+        buffered: Optional[bool] = None,
+    ) -> None:
+        """Async ``record_view`` for ASGI views."""
+        if buffered is None:
+            buffered = settings.CONTENT_VIEW_BUFFER["ENABLED"]
+        content_type = await _aget_content_type(content_object)
+        viewed_at = timezone.now()
+        if buffered:
+            await cls._abuffer_view(content_type, content_object, user, viewer_ip)
+            return
+
+        try:
+            view, create = await cls.objects.aget_or_create(
+                content_type=content_type,
+                object_id=content_object.id,
+                defaults={
+                    "user": user,
+                    "viewer_ip": viewer_ip,
+                    "last_viewed": viewed_at,
+                },
+            )
+            if not create:
+                view.last_viewed = viewed_at
+                await view.asave()
+        except IntegrityError:
+            pass
+
+        if settings.CONTENT_VIEW_ROLLUPS_ENABLED:
+            from .rollups import increment_view_rollups
+
+            # The rollup upsert is raw SQL, which Django only runs synchronously.
+            await sync_to_async(increment_view_rollups)(
+                [
+                    ViewTally(
+                        content_type_id=content_type.pk,
+                        object_id=str(content_object.id),
+                        user_id=str(user.pk) if user else None,
+                        bucket_start=viewed_at,
+                    )
+                ]
+            )
+
+    @classmethod
+    async def _abuffer_view(
+        cls,
+        content_type: ContentType,
+        content_object: Any,
+        user: Optional[User],
+        viewer_ip: Optional[str],
+    ) -> None:
+        buffer = get_view_buffer()
+        size = await buffer.aadd(
+            PendingView(
+                content_type_id=content_type.pk,
+                object_id=str(content_object.id),
+                user_id=str(user.pk) if user else None,
+                viewer_ip=viewer_ip,
+                last_viewed=timezone.now(),
+            )
+        )
+        if not await buffer.ashould_flush(size):
+            return
+
+        if buffer.flush_inline:
+            await sync_to_async(cls.flush_buffer)(buffer)
+        else:
+            from .tasks import flush_content_views
+
+            await sync_to_async(flush_content_views.delay)()
+
+    @classmethod
+    def _buffer_view(
+        cls, content_object: Any, user: Optional[User], viewer_ip: Optional[str]
+    ) -> None:
+        buffer = get_view_buffer()
+        size = buffer.add(
+            PendingView(
+                content_type_id=ContentType.objects.get_for_model(content_object).pk,
+                object_id=str(content_object.id),
+                user_id=str(user.pk) if user else None,
+                viewer_ip=viewer_ip,
+                last_viewed=timezone.now(),
+            )
+        )
+        if not buffer.should_flush(size):
+            return
+
+        if buffer.flush_inline:
+            cls.flush_buffer(buffer)
+        else:
+            from .tasks import flush_content_views
+
+            flush_content_views.delay()
+
+    @classmethod
+    def flush_buffer(cls, buffer: ViewBuffer) -> int:
+        """Drain ``buffer`` and persist it, handing it back on failure."""
+        batch = buffer.drain()
+        try:
+            written = cls.flush_batch(batch)
+        except Exception:
+            buffer.restore(batch)
+            raise
+        buffer.ack(batch)
+        return written
+
+    @classmethod
+    def flush_batch(cls, batch: BufferedBatch) -> int:
+        """Persist a drained buffer: latest views plus rollup counters."""
+        with transaction.atomic():
+            written = cls.bulk_upsert(batch.views)
+            if settings.CONTENT_VIEW_ROLLUPS_ENABLED:
+                from .rollups import increment_view_rollups
+
+                increment_view_rollups(batch.tallies)
+        return written
+
+    @classmethod
+    def bulk_upsert(cls, views: Iterable[PendingView]) -> int:
+        """Write coalesced views with a single INSERT ... ON CONFLICT per batch."""
+        rows = [
+            cls(
+                content_type_id=view.content_type_id,
+                object_id=view.object_id,
+                user_id=view.user_id,
+                viewer_ip=view.viewer_ip,
+                last_viewed=view.last_viewed,
+            )
+            for view in views
+        ]
+        if not rows:
+            return 0
+
+        cls.objects.bulk_create(
+            rows,
+            batch_size=settings.CONTENT_VIEW_BUFFER["MAX_SIZE"],
+            update_conflicts=True,
+            unique_fields=["content_type", "object_id"],
+            update_fields=["user", "viewer_ip", "last_viewed", "updated_at"],
+        )
+        return len(rows)
+
+
+class ViewRollup(models.Model):
+    class Period(models.TextChoices):
+        HOUR = ("hour", _("Hour"))
+        DAY = ("day", _("Day"))
+
+    period = models.CharField(_("Period"), max_length=4, choices=Period.choices)
+    bucket_start = models.DateTimeField(_("Bucket start"))
+    views = models.PositiveBigIntegerField(_("Views"), default=0)
+
+    class Meta:
+        abstract = True
+
+
+class ContentViewRollup(ViewRollup):
+    content_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, verbose_name=_("Content Type")
+    )
+    object_id = models.UUIDField(verbose_name=_("Object Id"))
+    content_object = GenericForeignKey("content_type", "object_id")
+
+    objects = ContentViewRollupManager()
+
+    class Meta:
+        verbose_name = _("Content View Rollup")
+        verbose_name_plural = _("Content View Rollups")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["content_type", "object_id", "period", "bucket_start"],
+                name="unique_content_view_rollup_bucket",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.content_type} {self.object_id} {self.period} {self.bucket_start}"
+
+
+class UserViewRollup(ViewRollup):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="view_rollups",
+        verbose_name=_("User"),
+    )
+    content_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, verbose_name=_("Content Type")
+    )
+
+    objects = UserViewRollupManager()
+
+    class Meta:
+        verbose_name = _("User View Rollup")
+        verbose_name_plural = _("User View Rollups")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "period", "bucket_start", "content_type"],
+                name="unique_user_view_rollup_bucket",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.user_id} {self.content_type} {self.period} {self.bucket_start}"
+
+
+class OutboxEvent(models.Model):
+    """A domain event written in the transaction that caused it.
+
+    Rows are relayed to the broker after commit (see ``outbox.py``), so an
+    event exists if and only if its transaction committed.
+    """
+
+    id = TimeOrderedUUIDField(primary_key=True)
+    topic = models.CharField(_("Topic"), max_length=100)
+    payload = models.JSONField(_("Payload"), default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
+    delivered_at = models.DateTimeField(_("Delivered at"), null=True, blank=True)
+    attempts = models.PositiveIntegerField(_("Attempts"), default=0)
+    last_error = models.TextField(_("Last error"), blank=True)
+
+    class Meta:
+        verbose_name = _("Outbox Event")
+        verbose_name_plural = _("Outbox Events")
+        indexes = [
+            # The relay's queue: only undelivered rows, in id (time) order.
+            models.Index(
+                fields=["id"],
+                name="outboxevent_pending_idx",
+                condition=models.Q(delivered_at__isnull=True),
+            ),
+            models.Index(
+                fields=["delivered_at"],
+                name="outboxevent_delivered_idx",
+                condition=models.Q(delivered_at__isnull=False),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.topic} {self.id}"
@@ -0,0 +1,243 @@
+import time
+from datetime import timedelta
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from loguru import logger
+
+from .models import OutboxEvent
+from .redis_client import get_redis_connection
+
+Handler = Callable[[dict[str, Any]], Any]
+
+_handlers: dict[str, Handler] = {}
+
+
+def outbox_handler(topic: str) -> Callable[[Handler], Handler]:
+    """Register the function that consumes events published on ``topic``.
+
+    Handlers run in a Celery worker (or inline with the local publisher) and
+    may see an event more than once, so they must be idempotent.
+    """
+
+    def register(handler: Handler) -> Handler:
+        if _handlers.setdefault(topic, handler) is not handler:
+            raise ValueError(f"Outbox topic {topic!r} already has a handler")
+        return handler
+
+    return register
+
+
+def dispatch_event(topic: str, payload: dict[str, Any]) -> Any:
+    try:
+        handler = _handlers[topic]
+    except KeyError:
+        raise LookupError(f"No outbox handler for topic {topic!r}") from None
+    return handler(payload)
+
+
+def publish_event(topic: str, payload: dict[str, Any]) -> OutboxEvent:
+    """Record an event in the current transaction.
+
+    Nothing leaves the process until the transaction commits, and a rolled
+    back transaction takes its events with it. After commit the relay is
+    nudged; the periodic relay task picks up anything the nudge misses.
+    """
+    event = OutboxEvent.objects.create(topic=topic, payload=payload)
+    transaction.on_commit(lambda: get_outbox_relay().schedule(), robust=True)
+    return event
+
+
+class OutboxPublisher:
+    """Hands relayed events to whatever runs their handlers."""
+
+    # Whether a commit should relay straight away instead of scheduling the
+    # Celery relay task.
+    relay_inline = False
+
+    def publish(self, events: list[OutboxEvent]) -> dict[Any, str]:
+        """Publish ``events``; returns the error of each that failed, by id."""
+        raise NotImplementedError
+
+
+class LocalOutboxPublisher(OutboxPublisher):
+    """In-process stand-in that runs handlers directly; for tests and dev."""
+
+    relay_inline = True
+
+    def publish(self, events: list[OutboxEvent]) -> dict[Any, str]:
+        errors = {}
+        for event in events:
+            try:
+                # A savepoint, so a failing handler leaves the relay's
+                # transaction usable for the rest of the batch.
+                with transaction.atomic():
+                    dispatch_event(event.topic, event.payload)
+            except Exception as e:
+                logger.exception("Outbox handler for {} failed", event.topic)
+                errors[event.pk] = repr(e)
+        return errors
+
+
+class CeleryOutboxPublisher(OutboxPublisher):
+    """Publishes each event as a ``handle_outbox_event`` task message.
+
+    A batch goes out over one pooled broker connection. The task id is the
+    event id, so a consumer can tell a redelivered event from a new one.
+    """
+
+    def publish(self, events: list[OutboxEvent]) -> dict[Any, str]:
+        from .tasks import handle_outbox_event
+
+        errors = {}
+        with handle_outbox_event.app.producer_or_acquire() as producer:
+            for event in events:
+                try:
+                    handle_outbox_event.apply_async(
+                        args=[event.topic, event.payload],
+                        task_id=str(event.pk),
+                        producer=producer,
+                        retry=False,
+                    )
+                except Exception as e:
+                    errors[event.pk] = repr(e)
+        if errors:
+            logger.warning("Failed to publish {} outbox events", len(errors))
+        return errors
+
+
+PUBLISHER_BACKENDS = {
+    "local": LocalOutboxPublisher,
+    "celery": CeleryOutboxPublisher,
+}
+
+
+class OutboxRelay:
+    """Moves committed events from the outbox table to the publisher.
+
+    Each batch is claimed with ``FOR UPDATE SKIP LOCKED``, so concurrent
+    relays take disjoint batches, then published and marked delivered with
+    one UPDATE in the same transaction. Publishing happens before commit:
+    a crash in between republishes the batch (at-least-once), never loses
+    it. Events that fail ``max_attempts`` times stay in the table, parked,
+    until someone resets their attempts.
+    """
+
+    def __init__(self, publisher: OutboxPublisher, config: dict) -> None:
+        self.publisher = publisher
+        self.batch_size = config["BATCH_SIZE"]
+        self.max_batches = config["MAX_BATCHES"]
+        self.max_attempts = config["MAX_ATTEMPTS"]
+        self.linger = config["LINGER"]
+
+    def pending(self):
+        return OutboxEvent.objects.filter(
+            delivered_at__isnull=True, attempts__lt=self.max_attempts
+        )
+
+    def schedule(self) -> None:
+        """Relay soon: inline for the local publisher, else one Celery task
+        per ``linger`` window however many transactions commit in it."""
+        if self.publisher.relay_inline:
+            self.relay()
+            return
+        # The window key outlives no event: anything committed while it is
+        # set was committed before the scheduled relay starts reading.
+        claimed = get_redis_connection().set(
+            "outbox:scheduled", 1, nx=True, px=max(int(self.linger * 1000), 1)
+        )
+        if claimed:
+            from .tasks import relay_outbox
+
+            relay_outbox.apply_async(countdown=self.linger)
+
+    def relay_batch(self) -> tuple[int, int]:
+        """Relay one batch; returns (delivered, failed)."""
+        with transaction.atomic():
+            events = list(
+                self.pending()
+                .select_for_update(skip_locked=True)
+                .order_by("id")[: self.batch_size]
+            )
+            if not events:
+                return 0, 0
+            errors = self.publisher.publish(events)
+            delivered = [event.pk for event in events if event.pk not in errors]
+            if delivered:
+                OutboxEvent.objects.filter(pk__in=delivered).update(
+                    delivered_at=timezone.now()
+                )
+            failed = [event for event in events if event.pk in errors]
+            for event in failed:
+                event.attempts += 1
+                event.last_error = errors[event.pk]
+            OutboxEvent.objects.bulk_update(failed, ["attempts", "last_error"])
+        return len(delivered), len(failed)
+
+    def relay(self) -> int:
+        """Relay up to ``max_batches`` batches; returns events delivered."""
+        started = time.perf_counter()
+        delivered = failed = 0
+        for _ in range(self.max_batches):
+            batch_delivered, batch_failed = self.relay_batch()
+            delivered += batch_delivered
+            failed += batch_failed
+            if batch_delivered + batch_failed < self.batch_size:
+                break
+            # Stop on a failing publisher rather than spin through the
+            # backlog; the next run retries.
+            if batch_failed and not batch_delivered:
+                break
+
+        if delivered or failed:
+            elapsed = time.perf_counter() - started
+            logger.info(
+                "Relayed {} outbox events ({} failed) in {:.3f}s, {:.0f}/s",
+                delivered,
+                failed,
+                elapsed,
+                delivered / elapsed if elapsed else 0,
+            )
+        return delivered
+
+    def metrics(self, window: timedelta = timedelta(minutes=5)) -> dict[str, Any]:
+        """Backlog, lag of the oldest pending event and recent throughput."""
+        now = timezone.now()
+        stats = OutboxEvent.objects.filter(delivered_at__isnull=True).aggregate(
+            oldest=Min("created_at", filter=Q(attempts__lt=self.max_attempts)),
+            pending=Count("pk", filter=Q(attempts__lt=self.max_attempts)),
+            parked=Count("pk", filter=Q(attempts__gte=self.max_attempts)),
+        )
+        delivered = OutboxEvent.objects.filter(delivered_at__gte=now - window).count()
+        return {
+            "pending": stats["pending"],
+            "parked": stats["parked"],
+            "lag_seconds": (
+                (now - stats["oldest"]).total_seconds() if stats["oldest"] else 0.0
+            ),
+            "delivered_per_second": delivered / window.total_seconds(),
+        }
+
+    def purge(self, older_than: timedelta, chunk_size: Optional[int] = None) -> int:
+        """Delete events delivered more than ``older_than`` ago, in chunks."""
+        cutoff = timezone.now() - older_than
+        chunk_size = chunk_size or self.batch_size
+        total = 0
+        while True:
+            chunk = OutboxEvent.objects.filter(delivered_at__lt=cutoff).values_list(
+                "pk", flat=True
+            )[:chunk_size]
+            deleted, _ = OutboxEvent.objects.filter(pk__in=list(chunk)).delete()
+            total += deleted
+            if deleted < chunk_size:
+                return total
+
+
+@lru_cache(maxsize=None)
+def get_outbox_relay() -> OutboxRelay:
+    config = settings.OUTBOX
+    return OutboxRelay(PUBLISHER_BACKENDS[config["BACKEND"]](), config)
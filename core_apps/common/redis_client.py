@@ -0,0 +1,32 @@
+import asyncio
+import weakref
+from functools import lru_cache
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+@lru_cache(maxsize=None)
+def get_redis_connection() -> redis.Redis:
+    """Shared Redis client for the process.
+
+    The client keeps its own connection pool, so one instance per process is
+    enough for every subsystem that talks to Redis directly.
+    """
+    return redis.Redis.from_url(settings.REDIS_URL)
+
+
+def get_async_redis_connection() -> redis.asyncio.Redis:
+    """Asyncio Redis client for the running event loop.
+
+    Asyncio connections belong to the loop that opened them, so clients are
+    kept per loop; an ASGI server runs a single loop per process.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+    return client
@@ -0,0 +1,82 @@
+from typing import Iterable
+
+from django.db import connection
+
+from .buffers import ViewTally
+from .models import ContentViewRollup, UserViewRollup
+
+# Hourly and daily buckets are both derived from the incoming hourly tallies
+# inside one INSERT ... SELECT, so Postgres does the grouping and the
+# counters are incremented in place instead of being read back into Python.
+OBJECT_ROLLUP_SQL = """
+WITH incoming (content_type_id, object_id, viewed_at, views) AS (
+    VALUES {values}
+)
+INSERT INTO {table} (content_type_id, object_id, period, bucket_start, views)
+SELECT content_type_id, object_id, %s, date_trunc('hour', viewed_at), SUM(views)
+FROM incoming
+GROUP BY content_type_id, object_id, date_trunc('hour', viewed_at)
+UNION ALL
+SELECT content_type_id, object_id, %s, date_trunc('day', viewed_at), SUM(views)
+FROM incoming
+GROUP BY content_type_id, object_id, date_trunc('day', viewed_at)
+ON CONFLICT (content_type_id, object_id, period, bucket_start)
+DO UPDATE SET views = {table}.views + EXCLUDED.views
+"""
+
+USER_ROLLUP_SQL = """
+WITH incoming (user_id, content_type_id, viewed_at, views) AS (
+    VALUES {values}
+)
+INSERT INTO {table} (user_id, content_type_id, period, bucket_start, views)
+SELECT user_id, content_type_id, %s, date_trunc('hour', viewed_at), SUM(views)
+FROM incoming
+GROUP BY user_id, content_type_id, date_trunc('hour', viewed_at)
+UNION ALL
+SELECT user_id, content_type_id, %s, date_trunc('day', viewed_at), SUM(views)
+FROM incoming
+GROUP BY user_id, content_type_id, date_trunc('day', viewed_at)
+ON CONFLICT (user_id, period, bucket_start, content_type_id)
+DO UPDATE SET views = {table}.views + EXCLUDED.views
+"""
+
+OBJECT_ROW = "(%s::integer, %s::uuid, %s::timestamptz, %s::bigint)"
+USER_ROW = "(%s::uuid, %s::integer, %s::timestamptz, %s::bigint)"
+
+
+BATCH_SIZE = 1000
+
+
+def _execute(sql: str, table: str, row: str, params: list[tuple]) -> None:
+    periods = [ContentViewRollup.Period.HOUR, ContentViewRollup.Period.DAY]
+    with connection.cursor() as cursor:
+        for start in range(0, len(params), BATCH_SIZE):
+            batch = params[start : start + BATCH_SIZE]
+            values = ", ".join([row] * len(batch))
+            flat = [value for values_row in batch for value in values_row]
+            cursor.execute(sql.format(values=values, table=table), flat + periods)
+
+
+def increment_view_rollups(tallies: Iterable[ViewTally]) -> None:
+    """Add hourly tallies to the per-object and per-user rollup counters."""
+    tallies = list(tallies)
+    if not tallies:
+        return
+
+    _execute(
+        OBJECT_ROLLUP_SQL,
+        ContentViewRollup._meta.db_table,
+        OBJECT_ROW,
+        [
+            (tally.content_type_id, tally.object_id, tally.bucket_start, tally.hits)
+            for tally in tallies
+        ],
+    )
+
+    user_rows = [
+        (tally.user_id, tally.content_type_id, tally.bucket_start, tally.hits)
+        for tally in tallies
+        if tally.user_id
+    ]
+    if user_rows:
+        _execute(USER_ROLLUP_SQL, UserViewRollup._meta.db_table, USER_ROW, user_rows)
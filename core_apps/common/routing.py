@@ -0,0 +1,37 @@
+from typing import Any
+
+from django.conf import settings
+
+# Queue and priority (0-9, higher first) per task. Unlisted tasks go to the
+# default queue at DEFAULT_ROUTE's priority; email flushes are routed by
+# channel, see route_task.
+DEFAULT_ROUTE = ("default", 5)
+TASK_ROUTES = {
+    "djcelery_email_send_multiple": ("auth_notifications", 9),
+    "core_apps.common.tasks.relay_outbox": ("default", 7),
+    "core_apps.common.tasks.handle_outbox_event": ("default", 7),
+    "core_apps.user_profile.tasks.bootstrap_parties": ("batch", 5),
+    "core_apps.common.tasks.flush_content_views": ("batch", 3),
+    "core_apps.common.tasks.restore_stale_content_views": ("batch", 3),
+    "core_apps.user_profile.tasks.expire_party_role_grants": ("batch", 3),
+    "core_apps.common.tasks.generate_dummy_file": ("batch", 0),
+    "core_apps.common.tasks.purge_outbox": ("batch", 0),
+    "core_apps.user_auth.tasks.maintain_security_event_partitions": ("batch", 0),
+}
+
+
+def route_task(
+    name: str, args: Any, kwargs: Any, options: dict, task: Any = None, **kw: Any
+) -> dict[str, Any]:
+    """Celery router for ``CELERY_TASK_ROUTES``.
+
+    Options passed to ``apply_async`` win over the route, which is also why
+    the priorities live here rather than in ``CELERY_TASK_DEFAULT_PRIORITY``:
+    a task-level default would override every routed priority.
+    """
+    if name == "core_apps.common.tasks.flush_email_queue":
+        channel = args[0] if args else kwargs["channel"]
+        config = settings.EMAIL_DISPATCH["CHANNELS"][channel]
+        return {"queue": config["QUEUE"], "priority": config["PRIORITY"]}
+    queue, priority = TASK_ROUTES.get(name, DEFAULT_ROUTE)
+    return {"queue": queue, "priority": priority}
@@ -0,0 +1,32 @@
+from typing import Any
+
+from storages.backends.s3 import S3Storage
+
+from .tracing import start_span
+
+
+class TracedStorageMixin:
+    """Times reads, writes and deletes as spans of the current trace."""
+
+    def _span(self, operation: str, name: str):
+        return start_span(
+            f"storage.{operation}",
+            "client",
+            **{"storage.backend": type(self).__name__, "storage.name": name},
+        )
+
+    def _save(self, name: str, content: Any) -> str:
+        with self._span("save", name):
+            return super()._save(name, content)
+
+    def _open(self, name: str, mode: str = "rb") -> Any:
+        with self._span("open", name):
+            return super()._open(name, mode)
+
+    def delete(self, name: str) -> None:
+        with self._span("delete", name):
+            super().delete(name)
+
+
+class TracedS3Storage(TracedStorageMixin, S3Storage):
+    pass
@@ -1,10 +1,18 @@
 import time
 import uuid
+from datetime import timedelta
+from smtplib import SMTPException
 
 from celery import shared_task
+from django.conf import settings
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 
+from .buffers import get_view_buffer
+from .mail import get_email_dispatcher
+from .models import ContentView
+from .outbox import dispatch_event, get_outbox_relay
+
 
 @shared_task(
     bind=True,
@@ -27,3 +35,46 @@ def generate_dummy_file(self):
     storage.save(path, ContentFile(content))
 
     return path
+
+
+@shared_task(ignore_result=True)
+def flush_content_views():
+    """Drain the view buffer into ContentView and the view rollups."""
+    return ContentView.flush_buffer(get_view_buffer())
+
+
+@shared_task(ignore_result=True)
+def restore_stale_content_views():
+    """Put back view batches whose flush never acknowledged them."""
+    timeout = settings.CONTENT_VIEW_BUFFER["DRAIN_TIMEOUT"]
+    return get_view_buffer().restore_stale(timeout)
+
+
+@shared_task(
+    ignore_result=True,
+    autoretry_for=(SMTPException, OSError),
+    retry_backoff=True,
+    retry_kwargs={"max_retries": 5},
+)
+def flush_email_queue(channel):
+    """Send every queued message on ``channel`` over one pooled connection."""
+    return get_email_dispatcher().flush(channel)
+
+
+@shared_task(ignore_result=True)
+def relay_outbox():
+    """Publish committed outbox events to the broker."""
+    return get_outbox_relay().relay()
+
+
+@shared_task(ignore_result=True)
+def handle_outbox_event(topic, payload):
+    """Run the registered handler of one relayed outbox event."""
+    return dispatch_event(topic, payload)
+
+
+@shared_task(ignore_result=True)
+def purge_outbox():
+    """Delete outbox events delivered longer ago than the retention."""
+    days = settings.OUTBOX["RETENTION_DAYS"]
+    return get_outbox_relay().purge(timedelta(days=days))
@@ -0,0 +1,79 @@
+import hashlib
+from typing import Any, Callable
+
+from django import template
+from django.conf import settings
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.contrib.admin.templatetags.base import InclusionAdminNode
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db.models import QuerySet
+
+register = template.Library()
+
+
+class CachedDateQuerySet:
+    """Serves the date-hierarchy aggregates of a queryset from the cache.
+
+    ``date_hierarchy`` only calls ``aggregate`` (min/max) and ``dates`` /
+    ``datetimes`` (``SELECT DISTINCT date_trunc(...)``), the latter being a
+    full scan of the filtered rows. Results are keyed by the SQL so any
+    change in filters or search gets its own entry.
+    """
+
+    def __init__(self, queryset: QuerySet) -> None:
+        self.queryset = queryset
+
+    def _cached(self, label: str, compute: Callable[[], Any]) -> Any:
+        try:
+            sql, params = self.queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return compute()
+        digest = hashlib.md5(f"{label}|{sql}|{params}".encode()).hexdigest()
+        return cache.get_or_set(
+            f"admin:date_hierarchy:{self.queryset.model._meta.label_lower}:{digest}",
+            compute,
+            settings.ADMIN_DATE_HIERARCHY_CACHE_TIMEOUT,
+        )
+
+    def aggregate(self, **kwargs: Any) -> dict:
+        return self._cached(
+            f"aggregate:{sorted(kwargs.items())}",
+            lambda: self.queryset.aggregate(**kwargs),
+        )
+
+    def dates(self, field_name: str, kind: str, order: str = "ASC") -> list:
+        return self._cached(
+            f"dates:{field_name}:{kind}:{order}",
+            lambda: list(self.queryset.dates(field_name, kind, order)),
+        )
+
+    def datetimes(self, field_name: str, kind: str, order: str = "ASC") -> list:
+        return self._cached(
+            f"datetimes:{field_name}:{kind}:{order}",
+            lambda: list(self.queryset.datetimes(field_name, kind, order)),
+        )
+
+
+class CachedDatesChangeList:
+    def __init__(self, changelist: Any) -> None:
+        self._changelist = changelist
+        self.queryset = CachedDateQuerySet(changelist.queryset)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._changelist, name)
+
+
+def cached_date_hierarchy(cl: Any) -> dict:
+    return date_hierarchy(CachedDatesChangeList(cl))
+
+
+@register.tag(name="cached_date_hierarchy")
+def cached_date_hierarchy_tag(parser, token):
+    return InclusionAdminNode(
+        parser,
+        token,
+        func=cached_date_hierarchy,
+        template_name="date_hierarchy.html",
+        takes_context=False,
+    )
@@ -1,3 +1,1047 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import zipfile
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from smtplib import SMTPException, SMTPRecipientsRefused, SMTPServerDisconnected
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from celery import shared_task
+from celery.contrib.testing.worker import start_worker
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core import mail
+from django.db import DatabaseError, connection, transaction
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from core_apps.user_auth.models import SecurityEvent
+from interceptor import WARNING_NO, LogSampler, QueuedFileSink
+from core_apps.user_auth.security_events import maintain_partitions
+from core_apps.user_profile.models import Party, PartyRoleExpiry, PartyUserRole
+
+from .budgets import QueryBudgetExceeded
+from .buffers import LocalViewBuffer, PendingView, RedisViewBuffer, ViewTally
+from .cache import get_tiered_cache
+from .ids import uuid7, uuid7_datetime
+from .mail import ConnectionPool, EmailDispatcher, LocalEmailQueue
+from .models import ContentView, ContentViewRollup, OutboxEvent, UserViewRollup
+from .outbox import (
+    OutboxPublisher,
+    OutboxRelay,
+    get_outbox_relay,
+    outbox_handler,
+    publish_event,
+)
+from .pagination import CURSOR_VAR, KeysetPaginationMixin
+from .rollups import increment_view_rollups
+from .routing import TASK_ROUTES, route_task
+from .tasks import (
+    flush_content_views,
+    flush_email_queue,
+    restore_stale_content_views,
+)
+from .tracing import (
+    JsonlSpanExporter,
+    OtlpSpanExporter,
+    Span,
+    SpanExporter,
+    finish_task_span,
+    inject_traceparent,
+    record_task_failure,
+    start_root_span,
+    start_span,
+    start_task_span,
+)
+
+User = get_user_model()
+
+OTP_CONTEXT = {"otp": "123456", "expiry_time": 60, "site_name": "Hober Bank"}
+
+
+def create_user(number: int = 0, **fields) -> User:
+    return User.objects.create_user(
+        email=f"user{number}@example.com",
+        password="correct-horse-battery",
+        first_name="Ada",
+        last_name="Lovelace",
+        id_number=str(1815 + number),
+        security_question="favorite_color",
+        security_answer="Blue",
+        **fields,
+    )
+
+
+@shared_task
+def latency_probe(sent_at: float) -> float:
+    """Seconds from publish to start."""
+    return time.time() - sent_at
+
+
+@shared_task(ignore_result=True)
+def batch_load(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+handled: list[dict] = []
+
+
+@outbox_handler("tests.recorded")
+def record_event(payload: dict) -> None:
+    handled.append(payload)
+
+
+@outbox_handler("tests.failing")
+def fail_event(payload: dict) -> None:
+    raise RuntimeError("handler failed")
+
+
+class DeferredEmailQueue(LocalEmailQueue):
+    """The local queue, flushed by tasks like the Redis one."""
+
+    flush_inline = False
+
+
+class EmailDispatcherTests(SimpleTestCase):
+    def setUp(self) -> None:
+        config = settings.EMAIL_DISPATCH
+        self.queue = DeferredEmailQueue()
+        self.dispatcher = EmailDispatcher(
+            self.queue,
+            ConnectionPool(config["SMTP_BACKEND"], config["POOL_IDLE_TIMEOUT"]),
+            config,
+        )
+        patcher = mock.patch.object(flush_email_queue, "apply_async")
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send(self, to: str = "ada@example.com") -> bool:
+        return self.dispatcher.send(
+            "Your code", "emails/otp_email.html", OTP_CONTEXT, [to]
+        )
+
+    def expire_claims(self) -> None:
+        self.queue._claims.clear()
+
+    def test_one_flush_per_linger_window(self) -> None:
+        self.send()
+        self.send()
+        self.apply_async.assert_called_once_with(
+            args=["auth"],
+            countdown=settings.EMAIL_DISPATCH["CHANNELS"]["auth"]["LINGER"],
+        )
+
+        self.expire_claims()
+        self.send()
+        self.assertEqual(self.apply_async.call_count, 2)
+
+    def test_full_batch_flushes_now(self) -> None:
+        for _ in range(settings.EMAIL_DISPATCH["BATCH_SIZE"]):
+            self.send()
+        self.assertEqual(self.apply_async.call_args.kwargs["countdown"], 0)
+
+    def test_failed_schedule_is_swept(self) -> None:
+        self.apply_async.side_effect = ConnectionError
+        self.assertTrue(self.send())
+        self.assertEqual(mail.outbox, [])
+
+        self.dispatcher.flush("auth")
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_flush_is_requeued(self) -> None:
+        self.send()
+        with mock.patch.object(self.dispatcher.pool, "acquire") as acquire:
+            acquire.return_value.send_messages.side_effect = SMTPException
+            with self.assertRaises(SMTPException):
+                self.dispatcher.flush("auth")
+
+        # Exhausted retries leave no flush pending; the next message
+        # schedules one again.
+        self.expire_claims()
+        self.send("grace@example.com")
+        self.assertEqual(self.apply_async.call_count, 2)
+        self.assertEqual(self.dispatcher.flush("auth"), 2)
+
+    def refuse(self, *addresses: str, error: Exception | None = None) -> None:
+        """A pooled connection that fails the messages to ``addresses``."""
+        connection = mail.get_connection(settings.EMAIL_DISPATCH["SMTP_BACKEND"])
+
+        def send_messages(messages):
+            if messages[0].to[0] in addresses:
+                raise error or SMTPRecipientsRefused(
+                    {messages[0].to[0]: (550, b"No such user")}
+                )
+            return connection.send_messages(messages)
+
+        patcher = mock.patch.object(self.dispatcher.pool, "acquire")
+        self.addCleanup(patcher.stop)
+        patcher.start().return_value.send_messages.side_effect = send_messages
+
+    def test_refused_message_is_dropped(self) -> None:
+        for to in ("ada@example.com", "nobody@example.com", "grace@example.com"):
+            self.send(to)
+        self.refuse("nobody@example.com")
+
+        self.assertEqual(self.dispatcher.flush("auth"), 2)
+        self.assertEqual(
+            [message.to for message in mail.outbox],
+            [["ada@example.com"], ["grace@example.com"]],
+        )
+        self.assertEqual(self.queue.pop("auth", 10), [])
+
+    def test_transient_failure_requeues_the_unsent_tail(self) -> None:
+        for to in ("ada@example.com", "grace@example.com", "alan@example.com"):
+            self.send(to)
+        self.refuse("grace@example.com", error=SMTPServerDisconnected())
+        with self.assertRaises(SMTPServerDisconnected):
+            self.dispatcher.flush("auth")
+        self.assertEqual(len(mail.outbox), 1)
+
+        self.refuse()
+        self.assertEqual(self.dispatcher.flush("auth"), 2)
+        self.assertEqual(
+            [message.to[0] for message in mail.outbox],
+            ["ada@example.com", "grace@example.com", "alan@example.com"],
+        )
+
+    def test_expired_messages_are_dropped(self) -> None:
+        ttl = settings.EMAIL_DISPATCH["CHANNELS"]["auth"]["TTL"]
+        with mock.patch("core_apps.common.mail.time.time", return_value=0):
+            self.send()
+        with mock.patch("core_apps.common.mail.time.time", return_value=ttl + 1):
+            self.send("grace@example.com")
+            self.assertEqual(self.dispatcher.flush("auth"), 1)
+        self.assertEqual(mail.outbox[0].to, ["grace@example.com"])
+
+    def test_every_channel_is_swept(self) -> None:
+        for channel in settings.EMAIL_DISPATCH["CHANNELS"]:
+            entry = settings.CELERY_BEAT_SCHEDULE[f"flush-email-queue-{channel}"]
+            self.assertEqual(entry["task"], flush_email_queue.name)
+            self.assertEqual(entry["args"], [channel])
+            self.assertEqual(
+                entry["schedule"],
+                timedelta(seconds=settings.EMAIL_DISPATCH["SWEEP_INTERVAL"]),
+            )
+
+
+class ViewBufferFlushTests(TestCase):
+    def setUp(self) -> None:
+        self.buffer = LocalViewBuffer()
+        viewed = create_user()
+        for _ in range(2):
+            self.buffer.add(
+                PendingView(
+                    content_type_id=ContentType.objects.get_for_model(User).pk,
+                    object_id=str(viewed.pk),
+                    user_id=None,
+                    viewer_ip="10.0.0.1",
+                    last_viewed=timezone.now(),
+                )
+            )
+
+    def test_failed_flush_keeps_the_batch(self) -> None:
+        with mock.patch(
+            "core_apps.common.rollups.increment_view_rollups",
+            side_effect=DatabaseError,
+        ):
+            with self.assertRaises(DatabaseError):
+                ContentView.flush_buffer(self.buffer)
+        self.assertFalse(ContentView.objects.exists())
+
+        self.assertEqual(ContentView.flush_buffer(self.buffer), 1)
+        self.assertEqual(
+            ContentViewRollup.objects.get(period="hour").views,
+            2,
+        )
+        self.assertEqual(ContentView.flush_buffer(self.buffer), 0)
+
+
+class RedisViewBufferTests(SimpleTestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch("core_apps.common.buffers.get_redis_connection")
+        self.client = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.buffer = RedisViewBuffer()
+
+    def test_full_buffer_schedules_one_flush(self) -> None:
+        limit = settings.CONTENT_VIEW_BUFFER["MAX_SIZE"]
+        self.assertFalse(self.buffer.should_flush(limit - 1))
+        self.client.set.assert_not_called()
+
+        # Repeat views keep the size at the limit; only the first asks.
+        self.client.set.side_effect = [True, None]
+        self.assertTrue(self.buffer.should_flush(limit))
+        self.assertFalse(self.buffer.should_flush(limit))
+        self.client.set.assert_called_with(
+            name=self.buffer.flush_flag_key,
+            value=1,
+            nx=True,
+            ex=settings.CONTENT_VIEW_BUFFER["FLUSH_INTERVAL"],
+        )
+
+    def test_drain_clears_the_flush_flag(self) -> None:
+        pipeline = self.client.pipeline.return_value
+        pipeline.execute.side_effect = [[1, True, True], [[], {}]]
+        self.buffer.drain()
+        pipeline.delete.assert_called_once_with(self.buffer.flush_flag_key)
+
+    def test_stale_drains_are_restored(self) -> None:
+        now = int(time.time())
+        stale, fresh = f"draining:{now - 600}:a", f"draining:{now}:b"
+        self.client.scan_iter.return_value = [
+            f"{self.buffer.key}:{suffix}".encode() for suffix in (stale, fresh)
+        ]
+        with mock.patch.object(self.buffer, "_restore") as restore:
+            self.assertEqual(self.buffer.restore_stale(300), 1)
+        restore.assert_called_once_with(
+            keys=[
+                self.buffer.key,
+                self.buffer.tallies_key,
+                f"{self.buffer.key}:{stale}",
+                f"{self.buffer.tallies_key}:{stale}",
+            ]
+        )
+
+    def test_stale_drains_are_swept(self) -> None:
+        entry = settings.CELERY_BEAT_SCHEDULE["restore-stale-content-views"]
+        self.assertEqual(entry["task"], restore_stale_content_views.name)
+
+
+class TaskRoutingTests(SimpleTestCase):
+    """Runs the routed topology of local.yml on the in-memory broker: an
+    OTP-routed probe must start well within OTP_EXPIRATION while the batch
+    worker sits on a backlog.
+    """
+
+    BATCH_TASKS = 10
+    BATCH_SECONDS = 0.1
+    PROBES = 5
+
+    def setUp(self) -> None:
+        from config.celery_app import app
+
+        self.app = app
+        # The Django settings are read under their namespaced names.
+        self.addCleanup(setattr, app.conf, "CELERY_TASK_ALWAYS_EAGER", True)
+        app.conf.CELERY_TASK_ALWAYS_EAGER = False
+        # The probe goes where an OTP email flush goes, the load where the
+        # view buffer flush goes.
+        otp_route = route_task(flush_email_queue.name, ["auth"], {}, {})
+        routes = mock.patch.dict(
+            TASK_ROUTES,
+            {
+                latency_probe.name: (otp_route["queue"], otp_route["priority"]),
+                batch_load.name: TASK_ROUTES[flush_content_views.name],
+            },
+        )
+        routes.start()
+        self.addCleanup(routes.stop)
+
+    def start_workers(self, stack: ExitStack, *queues: str) -> None:
+        for queue in queues:
+            stack.enter_context(
+                start_worker(
+                    self.app,
+                    perform_ping_check=False,
+                    hostname=f"{queue}@test",
+                    queues=[queue],
+                )
+            )
+
+    def test_otp_waits_are_within_expiry(self) -> None:
+        with ExitStack() as stack:
+            self.start_workers(stack, "auth_notifications", "batch")
+            for _ in range(self.BATCH_TASKS):
+                batch_load.delay(self.BATCH_SECONDS)
+            results = []
+            for _ in range(self.PROBES):
+                results.append(latency_probe.delay(time.time()))
+                time.sleep(self.BATCH_SECONDS / 2)
+            waits = [result.get(timeout=10) for result in results]
+
+        self.assertLess(max(waits), settings.OTP_EXPIRATION.total_seconds())
+        # On the batch queue the probes would wait for most of the backlog.
+        self.assertLess(max(waits), self.BATCH_TASKS * self.BATCH_SECONDS / 2)
+
+
+class KeysetChangelistBudgetTests(TestCase):
+    """Both the first and a cursor page of every keyset-paginated changelist,
+    which fail outright past their query budget under the test settings.
+    """
+
+    PAGE_SIZE = 5
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        maintain_partitions(ahead=1, retention_months=1200)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.superuser = create_user(is_staff=True, is_superuser=True)
+        users = [create_user(number) for number in range(1, cls.PAGE_SIZE + 2)]
+        now = timezone.now()
+        user_type = ContentType.objects.get_for_model(User)
+        for user in users:
+            PartyUserRole.objects.create(
+                party=Party.objects.create(party_type=Party.PartyType.LEGAL),
+                user=user,
+                role=PartyUserRole.Role.VIEWER,
+            )
+            SecurityEvent.objects.create(
+                event_type=SecurityEvent.EventType.LOGIN_FAILED, user=user
+            )
+            ContentView.objects.create(
+                content_type=user_type,
+                object_id=user.pk,
+                user=cls.superuser,
+                viewer_ip="10.0.0.1",
+                last_viewed=now,
+            )
+            OutboxEvent.objects.create(topic="test", payload={"user": user.pk})
+            PartyRoleExpiry.objects.create(cutoff=now, expired_count=0)
+
+    def setUp(self) -> None:
+        self.client.force_login(self.superuser)
+
+    def changelist_url(self, model) -> str:
+        opts = model._meta
+        return reverse(f"admin:{opts.app_label}_{opts.model_name}_changelist")
+
+    def test_keyset_changelists_within_budget(self) -> None:
+        keyset_admins = [
+            model_admin
+            for model_admin in admin.site._registry.values()
+            if isinstance(model_admin, KeysetPaginationMixin)
+        ]
+        self.assertCountEqual(
+            [model_admin.model for model_admin in keyset_admins],
+            [
+                User,
+                SecurityEvent,
+                ContentView,
+                OutboxEvent,
+                PartyUserRole,
+                PartyRoleExpiry,
+            ],
+        )
+        for model_admin in keyset_admins:
+            url = self.changelist_url(model_admin.model)
+            with (
+                self.subTest(url),
+                mock.patch.object(model_admin, "list_per_page", self.PAGE_SIZE),
+            ):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                cursor = response.context["cl"].next_cursor
+                self.assertIsNotNone(cursor)
+
+                response = self.client.get(url, {CURSOR_VAR: cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.context["cl"].result_list)
+
+    def test_exceeded_budget_raises(self) -> None:
+        model_admin = admin.site._registry[ContentView]
+        with mock.patch.object(model_admin, "changelist_query_budget", 1):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(self.changelist_url(ContentView))
+
+
+class BarrierPublisher(OutboxPublisher):
+    """Holds each batch until ``parties`` relays are publishing at once."""
+
+    def __init__(self, parties: int) -> None:
+        self.barrier = threading.Barrier(parties, timeout=5)
+        self.batches: list[list[int]] = []
+
+    def publish(self, events: list[OutboxEvent]) -> dict:
+        self.batches.append([event.pk for event in events])
+        self.barrier.wait()
+        return {}
+
+
+class OutboxTests(TransactionTestCase):
+    """The test settings use the local publisher, so a commit relays the
+    event and runs its handler inline."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        handled.clear()
+
+    def test_rollback_leaves_no_event(self) -> None:
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                publish_event("tests.recorded", {"n": 1})
+                raise RuntimeError
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(handled, [])
+
+    def test_commit_runs_handler_once(self) -> None:
+        with transaction.atomic():
+            publish_event("tests.recorded", {"n": 1})
+            self.assertEqual(handled, [])
+        self.assertEqual(handled, [{"n": 1}])
+        self.assertIsNotNone(OutboxEvent.objects.get().delivered_at)
+
+        get_outbox_relay().relay()
+        self.assertEqual(handled, [{"n": 1}])
+
+    def test_failing_handler_is_parked(self) -> None:
+        relay = get_outbox_relay()
+        publish_event("tests.failing", {})
+        for _ in range(relay.max_attempts + 1):
+            relay.relay()
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.attempts, relay.max_attempts)
+        self.assertIsNone(event.delivered_at)
+        self.assertIn("handler failed", event.last_error)
+        self.assertFalse(relay.pending().exists())
+        self.assertEqual(relay.metrics()["parked"], 1)
+
+    def test_concurrent_relays_take_disjoint_batches(self) -> None:
+        batch_size = 5
+        OutboxEvent.objects.bulk_create(
+            OutboxEvent(topic="tests.recorded", payload={"n": n})
+            for n in range(batch_size * 2)
+        )
+        publisher = BarrierPublisher(parties=2)
+        relay = OutboxRelay(publisher, {**settings.OUTBOX, "BATCH_SIZE": batch_size})
+        results = []
+
+        def relay_batch() -> None:
+            try:
+                results.append(relay.relay_batch())
+            finally:
+                connection.close()
+
+        # Each relay waits at the barrier while holding its row locks, so
+        # without SKIP LOCKED the second would block on the first's rows.
+        threads = [threading.Thread(target=relay_batch) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [(batch_size, 0)] * 2)
+        first, second = publisher.batches
+        self.assertFalse(set(first) & set(second))
+        self.assertFalse(OutboxEvent.objects.filter(delivered_at__isnull=True).exists())
+
+
+class TieredCacheInvalidationTests(TestCase):
+    def setUp(self) -> None:
+        get_tiered_cache.cache_clear()
+        self.cache = get_tiered_cache()
+        self.user = create_user()
+
+    def test_save_invalidates(self) -> None:
+        self.cache.set("user", self.user.pk, "cached")
+        self.user.first_name = "Augusta"
+        self.user.save()
+        self.assertIsNone(self.cache.get("user", self.user.pk))
+
+    def test_delete_invalidates(self) -> None:
+        pk = self.user.pk
+        self.cache.set("user", pk, "cached")
+        self.user.delete()
+        self.assertIsNone(self.cache.get("user", pk))
+
+    def test_get_or_set_reads_through_after_invalidation(self) -> None:
+        load = mock.Mock(side_effect=["first", "second"])
+        self.assertEqual(self.cache.get_or_set("user", self.user.pk, load), "first")
+        self.assertEqual(self.cache.get_or_set("user", self.user.pk, load), "first")
+        self.user.save()
+        self.assertEqual(self.cache.get_or_set("user", self.user.pk, load), "second")
+
+    def test_delete_on_commit_drops_a_copy_cached_before_commit(self) -> None:
+        self.cache.set("user", self.user.pk, "cached")
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                self.cache.delete_on_commit("user", self.user.pk)
+                self.assertIsNone(self.cache.get("user", self.user.pk))
+                # A concurrent reader caching the row as it was before commit.
+                self.cache.set("user", self.user.pk, "stale")
+            self.assertEqual(self.cache.get("user", self.user.pk), "stale")
+        self.assertEqual(len(callbacks), 1)
+        self.assertIsNone(self.cache.get("user", self.user.pk))
+
+    def test_rolled_back_delete_on_commit_does_not_fire(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    self.cache.delete_on_commit("user", self.user.pk)
+                    raise RuntimeError
+        self.assertEqual(callbacks, [])
+
+
+class MetricsViewTests(SimpleTestCase):
+    def scrape(self, **headers):
+        return self.client.get(reverse("metrics"), headers=headers)
+
+    @override_settings(DEBUG=False, METRICS={**settings.METRICS, "TOKEN": ""})
+    def test_hidden_without_token(self) -> None:
+        self.assertEqual(self.scrape().status_code, 404)
+
+    @override_settings(DEBUG="False", METRICS={**settings.METRICS, "TOKEN": ""})
+    def test_hidden_with_a_string_debug(self) -> None:
+        self.assertEqual(self.scrape().status_code, 404)
+
+    @override_settings(DEBUG=True, METRICS={**settings.METRICS, "TOKEN": ""})
+    def test_open_in_debug_without_token(self) -> None:
+        self.assertEqual(self.scrape().status_code, 200)
+
+    @override_settings(DEBUG=False, METRICS={**settings.METRICS, "TOKEN": "s3cret"})
+    def test_token_required(self) -> None:
+        self.assertEqual(self.scrape().status_code, 401)
+        self.assertEqual(self.scrape(Authorization="Bearer wrong").status_code, 401)
+        response = self.scrape(Authorization="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+
+
+TRACE_ID, PARENT_ID = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+
+
+class RecordingSpanExporter(SpanExporter):
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+
+@override_settings(TRACING={**settings.TRACING, "ENABLED": True, "SAMPLE_RATE": 1.0})
+class TracingTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.exporter = RecordingSpanExporter()
+        patcher = mock.patch(
+            "core_apps.common.tracing.get_span_exporter", return_value=self.exporter
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_traceparent_is_continued(self) -> None:
+        with start_root_span(
+            "request", "server", traceparent=f"00-{TRACE_ID}-{PARENT_ID}-01"
+        ) as root:
+            with start_span("child") as child:
+                pass
+        self.assertEqual((root.trace_id, root.parent_id), (TRACE_ID, PARENT_ID))
+        self.assertEqual((child.trace_id, child.parent_id), (TRACE_ID, root.span_id))
+        self.assertEqual(root.traceparent, f"00-{TRACE_ID}-{root.span_id}-01")
+        self.assertEqual(self.exporter.spans, [child, root])
+
+    def test_unsampled_traceparent_records_nothing(self) -> None:
+        with start_root_span(
+            "request", "server", traceparent=f"00-{TRACE_ID}-{PARENT_ID}-00"
+        ) as root:
+            with start_span("child") as child:
+                pass
+        self.assertFalse(root.sampled)
+        self.assertTrue(root.traceparent.endswith("-00"))
+        self.assertIsNone(child)
+        self.assertEqual(self.exporter.spans, [])
+
+    def test_malformed_traceparent_starts_a_trace(self) -> None:
+        for traceparent in (
+            None,
+            f"01-{TRACE_ID}-{PARENT_ID}-01",
+            f"00-{TRACE_ID.upper()}-{PARENT_ID}-01",
+            f"00-{TRACE_ID}-{PARENT_ID}",
+        ):
+            with self.subTest(traceparent):
+                with start_root_span("request", "server", traceparent) as root:
+                    pass
+                self.assertNotEqual(root.trace_id, TRACE_ID)
+                self.assertRegex(root.trace_id, r"^[0-9a-f]{32}$")
+                self.assertIsNone(root.parent_id)
+
+    def test_sample_rate_and_switch(self) -> None:
+        with override_settings(TRACING={**settings.TRACING, "SAMPLE_RATE": 0.0}):
+            with start_root_span("request", "server") as root:
+                pass
+        self.assertFalse(root.sampled)
+        with override_settings(TRACING={**settings.TRACING, "ENABLED": False}):
+            with start_root_span("request", "server") as root:
+                pass
+        self.assertIsNone(root)
+        with start_span("no parent") as span:
+            self.assertIsNone(span)
+
+    def test_error_is_recorded(self) -> None:
+        with self.assertRaises(ValueError):
+            with start_root_span("request", "server"):
+                raise ValueError("boom")
+        (span,) = self.exporter.spans
+        self.assertEqual(span.error, "ValueError: boom")
+
+    def test_celery_headers_carry_the_trace(self) -> None:
+        headers = {}
+        inject_traceparent(headers=headers)
+        self.assertEqual(headers, {})
+        with start_root_span("request", "server") as publisher:
+            inject_traceparent(headers=headers)
+        self.assertEqual(headers, {"traceparent": publisher.traceparent})
+
+        task = SimpleNamespace(
+            name="send_otp",
+            request=SimpleNamespace(retries=None, **headers),
+        )
+        start_task_span(task_id="t1", task=task)
+        with start_span("work") as work:
+            pass
+        record_task_failure(task_id="t1", exception=RuntimeError("down"))
+        finish_task_span(task_id="t1", state="FAILURE")
+
+        consumer = self.exporter.spans[-1]
+        self.assertEqual(consumer.name, "send_otp")
+        self.assertEqual(consumer.kind, "consumer")
+        self.assertEqual(
+            (consumer.trace_id, consumer.parent_id),
+            (publisher.trace_id, publisher.span_id),
+        )
+        self.assertEqual(work.parent_id, consumer.span_id)
+        self.assertEqual(consumer.error, "RuntimeError: down")
+        self.assertEqual(
+            consumer.attributes,
+            {
+                "celery.task_id": "t1",
+                "celery.retries": 0,
+                "celery.state": "FAILURE",
+                "exception.type": "RuntimeError",
+            },
+        )
+        # The worker's context is left as it was found.
+        with start_span("after") as after:
+            self.assertIsNone(after)
+
+
+class SpanExporterTests(SimpleTestCase):
+    def make_span(self, **attributes) -> Span:
+        span = Span("request", "server", TRACE_ID, PARENT_ID, True, attributes)
+        span.end_ns = span.start_ns + 1_500_000
+        return span
+
+    def test_jsonl_flush_leaves_the_file_open(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "traces.jsonl"
+            exporter = JsonlSpanExporter({"JSONL_PATH": path})
+            self.addCleanup(exporter.shutdown)
+            first, second = self.make_span(n=1), self.make_span(n=2)
+            exporter.export(first)
+            exporter.flush()
+            self.assertIsNotNone(exporter.sink._file)
+            exporter.export(second)
+            exporter.flush()
+            lines = [json.loads(line) for line in path.read_text().splitlines()]
+            exporter.shutdown()
+            self.assertIsNone(exporter.sink._file)
+        self.assertEqual(
+            [(line["span_id"], line["attributes"]) for line in lines],
+            [(first.span_id, {"n": 1}), (second.span_id, {"n": 2})],
+        )
+        self.assertEqual(lines[0]["duration_ms"], 1.5)
+        self.assertEqual(lines[0]["parent_id"], PARENT_ID)
+
+    def otlp_exporter(self, **config) -> OtlpSpanExporter:
+        return OtlpSpanExporter(
+            {
+                **settings.TRACING,
+                "OTLP_ENDPOINT": "http://collector:4318/v1/traces",
+                "FLUSH_INTERVAL": 3600,
+                **config,
+            }
+        )
+
+    def test_otlp_batch(self) -> None:
+        exporter = self.otlp_exporter(MAX_BUFFERED=2)
+        span = self.make_span(ok=True, rows=3, ratio=0.5, user="ada")
+        span.record_exception(KeyError("x"))
+        for _ in range(3):
+            exporter.export(span)
+        with mock.patch("urllib.request.urlopen") as urlopen:
+            exporter.flush()
+            exporter.flush()
+        urlopen.assert_called_once()
+        request = urlopen.call_args.args[0]
+        self.assertEqual(request.full_url, "http://collector:4318/v1/traces")
+        (resource_spans,) = json.loads(request.data)["resourceSpans"]
+        spans = resource_spans["scopeSpans"][0]["spans"]
+        # MAX_BUFFERED keeps two spans and drops the third.
+        self.assertEqual(len(spans), 2)
+        self.assertEqual(
+            spans[0],
+            {
+                "traceId": TRACE_ID,
+                "spanId": span.span_id,
+                "parentSpanId": PARENT_ID,
+                "name": "request",
+                "kind": 2,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [
+                    {"key": "ok", "value": {"boolValue": True}},
+                    {"key": "rows", "value": {"intValue": "3"}},
+                    {"key": "ratio", "value": {"doubleValue": 0.5}},
+                    {"key": "user", "value": {"stringValue": "ada"}},
+                    {"key": "exception.type", "value": {"stringValue": "KeyError"}},
+                ],
+                "status": {"code": 2, "message": "KeyError: 'x'"},
+            },
+        )
+
+    def test_otlp_collector_down_drops_the_batch(self) -> None:
+        exporter = self.otlp_exporter()
+        exporter.export(self.make_span())
+        with mock.patch(
+            "urllib.request.urlopen", side_effect=ConnectionRefusedError
+        ) as urlopen:
+            exporter.flush()
+            exporter.flush()
+        urlopen.assert_called_once()
+
+
+def log_record(name: str, level: int = 10) -> dict:
+    return {"name": name, "level": SimpleNamespace(no=level)}
+
+
+class LogSamplerTests(SimpleTestCase):
+    def test_longest_prefix_wins(self) -> None:
+        sampler = LogSampler({"app": 0.0, "app.keep": 1.0}, {})
+        for name, kept in (
+            ("app", False),
+            ("app.views", False),
+            ("app.keep", True),
+            ("app.keep.views", True),
+            # Prefixes match whole module names only.
+            ("application", True),
+            ("other", True),
+        ):
+            with self.subTest(name):
+                self.assertIs(sampler(log_record(name)), kept)
+
+    def test_warnings_always_pass_and_max_level_caps(self) -> None:
+        sampler = LogSampler({"app": 0.0}, {}, max_level=WARNING_NO)
+        self.assertTrue(sampler(log_record("app", WARNING_NO)))
+        self.assertFalse(sampler(log_record("other", WARNING_NO + 10)))
+
+    def test_rate_limit(self) -> None:
+        clock = [100.0]
+        with mock.patch("interceptor.time.monotonic", side_effect=lambda: clock[0]):
+            sampler = LogSampler({}, {"noisy": 2})
+            allowed = [sampler(log_record("noisy.db")) for _ in range(3)]
+            clock[0] += 0.5
+            allowed += [sampler(log_record("noisy.db")) for _ in range(2)]
+            clock[0] += 60
+            allowed += [sampler(log_record("noisy.db")) for _ in range(3)]
+        # Two per second, refilled over time but never past the limit.
+        self.assertEqual(allowed, [True, True, False, True, False, True, True, False])
+
+
+class QueuedFileSinkTests(SimpleTestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.path = self.directory / "debug.log"
+
+    def sink(self, **options) -> QueuedFileSink:
+        options = {"rotation_bytes": 10_000, "retention_days": 30, **options}
+        # The writer thread would only wake after an hour; tests flush.
+        sink = QueuedFileSink(self.path, flush_interval=3600, **options)
+        self.addCleanup(sink.stop)
+        return sink
+
+    def test_flush_keeps_the_file_open(self) -> None:
+        sink = self.sink()
+        sink.write("one\n")
+        sink.flush()
+        sink.write("two\n")
+        sink.flush()
+        self.assertEqual(self.path.read_text(), "one\ntwo\n")
+        sink.stop()
+        self.assertIsNone(sink._file)
+
+    def test_full_queue_drops_and_counts(self) -> None:
+        sink = self.sink(max_queued=2)
+        for line in ("one\n", "two\n", "three\n", "four\n"):
+            sink.write(line)
+        sink.flush()
+        sink.write("five\n")
+        sink.flush()
+        self.assertEqual(
+            self.path.read_text(),
+            "one\ntwo\n[log-writer dropped 2 records]\nfive\n",
+        )
+
+    def test_rendered_on_the_writer(self) -> None:
+        sink = self.sink(render=lambda record: f"{record['message']}!\n")
+        sink.write(SimpleNamespace(record={"message": "hi"}))
+        sink.flush()
+        self.assertEqual(self.path.read_text(), "hi!\n")
+
+    def test_rotation_zips_and_prunes(self) -> None:
+        old, recent = (
+            self.directory / "debug.2000-01-01_00-00-00_000000.log.zip",
+            self.directory / "debug.2000-01-02_00-00-00_000000.log.zip",
+        )
+        for archive in (old, recent):
+            archive.touch()
+        os.utime(old, (0, time.time() - 31 * 86400))
+
+        sink = self.sink(rotation_bytes=10)
+        sink.write("short\n")
+        sink.flush()
+        self.assertTrue(self.path.exists())
+        sink.write("past the limit\n")
+        sink.flush()
+
+        self.assertFalse(self.path.exists())
+        self.assertFalse(old.exists())
+        self.assertTrue(recent.exists())
+        (rotated,) = set(self.directory.glob("debug.*.log.zip")) - {recent}
+        with zipfile.ZipFile(rotated) as archive:
+            (name,) = archive.namelist()
+            self.assertEqual(rotated.name, f"{name}.zip")
+            self.assertEqual(archive.read(name), b"short\npast the limit\n")
+        sink.write("next\n")
+        sink.flush()
+        self.assertEqual(self.path.read_text(), "next\n")
+
+
+class ViewRollupTests(TestCase):
+    def setUp(self) -> None:
+        self.user = create_user()
+        self.content_type_id = ContentType.objects.get_for_model(User).pk
+        self.first, self.second = uuid.uuid4(), uuid.uuid4()
+        self.hour = datetime(2026, 3, 1, 9, tzinfo=UTC)
+
+    def tally(self, object_id, hour: int = 0, user=None, hits: int = 1) -> ViewTally:
+        return ViewTally(
+            content_type_id=self.content_type_id,
+            object_id=str(object_id),
+            user_id=str(user.pk) if user else None,
+            bucket_start=self.hour + timedelta(hours=hour),
+            hits=hits,
+        )
+
+    def object_rollups(self) -> dict:
+        return {
+            (row.object_id, row.period, row.bucket_start): row.views
+            for row in ContentViewRollup.objects.all()
+        }
+
+    def user_rollups(self) -> dict:
+        return {
+            (row.user_id, row.period, row.bucket_start): row.views
+            for row in UserViewRollup.objects.all()
+        }
+
+    def test_hours_and_days(self) -> None:
+        day = self.hour.replace(hour=0)
+        increment_view_rollups(
+            [
+                self.tally(self.first, hits=2),
+                self.tally(self.first, user=self.user, hits=3),
+                self.tally(self.first, hour=1),
+                self.tally(self.first, hour=15, user=self.user),
+                self.tally(self.second),
+            ]
+        )
+        hour, next_hour = self.hour, self.hour + timedelta(hours=1)
+        next_day = day + timedelta(days=1)
+        Period = ContentViewRollup.Period
+        self.assertEqual(
+            self.object_rollups(),
+            {
+                (self.first, Period.HOUR, hour): 5,
+                (self.first, Period.HOUR, next_hour): 1,
+                (self.first, Period.HOUR, self.hour + timedelta(hours=15)): 1,
+                (self.first, Period.DAY, day): 6,
+                (self.first, Period.DAY, next_day): 1,
+                (self.second, Period.HOUR, hour): 1,
+                (self.second, Period.DAY, day): 1,
+            },
+        )
+        # Anonymous views only count towards the objects.
+        self.assertEqual(
+            self.user_rollups(),
+            {
+                (self.user.pk, Period.HOUR, hour): 3,
+                (self.user.pk, Period.HOUR, self.hour + timedelta(hours=15)): 1,
+                (self.user.pk, Period.DAY, day): 3,
+                (self.user.pk, Period.DAY, next_day): 1,
+            },
+        )
+
+    def test_existing_buckets_are_incremented(self) -> None:
+        increment_view_rollups([self.tally(self.first, user=self.user)])
+        with mock.patch("core_apps.common.rollups.BATCH_SIZE", 2):
+            with self.assertNumQueries(4):
+                increment_view_rollups(
+                    [self.tally(self.first, user=self.user, hits=4)] * 3
+                )
+        Period = ContentViewRollup.Period
+        self.assertEqual(
+            self.object_rollups(),
+            {
+                (self.first, Period.HOUR, self.hour): 13,
+                (self.first, Period.DAY, self.hour.replace(hour=0)): 13,
+            },
+        )
+        self.assertEqual(set(self.user_rollups().values()), {13})
+
+    def test_nothing_to_add(self) -> None:
+        with self.assertNumQueries(0):
+            increment_view_rollups([])
+
+
+class UUID7Tests(SimpleTestCase):
+    def test_layout(self) -> None:
+        before = datetime.now(UTC).replace(microsecond=0)
+        value = uuid7()
+        self.assertEqual(value.version, 7)
+        self.assertEqual(value.variant, uuid.RFC_4122)
+        created = uuid7_datetime(value)
+        self.assertLessEqual(before, created)
+        self.assertLessEqual(created, datetime.now(UTC))
+        self.assertIsNone(uuid7_datetime(uuid.uuid4()))
+
+    def test_strictly_increasing(self) -> None:
+        values = [uuid7() for _ in range(10_000)]
+        self.assertEqual(values, sorted(set(values)))
+        # Also as the strings and bytes the database compares.
+        self.assertEqual([str(v) for v in values], sorted(map(str, values)))
+        self.assertEqual([v.bytes for v in values], sorted(v.bytes for v in values))
+
+    def test_sequence_overflow_borrows_the_next_millisecond(self) -> None:
+        now_ms = 1_700_000_000_000
+        # Restores the generator's state, which would otherwise stay ahead
+        # of the real clock for the rest of the run.
+        with mock.patch.multiple("core_apps.common.ids", _last_ms=0, _sequence=0):
+            with mock.patch("core_apps.common.ids.time") as clock:
+                clock.time_ns.return_value = now_ms * 1_000_000
+                values = [uuid7() for _ in range(0x1001)]
+        self.assertEqual(values, sorted(set(values)))
+        self.assertEqual(
+            {uuid7_datetime(value).timestamp() * 1000 for value in values},
+            {now_ms, now_ms + 1},
+        )
+
+    def test_time_ordered_primary_keys(self) -> None:
+        self.assertEqual(User._meta.pk.get_default().version, 7)
@@ -0,0 +1,391 @@
+import atexit
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, ContextManager, Iterator, Optional
+
+from celery.signals import (
+    before_task_publish,
+    task_failure,
+    task_postrun,
+    task_prerun,
+    worker_process_shutdown,
+)
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from loguru import logger
+
+from interceptor import QueuedFileSink
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# OTLP span kinds.
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+
+
+class Span:
+    """One timed operation in a trace.
+
+    Spans are only built for traces that are being recorded, except the
+    root of an unsampled trace, which is kept so the decision travels
+    with the trace to Celery tasks.
+    """
+
+    __slots__ = (
+        "name",
+        "kind",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "sampled",
+        "attributes",
+        "error",
+        "start_ns",
+        "end_ns",
+        "_started",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        sampled: bool,
+        attributes: dict[str, Any],
+    ) -> None:
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._started = time.perf_counter_ns()
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.error = f"{type(exc).__name__}: {exc}"
+        self.attributes["exception.type"] = type(exc).__name__
+
+    def finish(self) -> None:
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._started
+        if self.sampled:
+            get_span_exporter().export(self)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def _open_span(
+    name: str,
+    kind: str,
+    attributes: dict[str, Any],
+    root: bool = False,
+    traceparent: Optional[str] = None,
+) -> Optional[Span]:
+    parent = _current_span.get()
+    if parent is not None:
+        if not parent.sampled:
+            return None
+        return Span(name, kind, parent.trace_id, parent.span_id, True, attributes)
+    if not root or not settings.TRACING["ENABLED"]:
+        return None
+
+    match = TRACEPARENT.match(traceparent or "")
+    if match:
+        trace_id, parent_id, flags = match.groups()
+        sampled = bool(int(flags, 16) & 1)
+    else:
+        trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+        sampled = random.random() < settings.TRACING["SAMPLE_RATE"]
+    return Span(name, kind, trace_id, parent_id, sampled, attributes)
+
+
+@contextmanager
+def _activate(span: Optional[Span]) -> Iterator[Optional[Span]]:
+    if span is None:
+        yield None
+        return
+    token = _current_span.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.finish()
+
+
+def start_span(
+    name: str, kind: str = "internal", **attributes: Any
+) -> ContextManager[Optional[Span]]:
+    """Time a block as a child of the current span.
+
+    Outside a recorded trace this yields ``None`` and costs one context
+    variable lookup, so it can wrap hot paths.
+    """
+    return _activate(_open_span(name, kind, attributes))
+
+
+def start_root_span(
+    name: str,
+    kind: str,
+    traceparent: Optional[str] = None,
+    **attributes: Any,
+) -> ContextManager[Optional[Span]]:
+    """Start a trace, or continue the one in ``traceparent``, sampling new
+    traces at ``settings.TRACING["SAMPLE_RATE"]``."""
+    return _activate(_open_span(name, kind, attributes, True, traceparent))
+
+
+def _trace_query(execute, sql, params, many, context) -> Any:
+    span = _current_span.get()
+    if span is None or not span.sampled:
+        return execute(sql, params, many, context)
+    with start_span(
+        "db.query",
+        "client",
+        **{
+            "db.system": context["connection"].vendor,
+            # The statement without its parameters, which may be personal.
+            "db.statement": sql[:2000],
+        },
+    ):
+        return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_tracer(sender, connection, **kwargs) -> None:
+    if _trace_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_trace_query)
+
+
+class SpanExporter:
+    """Ships finished spans somewhere they can be looked at."""
+
+    def export(self, span: Span) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        self.flush()
+
+
+class JsonlSpanExporter(SpanExporter):
+    """One JSON object per span, appended by the log writer thread."""
+
+    def __init__(self, config: dict) -> None:
+        self.sink = QueuedFileSink(
+            Path(config["JSONL_PATH"]), rotation_bytes=50_000_000, retention_days=7
+        )
+        atexit.register(self.shutdown)
+
+    def export(self, span: Span) -> None:
+        self.sink.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+    def flush(self) -> None:
+        self.sink.flush()
+
+    def shutdown(self) -> None:
+        self.sink.stop()
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    return [
+        {"key": key, "value": _otlp_value(value)} for key, value in attributes.items()
+    ]
+
+
+class OtlpSpanExporter(SpanExporter):
+    """Posts spans in batches to an OTLP/HTTP collector as JSON.
+
+    Spans are buffered per process and sent by a background thread every
+    ``FLUSH_INTERVAL`` seconds; a collector that is down costs the batch,
+    never the request.
+    """
+
+    def __init__(self, config: dict) -> None:
+        self.endpoint = config["OTLP_ENDPOINT"]
+        self.flush_interval = config["FLUSH_INTERVAL"]
+        self.max_buffered = config["MAX_BUFFERED"]
+        self.service_name = config["SERVICE_NAME"]
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.shutdown)
+
+    def _reset(self) -> None:
+        self.resource = _otlp_attributes(
+            {"service.name": self.service_name, "process.pid": os.getpid()}
+        )
+        self._lock = threading.Lock()
+        self._spans: list[Span] = []
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            if len(self._spans) >= self.max_buffered:
+                return
+            self._spans.append(span)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="span-exporter", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            spans, self._spans = self._spans, []
+        if not spans:
+            return
+        body = json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": {"attributes": self.resource},
+                        "scopeSpans": [
+                            {
+                                "scope": {"name": "core_apps.common.tracing"},
+                                "spans": [self._encode(span) for span in spans],
+                            }
+                        ],
+                    }
+                ]
+            },
+            default=str,
+        ).encode()
+        request = urllib.request.Request(
+            self.endpoint, body, {"Content-Type": "application/json"}
+        )
+        try:
+            urllib.request.urlopen(request, timeout=5).close()
+        except OSError as e:
+            logger.warning("Dropped {} spans: {!r}", len(spans), e)
+
+    def _encode(self, span: Span) -> dict[str, Any]:
+        encoded = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": SPAN_KINDS[span.kind],
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": _otlp_attributes(span.attributes),
+            "status": {"code": 2, "message": span.error} if span.error else {},
+        }
+        if span.parent_id:
+            encoded["parentSpanId"] = span.parent_id
+        return encoded
+
+
+EXPORTER_BACKENDS = {
+    "jsonl": JsonlSpanExporter,
+    "otlp": OtlpSpanExporter,
+}
+
+
+@lru_cache(maxsize=None)
+def get_span_exporter() -> SpanExporter:
+    config = settings.TRACING
+    return EXPORTER_BACKENDS[config["EXPORTER"]](config)
+
+
+# Celery: the publishing span travels in the task headers and each run is
+# a span of its own, continuing that trace.
+
+_task_spans: dict[str, tuple[Span, Token]] = {}
+
+
+@before_task_publish.connect
+def inject_traceparent(headers: Optional[dict] = None, **kwargs: Any) -> None:
+    span = _current_span.get()
+    if span is not None and headers is not None:
+        headers.setdefault("traceparent", span.traceparent)
+
+
+@task_prerun.connect
+def start_task_span(task_id: str, task: Any, **kwargs: Any) -> None:
+    span = _open_span(
+        task.name,
+        "consumer",
+        {"celery.task_id": task_id, "celery.retries": task.request.retries or 0},
+        root=True,
+        traceparent=getattr(task.request, "traceparent", None),
+    )
+    if span is not None:
+        _task_spans[task_id] = (span, _current_span.set(span))
+
+
+@task_failure.connect
+def record_task_failure(
+    task_id: str, exception: Optional[BaseException] = None, **kwargs: Any
+) -> None:
+    entry = _task_spans.get(task_id)
+    if entry is not None and exception is not None:
+        entry[0].record_exception(exception)
+
+
+@task_postrun.connect
+def finish_task_span(task_id: str, state: Optional[str] = None, **kwargs: Any) -> None:
+    entry = _task_spans.pop(task_id, None)
+    if entry is None:
+        return
+    span, token = entry
+    span.set_attribute("celery.state", state)
+    _current_span.reset(token)
+    span.finish()
+
+
+@worker_process_shutdown.connect
+def flush_spans(**kwargs: Any) -> None:
+    if get_span_exporter.cache_info().currsize:
+        get_span_exporter().shutdown()
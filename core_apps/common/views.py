@@ -1,3 +1,28 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.http import Http404, HttpRequest, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
 
-# Create your views here.
+from .metrics import get_metrics_recorder, render_metrics
+
+
+@require_GET
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Prometheus scrape endpoint with the totals of every process.
+
+    Without a token it is only served with DEBUG on.
+    """
+    token = settings.METRICS["TOKEN"]
+    if not token:
+        # Only a real True opens it; DEBUG read raw from the environment is
+        # a string, and "False" is truthy.
+        if settings.DEBUG is not True:
+            raise Http404
+    elif not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(
+        render_metrics(get_metrics_recorder().collect()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
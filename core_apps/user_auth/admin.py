@@ -2,12 +2,15 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.utils.translation import gettext_lazy as _
 
+from core_apps.common.admin_base import AdminToolkitMixin, BaseModelAdmin
+from core_apps.common.pagination import KeysetPaginationMixin
+
 from .forms import UserChangeForm, UserCreationForm
-from .models import User
+from .models import SecurityEvent, User
 
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(KeysetPaginationMixin, AdminToolkitMixin, UserAdmin):
     readonly_fields = ("username",)
     form = UserChangeForm
     add_form = UserCreationForm
@@ -68,3 +71,26 @@ class CustomUserAdmin(UserAdmin):
         "role",
     ]
     ordering = ["id_number"]
+    keyset_ordering = ("id_number",)
+
+
+@admin.register(SecurityEvent)
+class SecurityEventAdmin(KeysetPaginationMixin, BaseModelAdmin):
+    list_display = ("occurred_at", "event_type", "user", "ip_address")
+    list_filter = ("event_type",)
+    list_select_related = ("user",)
+    # Exact match only: the email lookup then uses the users' unique index.
+    search_fields = ("=user__email",)
+    keyset_ordering = ("-occurred_at", "-id")
+    date_hierarchy = "occurred_at"
+    cache_date_hierarchy = True
+    readonly_fields = ("occurred_at", "event_type", "user", "ip_address", "data")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
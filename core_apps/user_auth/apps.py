@@ -6,3 +6,7 @@ class UserAuthConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core_apps.user_auth"
     verbose_name = _("User Profile")
+
+    def ready(self) -> None:
+        import core_apps.user_auth.events  # noqa: F401
+        import core_apps.user_auth.signals  # noqa: F401
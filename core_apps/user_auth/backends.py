@@ -0,0 +1,71 @@
+from typing import Any, Optional
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.http import HttpRequest
+
+from core_apps.common.cache import get_tiered_cache
+
+from .hashing import get_hashing_service
+
+UserModel = get_user_model()
+
+
+class UserAuthBackend(ModelBackend):
+    """ModelBackend whose async path never hashes on the event loop.
+
+    Django's ``aauthenticate`` equalises timing for unknown accounts with a
+    synchronous ``set_password``; here that dummy hash is awaited on the
+    hashing pool like every other one.
+
+    ``get_user`` runs on every request with a session, so the user it loads
+    is served from the "user" namespace of the tiered cache; together with
+    a cached session engine an authenticated request resolves its identity
+    without touching the database. That namespace skips the per-process
+    L1, so a lock or password change, which deletes the key on commit, is
+    seen by the next request in any process.
+    """
+
+    def get_user(self, user_id: Any):
+        user = get_tiered_cache().get_or_set(
+            "user", user_id, lambda: self._load_user(user_id)
+        )
+        if user is not None and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aget_user(self, user_id: Any):
+        user = await get_tiered_cache().aget_or_set(
+            "user", user_id, lambda: self._aload_user(user_id)
+        )
+        if user is not None and self.user_can_authenticate(user):
+            return user
+        return None
+
+    @staticmethod
+    def _load_user(user_id: Any):
+        return UserModel._default_manager.filter(pk=user_id).first()
+
+    @staticmethod
+    async def _aload_user(user_id: Any):
+        return await UserModel._default_manager.filter(pk=user_id).afirst()
+
+    async def aauthenticate(
+        self,
+        request: Optional[HttpRequest],
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        **kwargs: Any,
+    ):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            await get_hashing_service().amake(password, "password")
+            return None
+        if await user.acheck_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
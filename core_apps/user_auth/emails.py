@@ -1,48 +1,46 @@
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
 from django.utils.translation import gettext_lazy as _
 from loguru import logger
 
+from core_apps.common.mail import get_email_dispatcher
+
 
 def send_otp_email(email, otp):
-    subject = _("Your OTP code for login")
-    from_email = settings.DEFAULT_FROM_EMAIL
-    recipient_list = [email]
+    # Queued directly, not through the outbox; see user_auth.events.
     context = {
         "otp": otp,
         "expiry_time": settings.OTP_EXPIRATION,
         "site_name": settings.SITE_NAME,
     }
-
-    html_email = render_to_string("emails/otp_email.html", context)
-    plain_email = strip_tags(html_email)
-    email = EmailMultiAlternatives(subject, plain_email, from_email, recipient_list)
-    email.attach_alternative(html_email, "text/html")
     try:
-        email.send()
-        logger.info(f"OTP Email successfully sent! {context, email}")
+        get_email_dispatcher().send(
+            _("Your OTP code for login"), "emails/otp_email.html", context, [email]
+        )
+        logger.info("OTP email queued for {}", email)
     except Exception as e:
-        logger.error(f"{e}")
+        # Not logger.exception: a diagnosed traceback would write the code
+        # itself into the error log.
+        logger.error("Failed to queue OTP email for {}: {!r}", email, e)
 
 
 def send_account_locked_email(self):
-    subject = _("Your account has been locked")
-    from_email = settings.DEFAULT_FROM_EMAIL
-    recipient_list = [self.email]
     context = {
         "user": self,
         "lockout_date": settings.LOCKOUT_DURATION,
         "site_name": settings.SITE_NAME,
     }
-
-    html_email = render_to_string("emails/account_locked.html", context)
-    plain_email = strip_tags(html_email)
-    email = EmailMultiAlternatives(subject, plain_email, from_email, recipient_list)
-    email.attach_alternative(html_email, "text/html")
     try:
-        email.send()
-        logger.info(f"Account locked Email successfully sent! {context, email}")
+        # Concurrent failed logins can race into the lock; one email per
+        # lockout window is enough.
+        queued = get_email_dispatcher().send(
+            _("Your account has been locked"),
+            "emails/account_locked.html",
+            context,
+            [self.email],
+            dedupe_key=f"account_locked:{self.pk}",
+            dedupe_window=settings.EMAIL_DISPATCH["LOCKOUT_DEDUPE_WINDOW"],
+        )
+        if queued:
+            logger.info("Account locked email queued for {}", self.email)
     except Exception as e:
-        logger.error(f"{e}")
+        logger.error("Failed to queue account locked email for {}: {!r}", self.email, e)
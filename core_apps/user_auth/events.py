@@ -0,0 +1,24 @@
+from core_apps.common.outbox import outbox_handler
+
+from .emails import send_account_locked_email
+from .models import User
+
+# Domain events published through the outbox. Two side effects stay off it
+# on purpose:
+# - OTP emails. Login issues the code outside any transaction, so there is
+#   nothing to roll back, and an outbox row would keep the plain code in the
+#   database, where the OTP store only ever keeps a digest.
+# - Party bootstrap (user_profile.bootstrap). Immediate mode writes the
+#   party in the user's own transaction; deferred mode enqueues its task on
+#   commit, so a rolled-back transaction sends nothing, and an outbox row
+#   per user would bring back the per-user INSERT that mode removes.
+ACCOUNT_LOCKED = "user_auth.account_locked"
+
+
+@outbox_handler(ACCOUNT_LOCKED)
+def notify_account_locked(payload):
+    user = User.objects.filter(pk=payload["user_id"]).first()
+    # The email is deduplicated per lockout window, so a redelivered event
+    # sends nothing new.
+    if user is not None:
+        send_account_locked_email(user)
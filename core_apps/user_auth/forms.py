@@ -2,7 +2,6 @@ from typing import Any
 
 from django.contrib.auth.forms import UserChangeForm as DjUserChangeForm
 from django.contrib.auth.forms import UserCreationForm as DjUserCreationForm
-from django.contrib.auth.hashers import check_password, make_password
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
@@ -40,7 +39,7 @@ class UserCreationForm(DjUserCreationForm):
         cleaned_data = super().clean()
         is_superuser = cleaned_data.get("is_superuser")
         security_question = cleaned_data.get("security_question")
-        security_answer = make_password(cleaned_data.get("security_answer"))
+        security_answer = cleaned_data.get("security_answer")
 
         if not is_superuser:
             if not security_question:
@@ -58,6 +57,8 @@ class UserCreationForm(DjUserCreationForm):
 
     def save(self, commit=True):
         user = super().save(commit=False)
+        if self.cleaned_data.get("security_answer"):
+            user.set_security_answer(self.cleaned_data["security_answer"])
         if commit:
             user.save()
         return user
@@ -99,7 +100,7 @@ class UserChangeForm(DjUserChangeForm):
         cleaned_data = super().clean()
         is_superuser = cleaned_data.get("is_superuser")
         security_question = cleaned_data.get("security_question")
-        security_answer = make_password(cleaned_data.get("security_answer"))
+        security_answer = cleaned_data.get("security_answer")
 
         if not is_superuser:
             if not security_question:
@@ -119,3 +120,14 @@ class UserChangeForm(DjUserChangeForm):
             print(self.non_field_errors())
 
         return cleaned_data
+
+    def save(self, commit=True):
+        user = super().save(commit=False)
+        # The field shows the stored hash; only a newly typed answer is hashed.
+        if "security_answer" in self.changed_data and self.cleaned_data.get(
+            "security_answer"
+        ):
+            user.set_security_answer(self.cleaned_data["security_answer"])
+        if commit:
+            user.save()
+        return user
@@ -0,0 +1,172 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import repeat
+from typing import Any, Callable, Iterable, Optional
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    make_password,
+    verify_password,
+)
+
+
+class HashingBusy(RuntimeError):
+    """Raised when the pool is saturated for longer than ``TIMEOUT``.
+
+    The async methods raise it at once instead: waiting for a slot would
+    block the event loop.
+    """
+
+
+class ProfiledArgon2Hasher(Argon2PasswordHasher):
+    """Argon2 with the cost parameters of one named profile.
+
+    Passed as ``preferred`` to ``verify_password``, so hashes made with
+    older parameters report ``must_update`` and get rehashed on the next
+    successful check.
+    """
+
+    def __init__(self, time_cost: int, memory_cost: int, parallelism: int) -> None:
+        self.time_cost = time_cost
+        self.memory_cost = memory_cost
+        self.parallelism = parallelism
+
+
+@dataclass
+class HashCheck:
+    valid: bool
+    # The secret re-encoded with the current profile, when the stored hash
+    # was made with different parameters.
+    rehashed: Optional[str] = None
+
+
+def _hash(secret: str, params: dict[str, int]) -> str:
+    return make_password(secret, hasher=ProfiledArgon2Hasher(**params))
+
+
+def _check(secret: str, encoded: Optional[str], params: dict[str, int]) -> HashCheck:
+    hasher = ProfiledArgon2Hasher(**params)
+    valid, must_update = verify_password(secret, encoded, preferred=hasher)
+    if valid and must_update:
+        return HashCheck(valid=True, rehashed=make_password(secret, hasher=hasher))
+    return HashCheck(valid=valid)
+
+
+class InlineExecutor(Executor):
+    """Runs hashes on the calling thread, for tests and one-off scripts."""
+
+    def submit(self, fn: Callable, /, *args: Any, **kwargs: Any) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+
+def _build_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    # Spawned workers start clean, so Django has to be set up in each of
+    # them before the hashers can read settings.
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=django.setup,
+    )
+
+
+EXECUTOR_BACKENDS = {
+    "inline": lambda max_workers: InlineExecutor(),
+    "thread": lambda max_workers: ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="hashing"
+    ),
+    "process": _build_process_pool,
+}
+
+
+class HashingService:
+    """Runs Argon2 on a bounded pool instead of the request thread.
+
+    At most ``MAX_WORKERS`` hashes run at once and at most ``MAX_QUEUED``
+    more wait for a slot, which caps the memory Argon2 can claim under a
+    login burst. Argon2 releases the GIL, so threads are enough for most
+    deployments; the process pool is there for hosts where it is not.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        profiles: dict[str, dict[str, int]],
+        max_pending: int,
+        timeout: float,
+    ) -> None:
+        self.executor = executor
+        self.profiles = profiles
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _submit(self, fn: Callable, *args: Any, wait: bool = True) -> Future:
+        if wait:
+            acquired = self._slots.acquire(timeout=self.timeout)
+        else:
+            acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            raise HashingBusy("Hashing pool is saturated")
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hasher(self, profile: str) -> ProfiledArgon2Hasher:
+        return ProfiledArgon2Hasher(**self.profiles[profile])
+
+    def make(self, secret: Optional[str], profile: str) -> str:
+        if secret is None:
+            return make_password(None)
+        return self._submit(_hash, secret, self.profiles[profile]).result()
+
+    def check(self, secret: str, encoded: Optional[str], profile: str) -> HashCheck:
+        return self._submit(_check, secret, encoded, self.profiles[profile]).result()
+
+    def make_many(
+        self, secrets: Iterable[str], profile: str, chunksize: int = 16
+    ) -> list[str]:
+        """Hash a batch at once; ``chunksize`` cuts IPC on a process pool."""
+        params = self.profiles[profile]
+        return list(
+            self.executor.map(_hash, secrets, repeat(params), chunksize=chunksize)
+        )
+
+    async def amake(self, secret: Optional[str], profile: str) -> str:
+        if secret is None:
+            return make_password(None)
+        return await asyncio.wrap_future(
+            self._submit(_hash, secret, self.profiles[profile], wait=False)
+        )
+
+    async def acheck(
+        self, secret: str, encoded: Optional[str], profile: str
+    ) -> HashCheck:
+        return await asyncio.wrap_future(
+            self._submit(_check, secret, encoded, self.profiles[profile], wait=False)
+        )
+
+
+@lru_cache(maxsize=None)
+def get_hashing_service() -> HashingService:
+    config = settings.HASHING
+    max_workers = config["MAX_WORKERS"]
+    return HashingService(
+        executor=EXECUTOR_BACKENDS[config["EXECUTOR"]](max_workers),
+        profiles=config["PROFILES"],
+        max_pending=max_workers + config["MAX_QUEUED"],
+        timeout=config["TIMEOUT"],
+    )
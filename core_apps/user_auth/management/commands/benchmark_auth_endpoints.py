@@ -0,0 +1,139 @@
+import http.client
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core_apps.user_auth.models import User
+
+PASSWORD = "benchmark-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the OTP login endpoints on a WSGI and an ASGI server and "
+        "compare throughput and tail latency. Start both servers first, e.g. "
+        "`manage.py runserver 8000` and `uvicorn config.asgi:application "
+        "--port 8001`; both must use the same database and Redis."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--wsgi-url", default="http://localhost:8000")
+        parser.add_argument("--asgi-url", default="http://localhost:8001")
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            dest="endpoints",
+            choices=["login", "verify"],
+            help="Endpoint to load, may be repeated (default: both)",
+        )
+
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"]
+        self.users = self._create_users(concurrency)
+        try:
+            self.stdout.write(
+                f"{'server':<8}{'endpoint':<9}{'req/s':>9}{'p50 ms':>9}"
+                f"{'p99 ms':>9}{'errors':>8}"
+            )
+            for server in ("wsgi", "asgi"):
+                url = urlsplit(options[f"{server}_url"])
+                for endpoint in options["endpoints"] or ["login", "verify"]:
+                    self._local = threading.local()
+                    rate, p50, p99, errors = self._run(
+                        url, endpoint, options["requests"], concurrency
+                    )
+                    self.stdout.write(
+                        f"{server:<8}{endpoint:<9}{rate:>9.1f}{p50:>9.1f}"
+                        f"{p99:>9.1f}{errors:>8}"
+                    )
+        finally:
+            User.objects.filter(pk__in=[user.pk for user in self.users]).delete()
+
+    def _create_users(self, count):
+        # One account per client thread, so concurrent requests never share
+        # a pending code or a throttle window.
+        User.objects.filter(id_number__startswith="bench-").delete()
+        users = []
+        for index in range(count):
+            users.append(
+                User.objects.create_user(
+                    email=f"benchmark-{index}@example.com",
+                    password=PASSWORD,
+                    first_name="Bench",
+                    last_name="Mark",
+                    id_number=f"bench-{index}",
+                    security_question=User.SecurityQuestion.FAVORITE_COLOR,
+                    security_answer="blue",
+                )
+            )
+        return users
+
+    def _connection(self, url):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+            self._local.connection = connection
+        return connection
+
+    def _post(self, url, path, body):
+        connection = self._connection(url)
+        try:
+            connection.request(
+                "POST",
+                path,
+                json.dumps(body),
+                {"Content-Type": "application/json"},
+            )
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self._local.connection = None
+            return 0
+        if response.getheader("Connection", "").lower() == "close":
+            connection.close()
+            self._local.connection = None
+        return response.status
+
+    def _run(self, url, endpoint, requests, concurrency):
+        path = reverse(endpoint if endpoint == "login" else "verify-otp")
+        slots = threading.local()
+        counter = iter(range(concurrency))
+        counter_lock = threading.Lock()
+
+        def user_for_thread():
+            if not hasattr(slots, "user"):
+                with counter_lock:
+                    slots.user = self.users[next(counter)]
+            return slots.user
+
+        def one(_):
+            user = user_for_thread()
+            if endpoint == "login":
+                body = {"email": user.email, "password": PASSWORD}
+            else:
+                # Issuing the code is set-up, not part of the measurement.
+                body = {"email": user.email, "otp": user.set_otp()}
+            started = time.perf_counter()
+            status = self._post(url, path, body)
+            return (time.perf_counter() - started) * 1000, status == 200
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, range(requests)))
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for latency, _ in results]
+        errors = sum(1 for _, ok in results if not ok)
+        if errors == len(results):
+            raise CommandError(f"Every request to {url.geturl()}{path} failed")
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        return requests / elapsed, cuts[49], cuts[98], errors
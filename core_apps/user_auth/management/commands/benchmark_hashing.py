@@ -0,0 +1,81 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core_apps.user_auth.hashing import get_hashing_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure hashing latency (p50/p99) and throughput for each cost "
+        "profile through the configured hashing pool"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="Simulated request threads submitting to the pool",
+        )
+        parser.add_argument(
+            "--profile",
+            action="append",
+            dest="profiles",
+            help="Profile to measure, may be repeated (default: all)",
+        )
+
+    def handle(self, *args, **options):
+        service = get_hashing_service()
+        profiles = options["profiles"] or list(settings.HASHING["PROFILES"])
+        unknown = set(profiles) - set(settings.HASHING["PROFILES"])
+        if unknown:
+            raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}")
+
+        iterations, concurrency = options["iterations"], options["concurrency"]
+        self.stdout.write(
+            f"executor={settings.HASHING['EXECUTOR']} "
+            f"workers={settings.HASHING['MAX_WORKERS']} "
+            f"callers={concurrency} iterations={iterations}\n"
+        )
+        self.stdout.write(
+            f"{'profile':<18}{'op':<7}{'p50 ms':>9}{'p99 ms':>9}{'ops/s':>9}"
+        )
+
+        for profile in profiles:
+            encoded = service.make("correct horse battery staple", profile)
+            operations = {
+                "hash": lambda: service.make("correct horse battery staple", profile),
+                "verify": lambda: service.check(
+                    "correct horse battery staple", encoded, profile
+                ),
+            }
+            for name, operation in operations.items():
+                latencies, elapsed = self._run(operation, iterations, concurrency)
+                p50, p99 = self._percentiles(latencies)
+                self.stdout.write(
+                    f"{profile:<18}{name:<7}{p50:>9.1f}{p99:>9.1f}"
+                    f"{iterations / elapsed:>9.1f}"
+                )
+
+    def _run(self, operation, iterations, concurrency):
+        def timed(_):
+            started = time.perf_counter()
+            operation()
+            return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as callers:
+            latencies = list(callers.map(timed, range(iterations)))
+        return latencies, time.perf_counter() - started
+
+    @staticmethod
+    def _percentiles(latencies):
+        if len(latencies) < 2:
+            return latencies[0], latencies[0]
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        return cuts[49], cuts[98]
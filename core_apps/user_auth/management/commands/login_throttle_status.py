@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core_apps.user_auth.throttling import get_login_throttle
+
+
+class Command(BaseCommand):
+    help = "Show failed-login counts in the current throttle window"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=20)
+
+    def handle(self, *args, **options):
+        counts = get_login_throttle().window_counts()
+        window = settings.LOGIN_THROTTLE["WINDOW"]
+        if not counts:
+            self.stdout.write(f"No failed logins in the last {window}.")
+            return
+
+        self.stdout.write(f"Failed logins in the last {window}:")
+        ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+        for key, count in ranked[: options["limit"]]:
+            self.stdout.write(f"  {count:>6}  {key}")
@@ -1,20 +1,21 @@
 import random
 import string
-from os import getenv
+from datetime import datetime
 from typing import Any, Optional
 
-from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import UserManager as DjangoUserManager
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
+from django.db import connections, models
 from django.utils.translation import gettext_lazy as _
 
+from .usernames import USERNAME_LENGTH, get_username_allocator, username_prefix
+
 
 def generate_username() -> str:
-    bank_name = getenv("BANK_NAME")
-    words = bank_name.split()
-    prefix = "".join([word[0] for word in words]).upper()
-    remaining_length = 12 - len(prefix) - 1
+    """Random username, used where the username sequence is unavailable."""
+    prefix = username_prefix()
+    remaining_length = USERNAME_LENGTH - len(prefix) - 1
 
     random_char = "".join(
         random.choices(string.ascii_uppercase + string.digits, k=remaining_length)
@@ -37,17 +38,23 @@ class UserManager(DjangoUserManager):
         if not password:
             raise ValueError(_("Password is required"))
 
-        username = generate_username()
+        username = self.allocate_usernames(1)[0]
         email = self.normalize_email(email)
         validate_email_address(email)
 
-        user = self.model(username=username, email=email, **other_fields)
-        user.password = make_password(password)
         security_answer = other_fields.pop("security_answer", None)
+        user = self.model(username=username, email=email, **other_fields)
+        user.set_password(password)
         if security_answer:
             user.set_security_answer(security_answer)
 
         user.save(using=self._db)
+        return user
+
+    def allocate_usernames(self, count: int) -> list[str]:
+        if connections[self.db].vendor == "postgresql":
+            return get_username_allocator().allocate(count)
+        return [generate_username() for _ in range(count)]
 
     def create_user(
         self, email: str, password: Optional[str] = None, **other_fields: Any
@@ -69,3 +76,34 @@ class UserManager(DjangoUserManager):
             raise ValueError(_("Can not create this super user"))
 
         return self._create_user(email, password, **other_fields)
+
+
+class SecurityEventQuerySet(models.QuerySet):
+    """Lookups backed by the (column, occurred_at) indexes.
+
+    Bound queries with ``between`` so PostgreSQL only scans the monthly
+    partitions in range.
+    """
+
+    def for_user(self, user: Any) -> "SecurityEventQuerySet":
+        return self.filter(user=user)
+
+    def from_ip(self, ip_address: str) -> "SecurityEventQuerySet":
+        return self.filter(ip_address=ip_address)
+
+    def of_type(self, *event_types: str) -> "SecurityEventQuerySet":
+        return self.filter(event_type__in=event_types)
+
+    def between(
+        self, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> "SecurityEventQuerySet":
+        """Events in ``[start, end)``; either bound may be left open."""
+        queryset = self
+        if start is not None:
+            queryset = queryset.filter(occurred_at__gte=start)
+        if end is not None:
+            queryset = queryset.filter(occurred_at__lt=end)
+        return queryset
+
+
+SecurityEventManager = models.Manager.from_queryset(SecurityEventQuerySet)
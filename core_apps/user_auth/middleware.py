@@ -1,12 +1,39 @@
 from typing import Any
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
 
 class CustomHeaderMiddleware:
+    """Adds the authenticated user's email as ``X-Django-User``.
+
+    Runs natively under both WSGI and ASGI, so async views do not pay a
+    thread hop for this middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response) -> None:
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request) -> Any:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         response = self.get_response(request)
         if request.user.is_authenticated:
             response["X-Django-User"] = request.user.email
         return response
+
+    async def __acall__(self, request) -> Any:
+        response = await self.get_response(request)
+        user = request.user
+        # alogin/alogout replace request.user but not the auser() cache, so
+        # only fall back to auser() while the lazy user is still in place.
+        if isinstance(user, SimpleLazyObject):
+            user = await request.auser()
+        if user.is_authenticated:
+            response["X-Django-User"] = user.email
+        return response
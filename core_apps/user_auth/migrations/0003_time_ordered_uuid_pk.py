@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:47
+
+import core_apps.common.fields
+import core_apps.common.ids
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_auth', '0002_alter_user_username'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='id',
+            field=core_apps.common.fields.TimeOrderedUUIDField(db_index=True, default=core_apps.common.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
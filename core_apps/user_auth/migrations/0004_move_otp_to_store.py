@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:49
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_auth', '0003_time_ordered_uuid_pk'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='user',
+            name='otp_expiry_time',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='otp_hash',
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:05
+
+from django.db import migrations
+
+
+def create_username_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE SEQUENCE IF NOT EXISTS user_auth_username_seq')
+
+
+def drop_username_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP SEQUENCE IF EXISTS user_auth_username_seq')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_auth', '0004_move_otp_to_store'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_username_sequence, drop_username_sequence),
+    ]
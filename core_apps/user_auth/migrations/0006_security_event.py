@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:25
+
+import core_apps.common.fields
+import core_apps.common.ids
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+# On PostgreSQL the table is range-partitioned by month on occurred_at, so
+# the primary key has to include it; partitions are created by
+# security_events.ensure_partitions. A row trigger, cloned onto every
+# partition, makes the log append-only.
+CREATE_PARTITIONED_SQL = """
+CREATE TABLE user_auth_securityevent (
+    id uuid NOT NULL,
+    occurred_at timestamp with time zone NOT NULL,
+    event_type varchar(32) NOT NULL,
+    user_id uuid NULL,
+    ip_address inet NULL,
+    data jsonb NOT NULL,
+    PRIMARY KEY (id, occurred_at)
+) PARTITION BY RANGE (occurred_at)
+"""
+
+CREATE_TRIGGER_SQL = [
+    """
+    CREATE FUNCTION user_auth_securityevent_append_only() RETURNS trigger AS $$
+    BEGIN
+        RAISE EXCEPTION 'security events are append-only';
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER user_auth_securityevent_append_only
+    BEFORE UPDATE OR DELETE ON user_auth_securityevent
+    FOR EACH ROW EXECUTE FUNCTION user_auth_securityevent_append_only()
+    """,
+]
+
+
+def create_security_event_table(apps, schema_editor):
+    model = apps.get_model('user_auth', 'SecurityEvent')
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.create_model(model)
+        return
+    schema_editor.execute(CREATE_PARTITIONED_SQL)
+    for index in model._meta.indexes:
+        schema_editor.add_index(model, index)
+    for sql in CREATE_TRIGGER_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_security_event_table(apps, schema_editor):
+    schema_editor.delete_model(apps.get_model('user_auth', 'SecurityEvent'))
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP FUNCTION IF EXISTS user_auth_securityevent_append_only()'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_auth', '0005_username_sequence'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='SecurityEvent',
+                    fields=[
+                        ('id', core_apps.common.fields.TimeOrderedUUIDField(default=core_apps.common.ids.uuid7, editable=False, primary_key=True, serialize=False)),
+                        ('occurred_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Occurred at')),
+                        ('event_type', models.CharField(choices=[('login_failed', 'Login failed'), ('account_locked', 'Account locked'), ('account_unlocked', 'Account unlocked'), ('otp_issued', 'OTP issued'), ('otp_verified', 'OTP verified'), ('otp_failed', 'OTP failed'), ('role_granted', 'Role granted'), ('role_changed', 'Role changed'), ('role_revoked', 'Role revoked'), ('role_expired', 'Role expired')], max_length=32, verbose_name='Event type')),
+                        ('ip_address', models.GenericIPAddressField(blank=True, null=True, verbose_name='IP address')),
+                        ('data', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Data')),
+                        ('user', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='security_events', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+                    ],
+                    options={
+                        'verbose_name': 'Security Event',
+                        'verbose_name_plural': 'Security Events',
+                        'indexes': [models.Index(fields=['occurred_at', 'id'], name='securityevent_occurred_idx'), models.Index(fields=['user', 'occurred_at'], name='securityevent_user_idx'), models.Index(condition=models.Q(('ip_address__isnull', False)), fields=['ip_address', 'occurred_at'], name='securityevent_ip_idx'), models.Index(fields=['event_type', 'occurred_at'], name='securityevent_type_idx')],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(
+            create_security_event_table, drop_security_event_table
+        ),
+    ]
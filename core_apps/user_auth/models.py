@@ -1,19 +1,39 @@
-import random
-import uuid
+from typing import Any, Optional
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.contrib.auth.hashers import check_password, make_password
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from .emails import send_account_locked_email
-from .managers import UserManager
+from core_apps.common.cache import get_tiered_cache
+from core_apps.common.fields import TimeOrderedUUIDField
+from core_apps.common.metrics import account_lockouts, otp_issued, otp_verifications
+
+from .hashing import get_hashing_service
+from .managers import SecurityEventManager, UserManager
+from .otp import OTPStatus, get_otp_store, otp_digest
+from .throttling import get_login_throttle
 from .utils import generate_otp
 
 
-# TODO: Separate OTP to UserOTP model
+def _record(event_type: str, user: Any, ip_address: Optional[str] = None, **data: Any):
+    # security_events imports this module, so it loads late.
+    from .security_events import record_security_event
+
+    record_security_event(event_type, user, ip_address, **data)
+
+
+async def _arecord(
+    event_type: str, user: Any, ip_address: Optional[str] = None, **data: Any
+):
+    from .security_events import arecord_security_event
+
+    await arecord_security_event(event_type, user, ip_address, **data)
+
+
 class User(AbstractUser):
     class SecurityQuestion(models.TextChoices):
         FAVORITE_COLOR = ("favorite_color", _("What is your favorite color?"))
@@ -33,9 +53,7 @@ class User(AbstractUser):
         TELLER = ("teller", _("Teller"))
         BRANCH_MANAGER = ("branch_manager", _("Branch manager"))
 
-    id = models.UUIDField(
-        primary_key=True, default=uuid.uuid4, editable=False, db_index=True
-    )
+    id = TimeOrderedUUIDField(primary_key=True, db_index=True)
     username = models.CharField(
         _("Username"), max_length=12, unique=True, editable=False
     )
@@ -64,8 +82,6 @@ class User(AbstractUser):
         max_length=55,
     )
     last_failed_login = models.DateTimeField(null=True, blank=True)
-    otp_hash = models.CharField(max_length=128, blank=True)
-    otp_expiry_time = models.DateTimeField(null=True, blank=True)
     login_attempts = models.PositiveSmallIntegerField(default=0)
 
     objects = UserManager()
@@ -78,64 +94,187 @@ class User(AbstractUser):
         "security_answer",
     ]
 
-    def set_otp(self):
-        otp = f"{random.randint(100000, 999999)}"
-        self.otp_hash = make_password(otp)
-        self.otp_expiry_time = timezone.now() + settings.OTP_EXPIRATION
-        self.login_attempts = 0
-        self.save(update_fields=["otp_hash", "otp_expiry_time", "otp_attempts"])
+    # OTP state lives in the OTP store (Redis), not on the user row, so
+    # issuing and checking codes never writes to this table.
+    def set_otp(self) -> str:
+        otp = generate_otp()
+        get_otp_store().issue(
+            self.pk, otp_digest(self.pk, otp), settings.OTP_EXPIRATION
+        )
+        otp_issued.inc()
         return otp
 
-    def clear_otp(self):
-        self.otp_hash = ""
-        self.otp_expiry_time = None
-        self.login_attempts = 0
-        self.save(update_fields=["otp_hash", "otp_expiry_time", "otp_attempts"])
+    def clear_otp(self) -> None:
+        get_otp_store().clear(self.pk)
 
     def verify_otp(self, otp: str) -> bool:
-        if not self.otp_expiry_time:
-            return False
+        status = get_otp_store().verify(
+            self.pk, otp_digest(self.pk, otp), settings.MAX_OTP_ATTEMPTS
+        )
+        otp_verifications.inc(outcome=status.value)
+        return status == OTPStatus.VALID
 
-        if timezone.now() > self.otp_expiry_time:
-            self.clear_otp()
-            return False
+    async def aset_otp(self) -> str:
+        otp = generate_otp()
+        await get_otp_store().aissue(
+            self.pk, otp_digest(self.pk, otp), settings.OTP_EXPIRATION
+        )
+        otp_issued.inc()
+        return otp
 
-        if self.login_attempts >= settings.MAX_OTP_ATTEMPTS:
-            self.clear_otp()
-            return False
+    async def aclear_otp(self) -> None:
+        await get_otp_store().aclear(self.pk)
 
-        if check_password(otp, self.otp_hash):
-            self.clear_otp()
-            return True
+    async def averify_otp(self, otp: str) -> bool:
+        status = await get_otp_store().averify(
+            self.pk, otp_digest(self.pk, otp), settings.MAX_OTP_ATTEMPTS
+        )
+        otp_verifications.inc(outcome=status.value)
+        return status == OTPStatus.VALID
 
-        self.login_attempts += 1
-        self.save(update_fields=["otp_attempts"])
-        return False
+    def set_password(self, raw_password: Optional[str]) -> None:
+        self.password = get_hashing_service().make(raw_password, "password")
+        self._password = raw_password
+
+    def check_password(self, raw_password: str) -> bool:
+        result = get_hashing_service().check(raw_password, self.password, "password")
+        if result.rehashed:
+            self.password = result.rehashed
+            self.save(update_fields=["password"])
+        return result.valid
+
+    async def acheck_password(self, raw_password: str) -> bool:
+        result = await get_hashing_service().acheck(
+            raw_password, self.password, "password"
+        )
+        if result.rehashed:
+            self.password = result.rehashed
+            await self.asave(update_fields=["password"])
+        return result.valid
 
     def set_security_answer(self, answer: str):
         normalized = answer.strip().lower()
-        self.security_answer = make_password(normalized)
+        self.security_answer = get_hashing_service().make(normalized, "security_answer")
 
     def verify_security_answer(self, answer: str) -> bool:
         normalized = answer.strip().lower()
-        return check_password(normalized, self.security_answer)
+        result = get_hashing_service().check(
+            normalized, self.security_answer, "security_answer"
+        )
+        if result.rehashed:
+            self.security_answer = result.rehashed
+            self.save(update_fields=["security_answer"])
+        return result.valid
 
-    def handle_failed_login_attempts(self) -> None:
-        self.login_attempts += 1
-        self.last_failed_login = timezone.now()
-        if self.login_attempts >= settings.MAX_OTP_ATTEMPTS:
-            self.account_status = self.AccountStatus.LOCKED
+    def _lock_queryset(self) -> models.QuerySet:
+        # Failures are counted in the throttle; the row is written once, by
+        # whichever request makes the transition to locked.
+        return User.objects.filter(pk=self.pk).exclude(
+            account_status=self.AccountStatus.LOCKED
+        )
+
+    def _mark_locked(self, attempts: int, locked_at) -> None:
+        self.account_status = self.AccountStatus.LOCKED
+        self.login_attempts = attempts
+        self.last_failed_login = locked_at
 
-        send_account_locked_email(self)
-        self.save(update_fields=["login_attempts", "last_failed_login"])
+    def _lock(self, attempts: int, ip_address: Optional[str]) -> None:
+        # common.models needs the user model, so the outbox loads late.
+        from core_apps.common.outbox import publish_event
 
-    def reset_failed_login_attempts(self):
+        from .events import ACCOUNT_LOCKED
+
+        now = timezone.now()
+        with transaction.atomic():
+            locked = self._lock_queryset().update(
+                account_status=self.AccountStatus.LOCKED,
+                login_attempts=attempts,
+                last_failed_login=now,
+            )
+            if locked:
+                publish_event(ACCOUNT_LOCKED, {"user_id": self.pk})
+        if locked:
+            account_lockouts.inc()
+            self._mark_locked(attempts, now)
+            get_tiered_cache().delete_on_commit("user", self.pk)
+            _record(
+                SecurityEvent.EventType.ACCOUNT_LOCKED,
+                self,
+                ip_address,
+                failures=attempts,
+            )
+
+    @property
+    def _has_failed_logins(self) -> bool:
+        return not (
+            self.account_status == self.AccountStatus.ACTIVE
+            and not self.login_attempts
+            and self.last_failed_login is None
+        )
+
+    def _clear_failed_logins(self) -> None:
         self.login_attempts = 0
         self.last_failed_login = None
         self.account_status = self.AccountStatus.ACTIVE
-        self.save(update_fields=["login_attempts", "last_failed_login"])
+
+    def handle_failed_login_attempts(self, ip_address: Optional[str] = None) -> None:
+        failure = get_login_throttle().register_failure(self.pk, ip_address)
+        _record(
+            SecurityEvent.EventType.LOGIN_FAILED,
+            self,
+            ip_address,
+            failures=failure.user_failures,
+        )
+        if not failure.should_lock or self.account_status == self.AccountStatus.LOCKED:
+            return
+
+        self._lock(failure.user_failures, ip_address)
+
+    async def ahandle_failed_login_attempts(
+        self, ip_address: Optional[str] = None
+    ) -> None:
+        failure = await get_login_throttle().aregister_failure(self.pk, ip_address)
+        await _arecord(
+            SecurityEvent.EventType.LOGIN_FAILED,
+            self,
+            ip_address,
+            failures=failure.user_failures,
+        )
+        if not failure.should_lock or self.account_status == self.AccountStatus.LOCKED:
+            return
+
+        # The UPDATE and its outbox event share a transaction, which the
+        # async ORM cannot span; run both in one worker-thread hop.
+        await sync_to_async(self._lock)(failure.user_failures, ip_address)
+
+    def reset_failed_login_attempts(self) -> None:
+        get_login_throttle().reset_user(self.pk)
+        if not self._has_failed_logins:
+            return
+        was_locked = self.account_status == self.AccountStatus.LOCKED
+        self._clear_failed_logins()
+        self.save(
+            update_fields=["account_status", "login_attempts", "last_failed_login"]
+        )
+        if was_locked:
+            _record(SecurityEvent.EventType.ACCOUNT_UNLOCKED, self, reason="expired")
+
+    async def areset_failed_login_attempts(self) -> None:
+        await get_login_throttle().areset_user(self.pk)
+        if not self._has_failed_logins:
+            return
+        was_locked = self.account_status == self.AccountStatus.LOCKED
+        self._clear_failed_logins()
+        await self.asave(
+            update_fields=["account_status", "login_attempts", "last_failed_login"]
+        )
+        if was_locked:
+            await _arecord(
+                SecurityEvent.EventType.ACCOUNT_UNLOCKED, self, reason="expired"
+            )
 
     def unlock_account(self) -> None:
+        get_login_throttle().reset_user(self.pk)
         if self.account_status == self.AccountStatus.LOCKED:
             self.account_status = self.AccountStatus.ACTIVE
             self.last_failed_login = None
@@ -143,19 +282,17 @@ class User(AbstractUser):
             self.save(
                 update_fields=["account_status", "login_attempts", "last_failed_login"]
             )
+            _record(SecurityEvent.EventType.ACCOUNT_UNLOCKED, self, reason="manual")
 
     @property
     def is_locked_out(self) -> bool:
-        if self.account_status == self.AccountStatus.ACTIVE:
-            if (
-                self.last_failed_login
-                and (timezone.now() - self.last_failed_login)
-                > settings.LOCKOUT_DURATION
-            ):
-                self.unlock_account()
-                return False
+        # A pure read: an expired lock is lifted by the next successful login
+        # through reset_failed_login_attempts(), not here.
+        if self.account_status != self.AccountStatus.LOCKED:
+            return False
+        if self.last_failed_login is None:
             return True
-        return False
+        return timezone.now() - self.last_failed_login < settings.LOCKOUT_DURATION
 
     @property
     def full_name(self) -> str:
@@ -174,3 +311,78 @@ class User(AbstractUser):
 
     def __str__(self) -> str:
         return f"{self.full_name} - {self.get_role_display()}"  # type: ignore
+
+
+class SecurityEvent(models.Model):
+    """One security-relevant event, written once and never changed.
+
+    On PostgreSQL the table is range-partitioned by month on
+    ``occurred_at`` (see ``security_events.py``) and a trigger rejects
+    UPDATE and DELETE; old months are dropped whole. Events are recorded
+    through ``record_security_event``, which buffers them for bulk writes.
+    """
+
+    class EventType(models.TextChoices):
+        LOGIN_FAILED = ("login_failed", _("Login failed"))
+        ACCOUNT_LOCKED = ("account_locked", _("Account locked"))
+        ACCOUNT_UNLOCKED = ("account_unlocked", _("Account unlocked"))
+        OTP_ISSUED = ("otp_issued", _("OTP issued"))
+        OTP_VERIFIED = ("otp_verified", _("OTP verified"))
+        OTP_FAILED = ("otp_failed", _("OTP failed"))
+        ROLE_GRANTED = ("role_granted", _("Role granted"))
+        ROLE_CHANGED = ("role_changed", _("Role changed"))
+        ROLE_REVOKED = ("role_revoked", _("Role revoked"))
+        ROLE_EXPIRED = ("role_expired", _("Role expired"))
+
+    id = TimeOrderedUUIDField(primary_key=True)
+    occurred_at = models.DateTimeField(_("Occurred at"), default=timezone.now)
+    event_type = models.CharField(
+        _("Event type"), max_length=32, choices=EventType.choices
+    )
+    # No database constraint: the log outlives the users it mentions and
+    # bulk inserts skip the foreign-key checks.
+    user = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name="security_events",
+        verbose_name=_("User"),
+    )
+    ip_address = models.GenericIPAddressField(_("IP address"), null=True, blank=True)
+    data = models.JSONField(
+        _("Data"), default=dict, blank=True, encoder=DjangoJSONEncoder
+    )
+
+    objects = SecurityEventManager()
+
+    class Meta:
+        verbose_name = _("Security Event")
+        verbose_name_plural = _("Security Events")
+        indexes = [
+            models.Index(
+                fields=["occurred_at", "id"], name="securityevent_occurred_idx"
+            ),
+            models.Index(fields=["user", "occurred_at"], name="securityevent_user_idx"),
+            models.Index(
+                fields=["ip_address", "occurred_at"],
+                name="securityevent_ip_idx",
+                condition=models.Q(ip_address__isnull=False),
+            ),
+            models.Index(
+                fields=["event_type", "occurred_at"], name="securityevent_type_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.event_type} {self.occurred_at}"
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        if not self._state.adding:
+            raise TypeError("Security events are append-only")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args: Any, **kwargs: Any) -> Any:
+        raise TypeError("Security events are append-only")
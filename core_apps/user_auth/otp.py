@@ -0,0 +1,177 @@
+import hmac
+import threading
+import time
+from datetime import timedelta
+from enum import Enum
+from functools import lru_cache
+from typing import Any
+
+from django.conf import settings
+from django.utils.crypto import salted_hmac
+
+from core_apps.common.redis_client import (
+    get_async_redis_connection,
+    get_redis_connection,
+)
+
+
+class OTPStatus(str, Enum):
+    VALID = "valid"
+    INVALID = "invalid"
+    EXPIRED = "expired"
+    EXHAUSTED = "exhausted"
+
+
+def otp_digest(user_id: Any, otp: str) -> str:
+    """Keyed digest of a one-time code.
+
+    A 6-digit code has a million possible values, so a slow password hash
+    adds latency without adding safety. What protects the code is the short
+    TTL and the attempt limit; the HMAC (keyed with SECRET_KEY and bound to
+    the user) only keeps the plain code out of the store.
+    """
+    return salted_hmac(
+        "core_apps.user_auth.otp", f"{user_id}:{otp}", algorithm="sha256"
+    ).hexdigest()
+
+
+class OTPStore:
+    """Holds the pending one-time code of each user until it expires."""
+
+    def issue(self, user_id: Any, digest: str, ttl: timedelta) -> None:
+        raise NotImplementedError
+
+    def verify(self, user_id: Any, digest: str, max_attempts: int) -> OTPStatus:
+        """Count one attempt and check ``digest``, atomically.
+
+        The code is consumed when it matches or when the attempts run out.
+        """
+        raise NotImplementedError
+
+    def clear(self, user_id: Any) -> None:
+        raise NotImplementedError
+
+    # Async variants for the ASGI login flow. The defaults call the sync
+    # methods directly, which is only right for in-memory stores; backends
+    # that do I/O override them.
+    async def aissue(self, user_id: Any, digest: str, ttl: timedelta) -> None:
+        self.issue(user_id, digest, ttl)
+
+    async def averify(self, user_id: Any, digest: str, max_attempts: int) -> OTPStatus:
+        return self.verify(user_id, digest, max_attempts)
+
+    async def aclear(self, user_id: Any) -> None:
+        self.clear(user_id)
+
+
+class LocalOTPStore(OTPStore):
+    """In-process stand-in for tests and single-process development."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._codes: dict[str, dict[str, Any]] = {}
+
+    def issue(self, user_id: Any, digest: str, ttl: timedelta) -> None:
+        with self._lock:
+            self._codes[str(user_id)] = {
+                "digest": digest,
+                "attempts": 0,
+                "expires_at": time.monotonic() + ttl.total_seconds(),
+            }
+
+    def verify(self, user_id: Any, digest: str, max_attempts: int) -> OTPStatus:
+        key = str(user_id)
+        with self._lock:
+            entry = self._codes.get(key)
+            if entry is None:
+                return OTPStatus.EXPIRED
+            if time.monotonic() >= entry["expires_at"]:
+                del self._codes[key]
+                return OTPStatus.EXPIRED
+
+            entry["attempts"] += 1
+            if entry["attempts"] > max_attempts:
+                del self._codes[key]
+                return OTPStatus.EXHAUSTED
+            if hmac.compare_digest(entry["digest"], digest):
+                del self._codes[key]
+                return OTPStatus.VALID
+            return OTPStatus.INVALID
+
+    def clear(self, user_id: Any) -> None:
+        with self._lock:
+            self._codes.pop(str(user_id), None)
+
+
+class RedisOTPStore(OTPStore):
+    """Codes live in a Redis hash whose TTL is the code's lifetime."""
+
+    VERIFY_SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return 'expired'
+    end
+    local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+    if attempts > tonumber(ARGV[2]) then
+        redis.call('DEL', KEYS[1])
+        return 'exhausted'
+    end
+    if redis.call('HGET', KEYS[1], 'digest') == ARGV[1] then
+        redis.call('DEL', KEYS[1])
+        return 'valid'
+    end
+    return 'invalid'
+    """
+
+    def __init__(self, prefix: str = "otp") -> None:
+        self.prefix = prefix
+        self.client = get_redis_connection()
+        self._verify = self.client.register_script(self.VERIFY_SCRIPT)
+
+    def key(self, user_id: Any) -> str:
+        return f"{self.prefix}:{user_id}"
+
+    def _queue_issue(self, pipe: Any, user_id: Any, digest: str, ttl: timedelta):
+        key = self.key(user_id)
+        pipe.delete(key)
+        pipe.hset(key, mapping={"digest": digest, "attempts": 0})
+        pipe.pexpire(key, int(ttl.total_seconds() * 1000))
+        return pipe
+
+    @staticmethod
+    def _status(status: str | bytes) -> OTPStatus:
+        if isinstance(status, bytes):
+            status = status.decode()
+        return OTPStatus(status)
+
+    def issue(self, user_id: Any, digest: str, ttl: timedelta) -> None:
+        self._queue_issue(self.client.pipeline(), user_id, digest, ttl).execute()
+
+    def verify(self, user_id: Any, digest: str, max_attempts: int) -> OTPStatus:
+        status = self._verify(keys=[self.key(user_id)], args=[digest, max_attempts])
+        return self._status(status)
+
+    def clear(self, user_id: Any) -> None:
+        self.client.delete(self.key(user_id))
+
+    async def aissue(self, user_id: Any, digest: str, ttl: timedelta) -> None:
+        client = get_async_redis_connection()
+        await self._queue_issue(client.pipeline(), user_id, digest, ttl).execute()
+
+    async def averify(self, user_id: Any, digest: str, max_attempts: int) -> OTPStatus:
+        script = get_async_redis_connection().register_script(self.VERIFY_SCRIPT)
+        status = await script(keys=[self.key(user_id)], args=[digest, max_attempts])
+        return self._status(status)
+
+    async def aclear(self, user_id: Any) -> None:
+        await get_async_redis_connection().delete(self.key(user_id))
+
+
+OTP_STORE_BACKENDS = {
+    "local": LocalOTPStore,
+    "redis": RedisOTPStore,
+}
+
+
+@lru_cache(maxsize=None)
+def get_otp_store() -> OTPStore:
+    return OTP_STORE_BACKENDS[settings.OTP_STORE["BACKEND"]]()
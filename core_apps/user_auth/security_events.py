@@ -0,0 +1,294 @@
+import atexit
+import os
+import threading
+from datetime import date, datetime
+from datetime import timezone as dt_timezone
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+
+from asgiref.sync import sync_to_async
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.db import (
+    DataError,
+    IntegrityError,
+    close_old_connections,
+    connection,
+    transaction,
+)
+from django.utils import timezone
+from loguru import logger
+
+from .models import SecurityEvent
+
+TABLE = SecurityEvent._meta.db_table
+
+# Month partitions are named <table>_pYYYYMM and cover [start, end) in UTC.
+PARTITION_SQL = """
+CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {table}
+FOR VALUES FROM ('{start} 00:00:00+00') TO ('{end} 00:00:00+00')
+"""
+
+LIST_PARTITIONS_SQL = """
+SELECT child.relname
+FROM pg_inherits
+JOIN pg_class AS parent ON parent.oid = pg_inherits.inhparent
+JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+WHERE parent.relname = %s
+"""
+
+_known_partitions: set[date] = set()
+
+# Errors that pin a write on one of its rows, such as an IP address the
+# inet column refuses or a month whose partition was dropped; connection
+# errors and the like fail every row alike.
+REJECTED_ROW_ERRORS = (DataError, IntegrityError)
+
+
+def _month(moment: datetime) -> date:
+    moment = moment.astimezone(dt_timezone.utc)
+    return date(moment.year, moment.month, 1)
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+def ensure_partitions(months: Iterable[date]) -> None:
+    """Create the monthly partitions for ``months`` if they are missing."""
+    if connection.vendor != "postgresql":
+        return
+    missing = set(months) - _known_partitions
+    if not missing:
+        return
+    with connection.cursor() as cursor:
+        for month in sorted(missing):
+            cursor.execute(
+                PARTITION_SQL.format(
+                    partition=_partition_name(month),
+                    table=TABLE,
+                    start=month.isoformat(),
+                    end=_add_months(month, 1).isoformat(),
+                )
+            )
+    # Remembered once committed: a rolled-back CREATE must be run again.
+    transaction.on_commit(lambda: _known_partitions.update(missing))
+
+
+def drop_partitions_before(cutoff: date) -> list[str]:
+    """Drop every monthly partition that ends on or before ``cutoff``."""
+    if connection.vendor != "postgresql":
+        return []
+    prefix = f"{TABLE}_p"
+    dropped = []
+    with connection.cursor() as cursor:
+        cursor.execute(LIST_PARTITIONS_SQL, [TABLE])
+        for (name,) in cursor.fetchall():
+            suffix = name.removeprefix(prefix)
+            if name == suffix or not suffix.isdigit():
+                continue
+            month = date(int(suffix[:4]), int(suffix[4:]), 1)
+            if _add_months(month, 1) <= cutoff:
+                cursor.execute(f"DROP TABLE {name}")
+                _known_partitions.discard(month)
+                dropped.append(name)
+    return dropped
+
+
+def maintain_partitions(ahead: int, retention_months: int) -> list[str]:
+    """Create this month's and the next ``ahead`` months' partitions and drop
+    those older than ``retention_months``; returns the dropped names."""
+    this_month = _month(timezone.now())
+    ensure_partitions(_add_months(this_month, count) for count in range(ahead + 1))
+    dropped = drop_partitions_before(_add_months(this_month, -retention_months))
+    if dropped:
+        logger.info("Dropped security event partitions {}", ", ".join(dropped))
+    return dropped
+
+
+def write_security_events(events: list[SecurityEvent]) -> int:
+    if not events:
+        return 0
+    ensure_partitions({_month(event.occurred_at) for event in events})
+    SecurityEvent.objects.bulk_create(events)
+    return len(events)
+
+
+class SecurityEventRecorder:
+    """Takes events from the request path and gets them into the table."""
+
+    def record(self, event: SecurityEvent) -> None:
+        raise NotImplementedError
+
+    async def arecord(self, event: SecurityEvent) -> None:
+        self.record(event)
+
+    def flush(self) -> int:
+        """Write out whatever is buffered; returns the number of events."""
+        return 0
+
+
+class InlineSecurityEventRecorder(SecurityEventRecorder):
+    """Writes every event as it is recorded; for tests and development."""
+
+    def record(self, event: SecurityEvent) -> None:
+        write_security_events([event])
+
+    async def arecord(self, event: SecurityEvent) -> None:
+        await sync_to_async(self.record)(event)
+
+
+class BufferedSecurityEventRecorder(SecurityEventRecorder):
+    """Per-process buffer written out in bulk by a background thread.
+
+    Recording is a list append under a lock, so it never waits on the
+    database and is safe to call from the event loop. The thread writes
+    the buffer every ``flush_interval`` seconds, or as soon as
+    ``batch_size`` events are waiting, and the buffer is flushed again at
+    process exit. A process killed outright loses at most one interval's
+    events; past ``max_buffered`` (a database outage) new events are
+    dropped and counted rather than exhausting memory.
+
+    A batch the database refuses because of its data is written again one
+    row at a time, and the rows refused on their own are logged and
+    dropped, so one bad event cannot hold up the ones behind it.
+    """
+
+    def __init__(self) -> None:
+        config = settings.SECURITY_EVENTS
+        self.flush_interval = config["FLUSH_INTERVAL"]
+        self.batch_size = config["BATCH_SIZE"]
+        self.max_buffered = config["MAX_BUFFERED"]
+        self._reset()
+        # A forked worker must not write its parent's events a second time.
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.flush)
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._events: list[SecurityEvent] = []
+        self._dropped = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, event: SecurityEvent) -> None:
+        with self._lock:
+            if len(self._events) >= self.max_buffered:
+                self._dropped += 1
+                return
+            self._events.append(event)
+            size = len(self._events)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="security-event-writer", daemon=True
+                )
+                self._thread.start()
+        if size == self.batch_size:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to write security events")
+            finally:
+                close_old_connections()
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                events, self._events = self._events, []
+                dropped, self._dropped = self._dropped, 0
+            if dropped:
+                logger.error("Dropped {} security events: buffer full", dropped)
+
+            written = 0
+            for start in range(0, len(events), self.batch_size):
+                batch = events[start : start + self.batch_size]
+                try:
+                    written += self._write(batch)
+                    continue
+                except REJECTED_ROW_ERRORS:
+                    pass
+                except Exception:
+                    self._requeue(events[start:])
+                    raise
+                for index, event in enumerate(batch):
+                    try:
+                        written += self._write([event])
+                    except REJECTED_ROW_ERRORS as e:
+                        logger.error(
+                            "Dropped security event {} {}: {!r}",
+                            event.event_type,
+                            event.occurred_at,
+                            e,
+                        )
+                    except Exception:
+                        self._requeue(events[start + index :])
+                        raise
+            return written
+
+    @staticmethod
+    def _write(events: list[SecurityEvent]) -> int:
+        # Atomic, so a refused write leaves no open transaction broken for
+        # the next one.
+        with transaction.atomic():
+            return write_security_events(events)
+
+    def _requeue(self, events: list[SecurityEvent]) -> None:
+        with self._lock:
+            room = max(self.max_buffered - len(self._events), 0)
+            self._events[:0] = events[:room]
+            self._dropped += len(events) - len(events[:room])
+
+
+RECORDER_BACKENDS = {
+    "inline": InlineSecurityEventRecorder,
+    "buffered": BufferedSecurityEventRecorder,
+}
+
+
+@lru_cache(maxsize=None)
+def get_security_event_recorder() -> SecurityEventRecorder:
+    return RECORDER_BACKENDS[settings.SECURITY_EVENTS["BACKEND"]]()
+
+
+def _event(
+    event_type: str, user: Any, ip_address: Optional[str], data: dict[str, Any]
+) -> SecurityEvent:
+    return SecurityEvent(
+        event_type=event_type,
+        user_id=getattr(user, "pk", user),
+        ip_address=ip_address,
+        data=data,
+    )
+
+
+def record_security_event(
+    event_type: str, user: Any = None, ip_address: Optional[str] = None, **data: Any
+) -> None:
+    """Record an event; ``user`` may be a user or a user id."""
+    get_security_event_recorder().record(_event(event_type, user, ip_address, data))
+
+
+async def arecord_security_event(
+    event_type: str, user: Any = None, ip_address: Optional[str] = None, **data: Any
+) -> None:
+    await get_security_event_recorder().arecord(
+        _event(event_type, user, ip_address, data)
+    )
+
+
+@worker_process_shutdown.connect
+def flush_security_events(**kwargs: Any) -> None:
+    if get_security_event_recorder.cache_info().currsize:
+        get_security_event_recorder().flush()
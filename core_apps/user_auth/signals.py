@@ -0,0 +1,7 @@
+from core_apps.common.cache import invalidate_on
+
+from .models import User
+
+# Covers password changes, unlocks and admin edits; the lockout UPDATE
+# bypasses save() and invalidates on its own.
+invalidate_on(User, "user", lambda user: [user.pk])
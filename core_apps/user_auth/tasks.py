@@ -0,0 +1,11 @@
+from celery import shared_task
+from django.conf import settings
+
+from .security_events import maintain_partitions
+
+
+@shared_task(ignore_result=True)
+def maintain_security_event_partitions():
+    """Create upcoming SecurityEvent partitions and drop expired ones."""
+    config = settings.SECURITY_EVENTS
+    return maintain_partitions(config["PARTITIONS_AHEAD"], config["RETENTION_MONTHS"])
@@ -1,3 +1,822 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test import (
+    Client,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from core_apps.common.cache import TieredCache, get_tiered_cache
+from core_apps.user_profile.models import PartyUserRole
+
+from .backends import UserAuthBackend
+from .hashing import HashingBusy, HashingService
+from .management.commands.import_customers import Command
+from .models import SecurityEvent, User
+from .otp import LocalOTPStore, OTPStatus, get_otp_store
+from .security_events import (
+    LIST_PARTITIONS_SQL,
+    BufferedSecurityEventRecorder,
+    _add_months,
+    _known_partitions,
+    _month,
+    _partition_name,
+    ensure_partitions,
+    get_security_event_recorder,
+    maintain_partitions,
+    write_security_events,
+)
+from .throttling import LocalSlidingWindowLimiter, get_login_throttle
+from .usernames import (
+    ALPHABET,
+    USERNAME_LENGTH,
+    USERNAME_SEQUENCE,
+    UsernameAllocator,
+    encode_username,
+    username_prefix,
+)
+
+PASSWORD = "correct-horse-battery"
+IMPORT_FIELDS = {
+    "password": PASSWORD,
+    "first_name": "Ada",
+    "last_name": "Lovelace",
+    "id_number": "",
+    "security_question": "favorite_color",
+    "security_answer": "Blue",
+}
+
+
+def create_user(email: str = "ada@example.com", **fields) -> User:
+    return User.objects.create_user(
+        email=email,
+        password=PASSWORD,
+        first_name="Ada",
+        last_name="Lovelace",
+        id_number=fields.pop("id_number", "1815"),
+        security_question="favorite_color",
+        security_answer="Blue",
+        **fields,
+    )
+
+
+class AuthTestMixin:
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Before the test transaction opens: a partition created inside it
+        # would roll back while ensure_partitions still remembers it.
+        maintain_partitions(ahead=1, retention_months=1200)
+        super().setUpClass()
+
+    def setUp(self) -> None:
+        super().setUp()
+        # The local stores live for the process; start each test empty.
+        get_otp_store.cache_clear()
+        get_login_throttle.cache_clear()
+
+    def post(self, name: str, headers: dict | None = None, **data):
+        return self.client.post(
+            reverse(name),
+            json.dumps(data),
+            content_type="application/json",
+            headers=headers,
+        )
+
+    def sent_otp(self) -> str:
+        return re.search(r"\b\d{6}\b", mail.outbox[-1].body).group()
+
+
+class AuthTestCase(AuthTestMixin, TestCase):
+    pass
+
+
+@override_settings(
+    SECURITY_EVENTS={
+        **settings.SECURITY_EVENTS,
+        "BACKEND": "buffered",
+        "FLUSH_INTERVAL": 3600,
+    }
+)
+class AuthViewQueryBudgetTests(AuthTestMixin, TransactionTestCase):
+    """The test settings measure every request and raise
+    ``QueryBudgetExceeded`` past a view's ``@query_budget``, so each of
+    these requests fails outright if its view outgrows the budget.
+
+    Counts match production: no test transaction adds savepoints, and
+    security events are buffered, then written in ``tearDown``.
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        get_security_event_recorder.cache_clear()
+
+    def tearDown(self) -> None:
+        get_security_event_recorder().flush()
+        self.assertTrue(SecurityEvent.objects.exists())
+        get_security_event_recorder.cache_clear()
+        super().tearDown()
+
+    def assertWithinBudget(self, response, budget: int) -> None:
+        self.assertLessEqual(int(response["X-DB-Queries"]), budget)
+
+    def test_login_verify_logout(self) -> None:
+        create_user()
+
+        response = self.post("login", email="ada@example.com", password=PASSWORD)
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinBudget(response, 4)
+
+        response = self.post("verify-otp", email="ada@example.com", otp=self.sent_otp())
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinBudget(response, 5)
+
+        response = self.post("logout")
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinBudget(response, 3)
+
+    def test_failed_login_paths(self) -> None:
+        # Below the lockout threshold: the local outbox publisher relays the
+        # lockout event inside the request, which production leaves to Celery.
+        create_user()
+        for _ in range(settings.LOGIN_THROTTLE["MAX_FAILURES_PER_USER"] - 1):
+            response = self.post("login", email="ada@example.com", password="wrong")
+            self.assertWithinBudget(response, 4)
+        response = self.post("login", email="nobody@example.com", password="wrong")
+        self.assertWithinBudget(response, 4)
+
+    def test_failed_verify(self) -> None:
+        create_user()
+        self.post("login", email="ada@example.com", password=PASSWORD)
+        response = self.post("verify-otp", email="ada@example.com", otp="000000")
+        self.assertEqual(response.status_code, 401)
+        self.assertWithinBudget(response, 5)
+
+    def test_verify_requires_the_csrf_token_from_login(self) -> None:
+        create_user()
+        self.client = Client(enforce_csrf_checks=True)
+        response = self.post("login", email="ada@example.com", password=PASSWORD)
+        self.assertEqual(response.status_code, 200)
+        token = response.cookies[settings.CSRF_COOKIE_NAME].value
+
+        response = self.post("verify-otp", email="ada@example.com", otp=self.sent_otp())
+        self.assertEqual(response.status_code, 403)
+        response = self.post(
+            "verify-otp",
+            headers={"X-CSRFToken": token},
+            email="ada@example.com",
+            otp=self.sent_otp(),
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class LoginResponseTests(AuthTestCase):
+    def lock(self, user: User) -> None:
+        user.account_status = User.AccountStatus.LOCKED
+        user.last_failed_login = timezone.now()
+        user.save()
+
+    def test_failures_look_alike(self) -> None:
+        self.lock(create_user())
+        unknown = self.post("login", email="nobody@example.com", password="wrong")
+        locked = self.post("login", email="ada@example.com", password="wrong")
+        self.assertEqual(unknown.status_code, 401)
+        self.assertEqual(locked.status_code, 401)
+        self.assertEqual(unknown.json(), locked.json())
+
+    def test_wrong_password_on_locked_account_is_recorded(self) -> None:
+        user = create_user()
+        self.lock(user)
+        self.post("login", email="ada@example.com", password="wrong")
+        self.assertTrue(
+            SecurityEvent.objects.filter(
+                user=user, event_type=SecurityEvent.EventType.LOGIN_FAILED
+            ).exists()
+        )
+
+    def test_locked_only_after_password(self) -> None:
+        self.lock(create_user())
+        response = self.post("login", email="ada@example.com", password=PASSWORD)
+        self.assertEqual(response.status_code, 423)
+        self.assertEqual(mail.outbox, [])
+
+    def test_verify_hides_lock_behind_a_valid_code(self) -> None:
+        self.lock(create_user())
+        response = self.post("verify-otp", email="ada@example.com", otp="000000")
+        self.assertEqual(response.status_code, 401)
+
+    def test_verify_is_throttled_per_ip(self) -> None:
+        create_user()
+        self.post("login", email="ada@example.com", password=PASSWORD)
+        throttle = get_login_throttle()
+        for _ in range(settings.LOGIN_THROTTLE["MAX_FAILURES_PER_IP"]):
+            throttle.register_failure(None, "127.0.0.1")
+
+        response = self.post("verify-otp", email="ada@example.com", otp=self.sent_otp())
+        self.assertEqual(response.status_code, 429)
+
+    def test_saturated_hashing_pool_answers_503(self) -> None:
+        create_user()
+        with mock.patch.object(HashingService, "_submit", side_effect=HashingBusy):
+            known = self.post("login", email="ada@example.com", password=PASSWORD)
+            unknown = self.post("login", email="nobody@example.com", password="x")
+        for response in (known, unknown):
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(
+                response["Retry-After"], str(settings.HASHING["RETRY_AFTER"])
+            )
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(SecurityEvent.objects.exists())
+
+
+class HashingServiceTests(SimpleTestCase):
+    def setUp(self) -> None:
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        self.service = HashingService(
+            executor, settings.HASHING["PROFILES"], max_pending=1, timeout=5
+        )
+        # Hold the only slot until the test is done.
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self.service._submit(release.wait)
+
+    def test_async_fails_fast_when_saturated(self) -> None:
+        started = time.monotonic()
+        with self.assertRaises(HashingBusy):
+            asyncio.run(self.service.acheck("secret", None, "password"))
+        with self.assertRaises(HashingBusy):
+            asyncio.run(self.service.amake("secret", "password"))
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_sync_waits_for_a_slot(self) -> None:
+        self.service.timeout = 0.05
+        started = time.monotonic()
+        with self.assertRaises(HashingBusy):
+            self.service.make("secret", "password")
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+
+
+class Clock:
+    """Stands in for the ``time`` module of a store under test."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class OTPStoreTests(SimpleTestCase):
+    TTL = timedelta(minutes=2)
+
+    def setUp(self) -> None:
+        self.clock = Clock()
+        patcher = mock.patch("core_apps.user_auth.otp.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = LocalOTPStore()
+        self.store.issue("user", "right", self.TTL)
+
+    def test_match_consumes_the_code(self) -> None:
+        self.assertEqual(self.store.verify("user", "wrong", 3), OTPStatus.INVALID)
+        self.assertEqual(self.store.verify("user", "right", 3), OTPStatus.VALID)
+        self.assertEqual(self.store.verify("user", "right", 3), OTPStatus.EXPIRED)
+
+    def test_expiry(self) -> None:
+        self.clock.now += self.TTL.total_seconds() - 1
+        self.assertEqual(self.store.verify("user", "wrong", 3), OTPStatus.INVALID)
+        self.clock.now += 1
+        self.assertEqual(self.store.verify("user", "right", 3), OTPStatus.EXPIRED)
+
+    def test_attempt_limit(self) -> None:
+        for _ in range(3):
+            self.assertEqual(self.store.verify("user", "wrong", 3), OTPStatus.INVALID)
+        self.assertEqual(self.store.verify("user", "right", 3), OTPStatus.EXHAUSTED)
+        self.assertEqual(self.store.verify("user", "right", 3), OTPStatus.EXPIRED)
+
+    def test_reissue_starts_over(self) -> None:
+        for _ in range(3):
+            self.store.verify("user", "wrong", 3)
+        self.store.issue("user", "new", self.TTL)
+        self.assertEqual(self.store.verify("user", "right", 3), OTPStatus.INVALID)
+        self.assertEqual(self.store.verify("user", "new", 3), OTPStatus.VALID)
+
+
+class UserOTPTests(AuthTestCase):
+    def test_code_is_single_use_and_limited(self) -> None:
+        user = create_user()
+        otp = user.set_otp()
+        for _ in range(settings.MAX_OTP_ATTEMPTS):
+            self.assertFalse(user.verify_otp("not-it"))
+        self.assertFalse(user.verify_otp(otp))
+
+        otp = user.set_otp()
+        self.assertTrue(user.verify_otp(otp))
+        self.assertFalse(user.verify_otp(otp))
+
+    def test_expired_code_is_refused(self) -> None:
+        user = create_user()
+        clock = Clock()
+        with mock.patch("core_apps.user_auth.otp.time", clock):
+            otp = user.set_otp()
+            clock.now += settings.OTP_EXPIRATION.total_seconds()
+            self.assertFalse(user.verify_otp(otp))
+
+    def test_store_keeps_no_plain_code(self) -> None:
+        user = create_user()
+        otp = user.set_otp()
+        self.assertNotIn(otp, repr(get_otp_store()._codes))
+
+
+class SlidingWindowTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.clock = Clock()
+        patcher = mock.patch("core_apps.user_auth.throttling.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.limiter = LocalSlidingWindowLimiter(window=60)
+
+    def test_events_leave_the_window(self) -> None:
+        self.assertEqual(self.limiter.hit("key"), 1)
+        self.clock.now += 30
+        self.assertEqual(self.limiter.hit("key"), 2)
+        self.clock.now += 30
+        self.assertEqual(self.limiter.count("key"), 1)
+        self.assertEqual(self.limiter.window_counts(), {"key": 1})
+        self.clock.now += 30
+        self.assertEqual(self.limiter.count("key"), 0)
+        self.assertEqual(self.limiter.window_counts(), {})
+
+    def test_reset(self) -> None:
+        self.limiter.hit("key")
+        self.limiter.hit("other")
+        self.limiter.reset("key")
+        self.assertEqual(self.limiter.count("key"), 0)
+        self.assertEqual(self.limiter.count("other"), 1)
+
+
+class LockoutTests(AuthTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.user = create_user()
+        self.clock = Clock()
+        patcher = mock.patch("core_apps.user_auth.throttling.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fail(self, times: int) -> None:
+        for _ in range(times):
+            self.user.handle_failed_login_attempts("10.0.0.1")
+
+    def test_threshold_locks(self) -> None:
+        limit = settings.LOGIN_THROTTLE["MAX_FAILURES_PER_USER"]
+        self.fail(limit - 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.account_status, User.AccountStatus.ACTIVE)
+
+        self.fail(1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.account_status, User.AccountStatus.LOCKED)
+        self.assertEqual(self.user.login_attempts, limit)
+
+    def test_old_failures_do_not_count(self) -> None:
+        limit = settings.LOGIN_THROTTLE["MAX_FAILURES_PER_USER"]
+        self.fail(limit - 1)
+        self.clock.now += settings.LOGIN_THROTTLE["WINDOW"].total_seconds()
+        self.fail(limit - 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.account_status, User.AccountStatus.ACTIVE)
+
+    def test_reset_clears_the_count(self) -> None:
+        limit = settings.LOGIN_THROTTLE["MAX_FAILURES_PER_USER"]
+        self.fail(limit - 1)
+        self.user.reset_failed_login_attempts()
+        self.fail(limit - 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.account_status, User.AccountStatus.ACTIVE)
+
+        self.fail(1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.account_status, User.AccountStatus.LOCKED)
+        self.user.unlock_account()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.account_status, User.AccountStatus.ACTIVE)
+        self.fail(limit - 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.account_status, User.AccountStatus.ACTIVE)
+
+    def test_ip_limit(self) -> None:
+        throttle = get_login_throttle()
+        limit = settings.LOGIN_THROTTLE["MAX_FAILURES_PER_IP"]
+        for _ in range(limit - 1):
+            throttle.register_failure(None, "10.0.0.2")
+        self.assertFalse(throttle.is_ip_blocked("10.0.0.2"))
+        throttle.register_failure(None, "10.0.0.2")
+        self.assertTrue(throttle.is_ip_blocked("10.0.0.2"))
+        self.clock.now += settings.LOGIN_THROTTLE["WINDOW"].total_seconds()
+        self.assertFalse(throttle.is_ip_blocked("10.0.0.2"))
+
+
+@override_settings(
+    SECURITY_EVENTS={
+        **settings.SECURITY_EVENTS,
+        "BACKEND": "buffered",
+        "BATCH_SIZE": 2,
+        "MAX_BUFFERED": 4,
+    }
+)
+class BufferedSecurityEventTests(AuthTestMixin, TransactionTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        # No writer thread; the tests flush by hand.
+        patcher = mock.patch.object(BufferedSecurityEventRecorder, "_run")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.recorder = BufferedSecurityEventRecorder()
+
+    def record(self, ip_address: str = "10.0.0.1", **fields) -> None:
+        self.recorder.record(
+            SecurityEvent(
+                event_type=SecurityEvent.EventType.LOGIN_FAILED,
+                ip_address=ip_address,
+                **fields,
+            )
+        )
+
+    def test_flush_writes_the_buffer(self) -> None:
+        for _ in range(3):
+            self.record()
+        self.assertFalse(SecurityEvent.objects.exists())
+        self.assertEqual(self.recorder.flush(), 3)
+        self.assertEqual(SecurityEvent.objects.count(), 3)
+        self.assertEqual(self.recorder.flush(), 0)
+
+    def test_full_buffer_drops_new_events(self) -> None:
+        for _ in range(6):
+            self.record()
+        self.assertEqual(self.recorder.flush(), 4)
+
+    def test_refused_rows_are_dropped(self) -> None:
+        # A month this process still believes has a partition.
+        gone = _add_months(_month(timezone.now()), -600)
+        _known_partitions.add(gone)
+        self.addCleanup(_known_partitions.discard, gone)
+
+        self.record("10.0.0.1")
+        self.record("not-an-ip")
+        self.record(
+            "10.0.0.3", occurred_at=datetime(gone.year, gone.month, 15, tzinfo=UTC)
+        )
+        self.record("10.0.0.4")
+
+        self.assertEqual(self.recorder.flush(), 2)
+        self.assertCountEqual(
+            SecurityEvent.objects.values_list("ip_address", flat=True),
+            ["10.0.0.1", "10.0.0.4"],
+        )
+        self.assertEqual(self.recorder.flush(), 0)
+
+    def test_outage_keeps_the_buffer(self) -> None:
+        for _ in range(3):
+            self.record()
+        with mock.patch(
+            "core_apps.user_auth.security_events.write_security_events",
+            side_effect=OperationalError,
+        ):
+            with self.assertRaises(OperationalError):
+                self.recorder.flush()
+        self.assertEqual(self.recorder.flush(), 3)
+
+
+class SecurityEventPartitionTests(TransactionTestCase):
+    def partitions(self) -> set[str]:
+        with connection.cursor() as cursor:
+            cursor.execute(LIST_PARTITIONS_SQL, [SecurityEvent._meta.db_table])
+            return {name for (name,) in cursor.fetchall()}
+
+    def test_maintain_creates_ahead_and_drops_old(self) -> None:
+        this_month = _month(timezone.now())
+        old = _add_months(this_month, -60)
+        ensure_partitions([old])
+        self.assertIn(_partition_name(old), self.partitions())
+
+        dropped = maintain_partitions(ahead=2, retention_months=24)
+        self.assertEqual(dropped, [_partition_name(old)])
+        partitions = self.partitions()
+        self.assertNotIn(_partition_name(old), partitions)
+        for count in range(3):
+            self.assertIn(_partition_name(_add_months(this_month, count)), partitions)
+
+    def test_event_lands_in_its_month(self) -> None:
+        moment = timezone.now()
+        write_security_events(
+            [SecurityEvent(event_type=SecurityEvent.EventType.OTP_ISSUED)]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {_partition_name(_month(moment))}")
+            self.assertEqual(cursor.fetchone(), (1,))
+
+
+class SecurityEventQueryTests(AuthTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.ada = create_user()
+        self.grace = create_user("grace@example.com", id_number="1906")
+        self.start = timezone.now().replace(minute=0, second=0, microsecond=0)
+        failed, issued = (
+            SecurityEvent.EventType.LOGIN_FAILED,
+            SecurityEvent.EventType.OTP_ISSUED,
+        )
+        self.events = [
+            SecurityEvent(
+                event_type=event_type,
+                user=user,
+                ip_address=ip_address,
+                occurred_at=self.start + timedelta(minutes=minutes),
+            )
+            for event_type, user, ip_address, minutes in [
+                (failed, self.ada, "10.0.0.1", 0),
+                (issued, self.ada, "10.0.0.1", 10),
+                (failed, self.grace, "10.0.0.2", 20),
+                (failed, None, "10.0.0.2", 30),
+            ]
+        ]
+        write_security_events(self.events)
+
+    def assertEvents(self, queryset, *indexes: int) -> None:
+        self.assertCountEqual(
+            queryset.values_list("pk", flat=True),
+            [self.events[index].pk for index in indexes],
+        )
+
+    def test_lookups(self) -> None:
+        events = SecurityEvent.objects
+        self.assertEvents(events.for_user(self.ada), 0, 1)
+        self.assertEvents(events.from_ip("10.0.0.2"), 2, 3)
+        self.assertEvents(events.of_type(SecurityEvent.EventType.LOGIN_FAILED), 0, 2, 3)
+        self.assertEvents(
+            events.for_user(self.ada).of_type(SecurityEvent.EventType.OTP_ISSUED), 1
+        )
+
+    def test_between_is_half_open(self) -> None:
+        events = SecurityEvent.objects
+        start = self.start + timedelta(minutes=10)
+        end = self.start + timedelta(minutes=30)
+        self.assertEvents(events.between(start, end), 1, 2)
+        self.assertEvents(events.between(start=end), 3)
+        self.assertEvents(events.between(end=start), 0)
+        self.assertEvents(events.between(), 0, 1, 2, 3)
+
+
+class EncodeUsernameTests(SimpleTestCase):
+    # Leaves two characters of code: 36 ** 2 usernames.
+    PREFIX = "ABCDEFGHI"
+
+    def test_bijection(self) -> None:
+        space = len(ALPHABET) ** 2
+        usernames = {encode_username(number, self.PREFIX) for number in range(space)}
+        self.assertEqual(len(usernames), space)
+        for username in usernames:
+            self.assertEqual(len(username), USERNAME_LENGTH)
+            self.assertTrue(username.startswith(f"{self.PREFIX}-"))
+
+    def test_consecutive_numbers_are_scattered(self) -> None:
+        first, second = (encode_username(n, "HB") for n in (1, 2))
+        self.assertNotEqual(first[:-1], second[:-1])
+
+    def test_exhausted_space(self) -> None:
+        with self.assertRaises(OverflowError):
+            encode_username(len(ALPHABET) ** 2, self.PREFIX)
+        with self.assertRaises(OverflowError):
+            encode_username(-1, self.PREFIX)
+
+
+class UsernameAllocatorTests(TestCase):
+    def setUp(self) -> None:
+        self.allocator = UsernameAllocator(block_size=3)
+
+    def next_number(self) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval(%s)", [USERNAME_SEQUENCE])
+            return cursor.fetchone()[0]
+
+    def test_unique_across_block_refills(self) -> None:
+        with self.assertNumQueries(2):
+            usernames = self.allocator.allocate(2)
+        with self.assertNumQueries(0):
+            usernames += self.allocator.allocate(1)
+        with self.assertNumQueries(2):
+            usernames += self.allocator.allocate(5)
+        usernames += [self.allocator.next() for _ in range(7)]
+        self.assertEqual(len(set(usernames)), 15)
+
+    def test_taken_usernames_are_skipped(self) -> None:
+        user = create_user()
+        start = self.next_number()
+        prefix = username_prefix()
+        User.objects.filter(pk=user.pk).update(
+            username=encode_username(start + 1, prefix)
+        )
+        self.assertEqual(
+            self.allocator.allocate(3),
+            [encode_username(start + n, prefix) for n in (2, 3, 4)],
+        )
+
+    def test_exhausted_space(self) -> None:
+        space = len(ALPHABET) ** 2
+        with (
+            mock.patch(
+                "core_apps.user_auth.usernames.username_prefix",
+                return_value=EncodeUsernameTests.PREFIX,
+            ),
+            mock.patch.object(
+                self.allocator, "_reserve_numbers", return_value=[space - 1, space]
+            ),
+        ):
+            with self.assertRaises(OverflowError):
+                self.allocator.allocate(1)
+
+
+class ImportCustomersTests(TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "customers.csv"
+        self.rejects = Path(f"{self.path}.rejects.jsonl")
+        self.checkpoint = Path(f"{self.path}.checkpoint")
+
+    def write_rows(self, *rows: dict) -> None:
+        with self.path.open("w", newline="") as target:
+            writer = csv.DictWriter(target, fieldnames=["email", *IMPORT_FIELDS])
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({**IMPORT_FIELDS, **row})
+
+    def customer(self, number: int) -> dict:
+        return {"email": f"customer{number}@example.com", "id_number": f"ID{number}"}
+
+    def run_import(self, *args: str) -> str:
+        stdout = StringIO()
+        call_command(
+            "import_customers",
+            str(self.path),
+            "--workers=0",
+            "--chunk-size=2",
+            *args,
+            stdout=stdout,
+        )
+        return stdout.getvalue()
+
+    def read_rejects(self) -> list[dict]:
+        return [json.loads(line) for line in self.rejects.read_text().splitlines()]
+
+    def test_bulk_import(self) -> None:
+        self.write_rows(
+            self.customer(1),
+            {"email": "not-an-email", "id_number": "ID2"},
+            self.customer(3),
+            {**self.customer(4), "email": "customer1@example.com"},
+            self.customer(5),
+        )
+        self.run_import()
+
+        users = User.objects.filter(email__startswith="customer")
+        self.assertEqual(users.count(), 3)
+        user = users.get(email="customer1@example.com")
+        self.assertTrue(user.check_password(IMPORT_FIELDS["password"]))
+        self.assertTrue(user.verify_security_answer("Blue"))
+        self.assertEqual(
+            PartyUserRole.objects.filter(
+                user__in=users, role=PartyUserRole.Role.OWNER
+            ).count(),
+            3,
+        )
+
+        rejects = self.read_rejects()
+        self.assertEqual([reject["row"] for reject in rejects], [2, 4])
+        self.assertNotIn("password", rejects[0]["data"])
+        self.assertFalse(self.checkpoint.exists())
+
+    def test_resume_from_checkpoint(self) -> None:
+        self.write_rows(*(self.customer(number) for number in range(1, 6)))
+        original = Command._import_chunk
+        calls = []
+
+        def interrupted(command, chunk):
+            calls.append(chunk)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return original(command, chunk)
+
+        with mock.patch.object(Command, "_import_chunk", interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_import()
+        self.assertEqual(json.loads(self.checkpoint.read_text())["rows"], 2)
+
+        self.assertIn("Resuming after row 2", self.run_import())
+        self.assertEqual(User.objects.filter(email__startswith="customer").count(), 5)
+        self.assertFalse(self.checkpoint.exists())
+
+    def test_checkpoint_of_another_file(self) -> None:
+        self.write_rows(self.customer(1))
+        self.checkpoint.write_text(json.dumps({"path": "/elsewhere.csv", "rows": 1}))
+        with self.assertRaises(CommandError):
+            self.run_import()
+
+        self.run_import("--restart")
+        self.assertTrue(User.objects.filter(email="customer1@example.com").exists())
+
+    def test_restart_starts_new_rejects(self) -> None:
+        self.write_rows(self.customer(1), {"email": "", "id_number": "ID2"})
+        self.run_import()
+        self.assertEqual(len(self.read_rejects()), 1)
+
+        self.checkpoint.write_text(json.dumps({"path": str(self.path), "rows": 1}))
+        self.run_import("--restart")
+        self.assertEqual(
+            [reject["error"] for reject in self.read_rejects()],
+            ["Missing email", "Email exists"],
+        )
+
+
+class UserResolutionTests(AuthTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        get_tiered_cache.cache_clear()
+        cache = get_tiered_cache()
+        # A second web process: its own L1 in front of the same L2.
+        self.other_process = TieredCache(
+            backend=cache.backend,
+            namespaces=cache.namespaces,
+            l1_max_entries=100,
+            l1_timeout=cache.l1_timeout,
+            lock_timeout=cache.lock_timeout,
+        )
+        self.backend = UserAuthBackend()
+        self.user = create_user()
+
+    def resolve_elsewhere(self) -> User | None:
+        with mock.patch(
+            "core_apps.user_auth.backends.get_tiered_cache",
+            return_value=self.other_process,
+        ):
+            return self.backend.get_user(self.user.pk)
+
+    def test_resolved_once(self) -> None:
+        with self.assertNumQueries(1):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+            self.assertEqual(self.resolve_elsewhere(), self.user)
+
+    async def test_async_resolution_shares_the_cache(self) -> None:
+        self.assertEqual(await self.backend.aget_user(self.user.pk), self.user)
+        with mock.patch.object(
+            UserAuthBackend, "_aload_user", side_effect=AssertionError
+        ):
+            self.assertEqual(await self.backend.aget_user(self.user.pk), self.user)
+
+    def test_inactive_user_is_not_resolved(self) -> None:
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_lock_reaches_every_process(self) -> None:
+        self.assertEqual(
+            self.resolve_elsewhere().account_status, User.AccountStatus.ACTIVE
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(settings.LOGIN_THROTTLE["MAX_FAILURES_PER_USER"]):
+                self.user.handle_failed_login_attempts("10.0.0.1")
+        self.assertEqual(
+            self.resolve_elsewhere().account_status, User.AccountStatus.LOCKED
+        )
+
+    def test_password_change_reaches_every_process(self) -> None:
+        session_hash = self.resolve_elsewhere().get_session_auth_hash()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password("a-new-passphrase")
+            self.user.save()
+        resolved = self.resolve_elsewhere()
+        self.assertTrue(resolved.check_password("a-new-passphrase"))
+        self.assertNotEqual(resolved.get_session_auth_hash(), session_hash)
@@ -0,0 +1,246 @@
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Optional
+
+from django.conf import settings
+
+from core_apps.common.redis_client import (
+    get_async_redis_connection,
+    get_redis_connection,
+)
+
+
+class SlidingWindowLimiter:
+    """Counts events per key over the trailing ``window`` seconds."""
+
+    def __init__(self, window: float) -> None:
+        self.window = window
+
+    def hit(self, key: str) -> int:
+        """Record one event and return the count inside the window."""
+        raise NotImplementedError
+
+    def count(self, key: str) -> int:
+        raise NotImplementedError
+
+    def reset(self, key: str) -> None:
+        raise NotImplementedError
+
+    def window_counts(self) -> dict[str, int]:
+        """Current count of every key with events inside the window."""
+        raise NotImplementedError
+
+    # Async variants for the ASGI login flow; in-memory limiters can use
+    # the sync methods as they are.
+    async def ahit(self, key: str) -> int:
+        return self.hit(key)
+
+    async def acount(self, key: str) -> int:
+        return self.count(key)
+
+    async def areset(self, key: str) -> None:
+        self.reset(key)
+
+
+class LocalSlidingWindowLimiter(SlidingWindowLimiter):
+    """In-process stand-in for tests and single-process development."""
+
+    def __init__(self, window: float) -> None:
+        super().__init__(window)
+        self._lock = threading.Lock()
+        self._events: dict[str, deque[float]] = {}
+
+    def _trim(self, key: str, now: float) -> deque[float]:
+        events = self._events.setdefault(key, deque())
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        if not events:
+            del self._events[key]
+        return events
+
+    def hit(self, key: str) -> int:
+        now = time.monotonic()
+        with self._lock:
+            events = self._trim(key, now)
+            events.append(now)
+            self._events[key] = events
+            return len(events)
+
+    def count(self, key: str) -> int:
+        with self._lock:
+            return len(self._trim(key, time.monotonic()))
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._events.pop(key, None)
+
+    def window_counts(self) -> dict[str, int]:
+        now = time.monotonic()
+        with self._lock:
+            counts = {key: len(self._trim(key, now)) for key in list(self._events)}
+        return {key: count for key, count in counts.items() if count}
+
+
+class RedisSlidingWindowLimiter(SlidingWindowLimiter):
+    """One sorted set of event timestamps per key.
+
+    A second sorted set indexes keys by their last event so monitoring can
+    list the active keys without scanning the keyspace.
+    """
+
+    def __init__(self, window: float, prefix: str = "throttle") -> None:
+        super().__init__(window)
+        self.prefix = prefix
+        self.index_key = f"{prefix}:keys"
+        self.client = get_redis_connection()
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def _queue_hit(self, pipe: Any, key: str) -> Any:
+        now = time.time()
+        redis_key = self._key(key)
+        pipe.zremrangebyscore(redis_key, 0, now - self.window)
+        pipe.zadd(redis_key, {f"{now}:{uuid.uuid4().hex[:8]}": now})
+        pipe.zcard(redis_key)
+        pipe.pexpire(redis_key, int(self.window * 1000))
+        pipe.zadd(self.index_key, {key: now})
+        pipe.zremrangebyscore(self.index_key, 0, now - self.window)
+        return pipe
+
+    def _queue_reset(self, pipe: Any, key: str) -> Any:
+        pipe.delete(self._key(key))
+        pipe.zrem(self.index_key, key)
+        return pipe
+
+    def hit(self, key: str) -> int:
+        results = self._queue_hit(self.client.pipeline(), key).execute()
+        return int(results[2])
+
+    def count(self, key: str) -> int:
+        now = time.time()
+        return int(self.client.zcount(self._key(key), now - self.window, "+inf"))
+
+    def reset(self, key: str) -> None:
+        self._queue_reset(self.client.pipeline(), key).execute()
+
+    async def ahit(self, key: str) -> int:
+        pipe = self._queue_hit(get_async_redis_connection().pipeline(), key)
+        results = await pipe.execute()
+        return int(results[2])
+
+    async def acount(self, key: str) -> int:
+        now = time.time()
+        client = get_async_redis_connection()
+        return int(await client.zcount(self._key(key), now - self.window, "+inf"))
+
+    async def areset(self, key: str) -> None:
+        await self._queue_reset(get_async_redis_connection().pipeline(), key).execute()
+
+    def window_counts(self) -> dict[str, int]:
+        now = time.time()
+        keys = [
+            key.decode() if isinstance(key, bytes) else key
+            for key in self.client.zrangebyscore(
+                self.index_key, now - self.window, "+inf"
+            )
+        ]
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.zcount(self._key(key), now - self.window, "+inf")
+        counts = pipe.execute()
+        return {key: int(count) for key, count in zip(keys, counts) if count}
+
+
+LIMITER_BACKENDS = {
+    "local": LocalSlidingWindowLimiter,
+    "redis": RedisSlidingWindowLimiter,
+}
+
+
+@dataclass
+class FailedLogin:
+    user_failures: int
+    ip_failures: int
+
+    @property
+    def should_lock(self) -> bool:
+        return self.user_failures >= settings.LOGIN_THROTTLE["MAX_FAILURES_PER_USER"]
+
+
+class LoginThrottle:
+    """Failed-login counters per user and per client IP.
+
+    Counting happens here so that failed attempts never write to the user
+    row; only the resulting lock is persisted, by the caller.
+    """
+
+    def __init__(self, limiter: SlidingWindowLimiter) -> None:
+        self.limiter = limiter
+
+    @staticmethod
+    def user_key(user_id: Any) -> str:
+        return f"login:user:{user_id}"
+
+    @staticmethod
+    def ip_key(ip_address: str) -> str:
+        return f"login:ip:{ip_address}"
+
+    def register_failure(
+        self, user_id: Optional[Any], ip_address: Optional[str] = None
+    ) -> FailedLogin:
+        """Count a failed login; ``user_id`` is None for unknown accounts."""
+        user_failures = (
+            self.limiter.hit(self.user_key(user_id)) if user_id is not None else 0
+        )
+        ip_failures = self.limiter.hit(self.ip_key(ip_address)) if ip_address else 0
+        return FailedLogin(user_failures=user_failures, ip_failures=ip_failures)
+
+    def is_ip_blocked(self, ip_address: Optional[str]) -> bool:
+        if not ip_address:
+            return False
+        return (
+            self.limiter.count(self.ip_key(ip_address))
+            >= settings.LOGIN_THROTTLE["MAX_FAILURES_PER_IP"]
+        )
+
+    def reset_user(self, user_id: Any) -> None:
+        self.limiter.reset(self.user_key(user_id))
+
+    async def aregister_failure(
+        self, user_id: Optional[Any], ip_address: Optional[str] = None
+    ) -> FailedLogin:
+        user_failures = (
+            await self.limiter.ahit(self.user_key(user_id))
+            if user_id is not None
+            else 0
+        )
+        ip_failures = (
+            await self.limiter.ahit(self.ip_key(ip_address)) if ip_address else 0
+        )
+        return FailedLogin(user_failures=user_failures, ip_failures=ip_failures)
+
+    async def ais_ip_blocked(self, ip_address: Optional[str]) -> bool:
+        if not ip_address:
+            return False
+        return (
+            await self.limiter.acount(self.ip_key(ip_address))
+            >= settings.LOGIN_THROTTLE["MAX_FAILURES_PER_IP"]
+        )
+
+    async def areset_user(self, user_id: Any) -> None:
+        await self.limiter.areset(self.user_key(user_id))
+
+    def window_counts(self) -> dict[str, int]:
+        return self.limiter.window_counts()
+
+
+@lru_cache(maxsize=None)
+def get_login_throttle() -> LoginThrottle:
+    config = settings.LOGIN_THROTTLE
+    limiter = LIMITER_BACKENDS[config["BACKEND"]](config["WINDOW"].total_seconds())
+    return LoginThrottle(limiter)
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import login_view, logout_view, verify_otp_view
+
+urlpatterns = [
+    path("login/", login_view, name="login"),
+    path("otp/verify/", verify_otp_view, name="verify-otp"),
+    path("logout/", logout_view, name="logout"),
+]
@@ -0,0 +1,92 @@
+import string
+import threading
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+
+USERNAME_LENGTH = 12
+USERNAME_SEQUENCE = "user_auth_username_seq"
+ALPHABET = string.digits + string.ascii_uppercase
+
+# Affine scramble over the code space. The multiplier shares no factor with
+# 36 (it is odd and not a multiple of 3), so n -> (n * MULTIPLIER + OFFSET)
+# mod 36**width is a bijection: distinct sequence values always give
+# distinct codes, yet consecutive customers do not get adjacent usernames.
+MULTIPLIER = 0x9E3779B97F4A7C15
+OFFSET = 0xB
+
+
+@lru_cache(maxsize=None)
+def username_prefix() -> str:
+    return "".join(word[0] for word in settings.BANK_NAME.split()).upper()
+
+
+def encode_username(number: int, prefix: str) -> str:
+    width = USERNAME_LENGTH - len(prefix) - 1
+    space = len(ALPHABET) ** width
+    if not 0 <= number < space:
+        raise OverflowError(f"Username space for prefix {prefix!r} is exhausted")
+
+    code = (number * MULTIPLIER + OFFSET) % space
+    chars = []
+    for _ in range(width):
+        code, remainder = divmod(code, len(ALPHABET))
+        chars.append(ALPHABET[remainder])
+    return f"{prefix}-{''.join(reversed(chars))}"
+
+
+class UsernameAllocator:
+    """Hands out unique usernames from a database sequence.
+
+    Values are reserved in blocks with one ``nextval`` round trip, so bulk
+    imports pay one query per block rather than per user, and a value that
+    has been handed out is never reused even if its transaction rolls back.
+    Usernames made by the old random generator share the format, so each
+    block is checked against the table once and any clash is skipped.
+    """
+
+    def __init__(self, block_size: int, using: str = "default") -> None:
+        self.block_size = block_size
+        self.using = using
+        self._lock = threading.Lock()
+        self._reserved: deque[str] = deque()
+
+    def _reserve_numbers(self, count: int) -> list[int]:
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(%s) FROM generate_series(1, %s)",
+                [USERNAME_SEQUENCE, count],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def _reserve(self, count: int) -> list[str]:
+        from .models import User
+
+        prefix = username_prefix()
+        usernames = [
+            encode_username(number, prefix) for number in self._reserve_numbers(count)
+        ]
+        taken = set(
+            User.objects.using(self.using)
+            .filter(username__in=usernames)
+            .values_list("username", flat=True)
+        )
+        return [username for username in usernames if username not in taken]
+
+    def allocate(self, count: int) -> list[str]:
+        """Return ``count`` usernames that no existing user has."""
+        with self._lock:
+            while len(self._reserved) < count:
+                shortfall = count - len(self._reserved)
+                self._reserved.extend(self._reserve(max(shortfall, self.block_size)))
+            return [self._reserved.popleft() for _ in range(count)]
+
+    def next(self) -> str:
+        return self.allocate(1)[0]
+
+
+@lru_cache(maxsize=None)
+def get_username_allocator() -> UsernameAllocator:
+    return UsernameAllocator(block_size=settings.USERNAME_BLOCK_SIZE)
@@ -1,12 +1,5 @@
-import random
-
-from django.conf import settings
-from django.contrib.auth.hashers import make_password
-from django.utils import timezone
+import secrets
 
 
 def generate_otp():
-    return f"{random.randint(100000, 999999)}"
-
-
-
+    return f"{secrets.randbelow(900000) + 100000}"
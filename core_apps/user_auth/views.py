@@ -1,8 +1,24 @@
-from django.http import JsonResponse
-from django.shortcuts import render
-from django.views import View
+import json
+from functools import wraps
+from typing import Any, Callable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aauthenticate, alogin, alogout
+from django.http import HttpRequest, JsonResponse
+from django.utils.translation import gettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
+from django.views.decorators.http import require_POST
 from loguru import logger
 
+from core_apps.common.budgets import query_budget
+
+from .emails import send_otp_email
+from .hashing import HashingBusy
+from .models import SecurityEvent, User
+from .security_events import arecord_security_event
+from .throttling import get_login_throttle
+
 # Simple of loguru of docs
 # class TestLoggingView(View):
 #     def get(self, request):
@@ -12,3 +28,135 @@ from loguru import logger
 #         logger.error("this is error")
 #         logger.critical("this is critical")
 #         return JsonResponse({"message": "Done!"})
+
+
+# The login flow is natively async: the ORM calls use the async API, the
+# OTP store and throttle talk to Redis through redis.asyncio, and Argon2
+# runs on the hashing pool, so under ASGI a request never blocks the loop.
+# Each view's query budget is what its busiest path runs today.
+#
+# Only the login step is CSRF-exempt: it establishes no session, and its
+# response carries the CSRF cookie that the verify step, which logs the
+# client in, must echo back in the X-CSRFToken header.
+
+
+def _client_ip(request: HttpRequest) -> Optional[str]:
+    return request.META.get("REMOTE_ADDR")
+
+
+def _payload(request: HttpRequest, *fields: str) -> Optional[dict[str, Any]]:
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or not all(data.get(field) for field in fields):
+        return None
+    return data
+
+
+def _error(detail: str, status: int) -> JsonResponse:
+    return JsonResponse({"detail": detail}, status=status)
+
+
+def _locked_response() -> JsonResponse:
+    return _error(_("Your account is locked. Try again later."), 423)
+
+
+def _shed_when_busy(view: Callable) -> Callable:
+    """Answer 503 with Retry-After when the hashing pool turns work away."""
+
+    @wraps(view)
+    async def wrapper(request: HttpRequest, *args: Any, **kwargs: Any):
+        try:
+            return await view(request, *args, **kwargs)
+        except HashingBusy:
+            response = _error(_("We are busy right now. Try again shortly."), 503)
+            response["Retry-After"] = str(settings.HASHING["RETRY_AFTER"])
+            return response
+
+    return wrapper
+
+
+@query_budget(queries=4)
+@csrf_exempt
+@ensure_csrf_cookie
+@require_POST
+@_shed_when_busy
+async def login_view(request: HttpRequest) -> JsonResponse:
+    """Check email and password, then send a one-time code by email."""
+    data = _payload(request, "email", "password")
+    if data is None:
+        return _error(_("Email and password are required."), 400)
+
+    ip_address = _client_ip(request)
+    throttle = get_login_throttle()
+    if await throttle.ais_ip_blocked(ip_address):
+        return _error(_("Too many failed logins. Try again later."), 429)
+
+    user = await aauthenticate(request, email=data["email"], password=data["password"])
+    if user is None:
+        # Every failure gets the same 401, locked accounts included, so the
+        # response never tells whether an email is registered.
+        account = await User.objects.filter(email=data["email"]).afirst()
+        if account is None:
+            await throttle.aregister_failure(None, ip_address)
+            await arecord_security_event(
+                SecurityEvent.EventType.LOGIN_FAILED,
+                ip_address=ip_address,
+                email=data["email"],
+            )
+        else:
+            await account.ahandle_failed_login_attempts(ip_address)
+        return _error(_("Invalid email or password."), 401)
+
+    # Only someone who knows the password learns that the account is locked.
+    if user.is_locked_out:
+        return _locked_response()
+
+    otp = await user.aset_otp()
+    # Queuing the email publishes to Celery, which has no async API.
+    await sync_to_async(send_otp_email)(user.email, otp)
+    await arecord_security_event(SecurityEvent.EventType.OTP_ISSUED, user, ip_address)
+    return JsonResponse({"detail": _("A one-time code has been sent by email.")})
+
+
+@query_budget(queries=5)
+@require_POST
+async def verify_otp_view(request: HttpRequest) -> JsonResponse:
+    """Exchange a valid one-time code for a session."""
+    data = _payload(request, "email", "otp")
+    if data is None:
+        return _error(_("Email and code are required."), 400)
+
+    ip_address = _client_ip(request)
+    throttle = get_login_throttle()
+    if await throttle.ais_ip_blocked(ip_address):
+        return _error(_("Too many failed logins. Try again later."), 429)
+
+    user = await User.objects.filter(email=data["email"]).afirst()
+    if user is None:
+        await throttle.aregister_failure(None, ip_address)
+        return _error(_("Invalid or expired code."), 401)
+
+    if not await user.averify_otp(str(data["otp"])):
+        await arecord_security_event(
+            SecurityEvent.EventType.OTP_FAILED, user, ip_address
+        )
+        await user.ahandle_failed_login_attempts(ip_address)
+        return _error(_("Invalid or expired code."), 401)
+    if user.is_locked_out:
+        return _locked_response()
+
+    await arecord_security_event(SecurityEvent.EventType.OTP_VERIFIED, user, ip_address)
+    await user.areset_failed_login_attempts()
+    await alogin(request, user)
+    logger.info("User {} logged in", user.pk)
+    return JsonResponse({"username": user.username, "email": user.email})
+
+
+@query_budget(queries=3)
+@csrf_exempt
+@require_POST
+async def logout_view(request: HttpRequest) -> JsonResponse:
+    await alogout(request)
+    return JsonResponse({"detail": _("Logged out.")})
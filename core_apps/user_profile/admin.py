@@ -2,7 +2,18 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
-from .models import IndividualProfile, LegalProfile, NextOfKin, Party, PartyUserRole
+from core_apps.common.admin_base import BaseModelAdmin
+from core_apps.common.pagination import KeysetPaginationMixin
+
+from .models import (
+    IndividualProfile,
+    LegalProfile,
+    NextOfKin,
+    Party,
+    PartyLink,
+    PartyRoleExpiry,
+    PartyUserRole,
+)
 
 
 class NextOfKinInline(admin.TabularInline):
@@ -14,7 +25,7 @@ class NextOfKinInline(admin.TabularInline):
 
 
 @admin.register(IndividualProfile)
-class IndividualProfileAdmin(admin.ModelAdmin):
+class IndividualProfileAdmin(BaseModelAdmin):
     list_display = (
         "party_id",
         "title",
@@ -55,17 +66,20 @@ class IndividualProfileAdmin(admin.ModelAdmin):
     email.short_description = _("Email")
 
     def photo_preview(self, obj) -> str:
-        if obj.photo and hasattr(obj.photo, "url"):
-            return format_html(
-                f'<img src="{obj.photo.url}" width="50" height="50" style="object-fit:cover;" />'
-            )
-        return "No Photo"
+        # Check the stored name first: building the URL goes through the
+        # storage backend, so do it once and only when there is a photo.
+        if not obj.photo.name:
+            return "No Photo"
+        return format_html(
+            '<img src="{}" width="50" height="50" style="object-fit:cover;" loading="lazy" />',
+            obj.photo.url,
+        )
 
     photo_preview.short_description = _("Photo")
 
 
 @admin.register(LegalProfile)
-class LegalProfileAdmin(admin.ModelAdmin):
+class LegalProfileAdmin(BaseModelAdmin):
     list_display = (
         "party_id",
         "incorporation_date",
@@ -98,7 +112,7 @@ class LegalProfileAdmin(admin.ModelAdmin):
 
 
 @admin.register(Party)
-class PartyAdmin(admin.ModelAdmin):
+class PartyAdmin(BaseModelAdmin):
     list_display = ("id", "party_type", "created_at", "verified_at")
     list_filter = ("party_type", "verified_at")
     search_fields = ("id",)
@@ -109,16 +123,43 @@ class PartyAdmin(admin.ModelAdmin):
 
 
 @admin.register(PartyUserRole)
-class PartyUserRoleAdmin(admin.ModelAdmin):
+class PartyUserRoleAdmin(KeysetPaginationMixin, BaseModelAdmin):
     list_display = ("party", "user", "role", "is_active", "valid_from", "valid_to")
     list_filter = ("role", "is_active")
     search_fields = ("party__id", "user__email")
     list_editable = ("is_active", "valid_to", "role")
     readonly_fields = ("valid_from",)
+    keyset_ordering = ("-id",)
+
+
+@admin.register(PartyLink)
+class PartyLinkAdmin(BaseModelAdmin):
+    list_display = ("owner", "owned", "share", "created_at")
+    search_fields = ("owner__id", "owned__id")
+    raw_id_fields = ("owner", "owned")
+
+    def get_readonly_fields(self, request, obj=None):
+        # The closure table tracks endpoints; re-pointing means a new link.
+        if obj is not None:
+            return ("owner", "owned")
+        return ()
+
+
+@admin.register(PartyRoleExpiry)
+class PartyRoleExpiryAdmin(KeysetPaginationMixin, BaseModelAdmin):
+    list_display = ("created_at", "cutoff", "expired_count")
+    readonly_fields = ("created_at", "cutoff", "expired_count", "grants")
+    keyset_ordering = ("-id",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(NextOfKin)
-class NextOfKinAdmin(admin.ModelAdmin):
+class NextOfKinAdmin(BaseModelAdmin):
     list_display = ("full_name", "relationship", "profile", "is_primary")
     list_filter = ("is_primary", "relationship")
     search_fields = ("first_name", "last_name", "profile__party_id")
@@ -0,0 +1,105 @@
+from datetime import datetime
+from typing import Any, Optional
+
+from django.http import HttpRequest
+from django.utils import timezone
+
+from core_apps.common.cache import get_tiered_cache
+
+from .models import PartyUserRole
+
+Role = PartyUserRole.Role
+
+# A role also grants every role below it: an owner can act as a signatory
+# and anyone holding a role can view.
+IMPLIED_ROLES = {
+    Role.OWNER: frozenset({Role.OWNER, Role.SIGNATORY, Role.VIEWER}),
+    Role.SIGNATORY: frozenset({Role.SIGNATORY, Role.VIEWER}),
+    Role.VIEWER: frozenset({Role.VIEWER}),
+}
+
+RoleRow = tuple[Any, str, datetime, Optional[datetime]]
+
+
+class RoleResolver:
+    """Answers "can this user act as ROLE on party X" for one request.
+
+    The user's active role rows, with their validity bounds, come from the
+    "party_roles" cache namespace (invalidated on every PartyUserRole save
+    or delete) or one indexed query. They are reduced once to the roles in
+    effect at ``at``, so every further check is a dict lookup.
+    """
+
+    def __init__(self, user_id: Any, at: Optional[datetime] = None) -> None:
+        self.user_id = user_id
+        self.at = at or timezone.now()
+        # Anonymous users hold no roles; skip the lookup entirely.
+        self._effective: Optional[dict[Any, frozenset[str]]] = (
+            {} if user_id is None else None
+        )
+
+    def _fetch_rows(self) -> list[RoleRow]:
+        return list(
+            PartyUserRole.objects.filter(
+                user_id=self.user_id, is_active=True
+            ).values_list("party_id", "role", "valid_from", "valid_to")
+        )
+
+    async def _afetch_rows(self) -> list[RoleRow]:
+        return [
+            row
+            async for row in PartyUserRole.objects.filter(
+                user_id=self.user_id, is_active=True
+            ).values_list("party_id", "role", "valid_from", "valid_to")
+        ]
+
+    def _reduce(self, rows: list[RoleRow]) -> dict[Any, frozenset[str]]:
+        # Rows are cached regardless of validity so a cached entry stays
+        # correct when a role starts or lapses; the window is applied here.
+        effective: dict[Any, set[str]] = {}
+        for party_id, role, valid_from, valid_to in rows:
+            if valid_from <= self.at and (valid_to is None or valid_to > self.at):
+                effective.setdefault(party_id, set()).update(IMPLIED_ROLES[role])
+        return {party_id: frozenset(roles) for party_id, roles in effective.items()}
+
+    def _roles(self) -> dict[Any, frozenset[str]]:
+        if self._effective is None:
+            rows = get_tiered_cache().get_or_set(
+                "party_roles", self.user_id, self._fetch_rows
+            )
+            self._effective = self._reduce(rows)
+        return self._effective
+
+    async def aload(self) -> "RoleResolver":
+        if self._effective is None:
+            rows = await get_tiered_cache().aget_or_set(
+                "party_roles", self.user_id, self._afetch_rows
+            )
+            self._effective = self._reduce(rows)
+        return self
+
+    def roles_on(self, party: Any) -> frozenset[str]:
+        return self._roles().get(getattr(party, "pk", party), frozenset())
+
+    def can_act_as(self, party: Any, role: str) -> bool:
+        return role in self.roles_on(party)
+
+    async def acan_act_as(self, party: Any, role: str) -> bool:
+        await self.aload()
+        return self.can_act_as(party, role)
+
+
+def get_role_resolver(request: HttpRequest) -> RoleResolver:
+    """The request's resolver, created on first use and kept on the request."""
+    resolver = getattr(request, "_role_resolver", None)
+    if resolver is None:
+        resolver = request._role_resolver = RoleResolver(request.user.pk)
+    return resolver
+
+
+async def aget_role_resolver(request: HttpRequest) -> RoleResolver:
+    resolver = getattr(request, "_role_resolver", None)
+    if resolver is None:
+        user = await request.auser()
+        resolver = request._role_resolver = RoleResolver(user.pk)
+    return await resolver.aload()
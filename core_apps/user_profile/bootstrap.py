@@ -0,0 +1,149 @@
+import threading
+from functools import lru_cache
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from loguru import logger
+
+from core_apps.common.cache import get_tiered_cache
+from core_apps.user_auth.models import SecurityEvent
+from core_apps.user_auth.security_events import record_security_event
+
+from .models import Party, PartyUserRole
+
+
+def bootstrap_parties_for_users(
+    user_ids: Iterable[Any], check_existing: bool = True
+) -> int:
+    """Give each user an individual party with them as its OWNER.
+
+    Costs one query to skip users that already own an individual party
+    (leave it out with ``check_existing=False`` for freshly created users)
+    and two bulk INSERTs, whatever the number of users. Returns the number
+    of parties created.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if check_existing and user_ids:
+        done = set(
+            PartyUserRole.objects.filter(
+                user_id__in=user_ids,
+                role=PartyUserRole.Role.OWNER,
+                party__party_type=Party.PartyType.INDIVIDUAL,
+            ).values_list("user_id", flat=True)
+        )
+        user_ids = [user_id for user_id in user_ids if user_id not in done]
+    if not user_ids:
+        return 0
+
+    parties = Party.objects.bulk_create(
+        [Party(party_type=Party.PartyType.INDIVIDUAL) for _ in user_ids]
+    )
+    now = timezone.now()
+    PartyUserRole.objects.bulk_create(
+        [
+            PartyUserRole(
+                party=party,
+                user_id=user_id,
+                role=PartyUserRole.Role.OWNER,
+                valid_from=now,
+            )
+            for party, user_id in zip(parties, user_ids)
+        ]
+    )
+    # bulk_create sends no signals, so drop any cached grants and record the
+    # grants by hand.
+    transaction.on_commit(
+        lambda: get_tiered_cache().delete_many("party_roles", user_ids)
+    )
+    transaction.on_commit(lambda: _record_granted(parties, user_ids))
+    return len(parties)
+
+
+def _record_granted(parties: list[Party], user_ids: list[Any]) -> None:
+    for party, user_id in zip(parties, user_ids):
+        record_security_event(
+            SecurityEvent.EventType.ROLE_GRANTED,
+            user_id,
+            party_id=party.pk,
+            role=PartyUserRole.Role.OWNER,
+        )
+
+
+class PartyBootstrapper:
+    """Decides when a newly created user gets their individual party."""
+
+    def user_created(self, user_id: Any) -> None:
+        raise NotImplementedError
+
+
+class ImmediateBootstrapper(PartyBootstrapper):
+    """Creates the party inside the transaction that created the user."""
+
+    def __init__(self, batch_size: int) -> None:
+        self.batch_size = batch_size
+
+    def user_created(self, user_id: Any) -> None:
+        bootstrap_parties_for_users([user_id], check_existing=False)
+
+
+class _PendingUsers:
+    """The on_commit callback of one transaction, carrying its new users."""
+
+    def __init__(self, bootstrapper: "DeferredBootstrapper") -> None:
+        self.bootstrapper = bootstrapper
+        self.user_ids: list[Any] = []
+
+    def __call__(self) -> None:
+        self.bootstrapper.enqueue(self.user_ids)
+
+
+class DeferredBootstrapper(PartyBootstrapper):
+    """Collects a transaction's new users and bootstraps them in bulk.
+
+    One on_commit callback is registered per transaction, so a thousand
+    users saved in one transaction become a single Celery task (or one per
+    ``batch_size``) instead of two thousand INSERTs inside it. A rolled
+    back transaction discards its callback and with it the users. This is
+    why the outbox is not used here (see ``user_auth.events``).
+    """
+
+    def __init__(self, batch_size: int) -> None:
+        self.batch_size = batch_size
+        self._local = threading.local()
+
+    def user_created(self, user_id: Any) -> None:
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            self.enqueue([user_id])
+            return
+        pending = getattr(self._local, "pending", None)
+        # Django drops the callbacks of a rolled-back transaction; when ours
+        # is gone this is a new transaction and needs a callback of its own.
+        if pending is None or not any(
+            callback is pending for _, callback, *_ in connection.run_on_commit
+        ):
+            pending = self._local.pending = _PendingUsers(self)
+            transaction.on_commit(pending)
+        pending.user_ids.append(user_id)
+
+    def enqueue(self, user_ids: list[Any]) -> None:
+        from .tasks import bootstrap_parties
+
+        for start in range(0, len(user_ids), self.batch_size):
+            batch = user_ids[start : start + self.batch_size]
+            bootstrap_parties.delay([str(user_id) for user_id in batch])
+        logger.debug("Deferred party bootstrap for {} users", len(user_ids))
+
+
+BOOTSTRAP_BACKENDS = {
+    "immediate": ImmediateBootstrapper,
+    "deferred": DeferredBootstrapper,
+}
+
+
+@lru_cache(maxsize=None)
+def get_party_bootstrapper() -> PartyBootstrapper:
+    config = settings.PARTY_BOOTSTRAP
+    return BOOTSTRAP_BACKENDS[config["MODE"]](batch_size=config["BATCH_SIZE"])
@@ -0,0 +1,88 @@
+from datetime import datetime
+from typing import Optional
+
+from django.db import connection, transaction
+from django.utils import timezone
+from loguru import logger
+
+from core_apps.common.cache import get_tiered_cache
+from core_apps.user_auth.models import SecurityEvent
+from core_apps.user_auth.security_events import record_security_event
+
+from .models import PartyRoleExpiry, PartyUserRole
+
+# Claims a batch of expired grants and deactivates it in one statement.
+# SKIP LOCKED lets concurrent runs take disjoint batches, and rows another
+# run has already deactivated fail the is_active check, so overlapping runs
+# never expire (or audit) the same grant twice.
+EXPIRE_SQL = """
+WITH expired AS (
+    SELECT id
+    FROM {table}
+    WHERE is_active AND valid_to <= %s
+    ORDER BY valid_to
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+)
+UPDATE {table} AS grant_row
+SET is_active = false
+FROM expired
+WHERE grant_row.id = expired.id
+RETURNING grant_row.id, grant_row.user_id, grant_row.party_id, grant_row.role
+"""
+
+
+def _record_expired(rows: list[tuple], cutoff: datetime) -> None:
+    for _, user_id, party_id, role in rows:
+        record_security_event(
+            SecurityEvent.EventType.ROLE_EXPIRED,
+            user_id,
+            party_id=party_id,
+            role=role,
+            cutoff=cutoff,
+        )
+
+
+def expire_party_roles(
+    batch_size: int, max_batches: int, cutoff: Optional[datetime] = None
+) -> int:
+    """Deactivate grants whose ``valid_to`` is at or before ``cutoff``.
+
+    Each batch is its own transaction with its ``PartyRoleExpiry`` row, so a
+    run cut short keeps what it finished; the rest is picked up next time.
+    Returns the number of grants deactivated.
+    """
+    cutoff = cutoff or timezone.now()
+    sql = EXPIRE_SQL.format(table=PartyUserRole._meta.db_table)
+    total = 0
+    for _ in range(max_batches):
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [cutoff, batch_size])
+                rows = cursor.fetchall()
+            if not rows:
+                break
+            PartyRoleExpiry.objects.create(
+                cutoff=cutoff,
+                expired_count=len(rows),
+                grants=[
+                    [role_id, str(user_id), str(party_id), role]
+                    for role_id, user_id, party_id, role in rows
+                ],
+            )
+            # UPDATE sends no signals, so drop cached grants and record the
+            # expiries by hand.
+            user_ids = {row[1] for row in rows}
+            transaction.on_commit(
+                lambda user_ids=user_ids: get_tiered_cache().delete_many(
+                    "party_roles", user_ids
+                )
+            )
+            transaction.on_commit(lambda rows=rows: _record_expired(rows, cutoff))
+        total += len(rows)
+        if len(rows) < batch_size:
+            break
+
+    if total:
+        logger.info("Expired {} party role grants up to {}", total, cutoff)
+    return total
@@ -0,0 +1,202 @@
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Exists, Min, OuterRef, Q, QuerySet
+
+from .models import Party, PartyClosure, PartyLink, PartyUserRole
+
+User = get_user_model()
+
+
+class OwnershipCycleError(ValueError):
+    """Raised when a link would make a party (indirectly) own itself."""
+
+
+# Every graph write takes this transaction-scoped lock, so the cycle check
+# and the closure update of one edge never interleave with another's.
+LOCK_SQL = "SELECT pg_advisory_xact_lock(hashtext('user_profile.party_closure'))"
+
+# Pairs (x, y, depth) created or removed by the edge owner -> owned: every
+# ancestor of owner (and owner itself) times every descendant of owned (and
+# owned itself), with path counts multiplied across the new edge.
+EDGE_PATHS_SQL = """
+SELECT up.ancestor_id,
+       down.descendant_id,
+       up.depth + down.depth + 1 AS depth,
+       SUM(up.paths * down.paths) AS paths
+FROM (
+    SELECT ancestor_id, depth, paths FROM {table} WHERE descendant_id = %(owner)s
+    UNION ALL
+    SELECT %(owner)s::uuid, 0, 1
+) AS up
+CROSS JOIN (
+    SELECT descendant_id, depth, paths FROM {table} WHERE ancestor_id = %(owned)s
+    UNION ALL
+    SELECT %(owned)s::uuid, 0, 1
+) AS down
+GROUP BY 1, 2, 3
+"""
+
+ADD_EDGE_SQL = """
+INSERT INTO {table} (ancestor_id, descendant_id, depth, paths)
+{paths}
+ON CONFLICT (ancestor_id, descendant_id, depth)
+DO UPDATE SET paths = {table}.paths + EXCLUDED.paths
+"""
+
+REMOVE_EDGE_SQL = """
+UPDATE {table} AS closure
+SET paths = closure.paths - removed.paths
+FROM ({paths}) AS removed
+WHERE closure.ancestor_id = removed.ancestor_id
+  AND closure.descendant_id = removed.descendant_id
+  AND closure.depth = removed.depth
+RETURNING closure.id, closure.paths
+"""
+
+# Enumerates every path, so a full rebuild costs the number of paths rather
+# than the number of pairs; it is a repair tool, not the write path.
+REBUILD_SQL = """
+WITH RECURSIVE walk (ancestor_id, descendant_id, depth) AS (
+    SELECT owner_id, owned_id, 1 FROM {links}
+    UNION ALL
+    SELECT walk.ancestor_id, link.owned_id, walk.depth + 1
+    FROM walk
+    JOIN {links} AS link ON link.owner_id = walk.descendant_id
+)
+INSERT INTO {table} (ancestor_id, descendant_id, depth, paths)
+SELECT ancestor_id, descendant_id, depth, COUNT(*)
+FROM walk
+GROUP BY 1, 2, 3
+"""
+
+
+def _sql(template: str, **parts: str) -> str:
+    table = PartyClosure._meta.db_table
+    return template.format(
+        table=table,
+        links=PartyLink._meta.db_table,
+        paths=EDGE_PATHS_SQL.format(table=table),
+        **parts,
+    )
+
+
+def _pk(party: Any) -> Any:
+    return getattr(party, "pk", party)
+
+
+def lock_graph() -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(LOCK_SQL)
+
+
+def would_create_cycle(owner: Any, owned: Any) -> bool:
+    owner, owned = _pk(owner), _pk(owned)
+    return owner == owned or (
+        PartyClosure.objects.filter(ancestor=owned, descendant=owner).exists()
+    )
+
+
+def add_edge(owner: Any, owned: Any) -> None:
+    """Extend the closure with ``owner -> owned``; call inside a transaction.
+
+    ``PartyLink.save`` calls this for new links.
+    """
+    owner, owned = _pk(owner), _pk(owned)
+    lock_graph()
+    if would_create_cycle(owner, owned):
+        raise OwnershipCycleError(f"{owned} already owns {owner}")
+    with connection.cursor() as cursor:
+        cursor.execute(_sql(ADD_EDGE_SQL), {"owner": owner, "owned": owned})
+
+
+def remove_edge(owner: Any, owned: Any) -> None:
+    """Take ``owner -> owned`` out of the closure; call inside a transaction.
+
+    Connected to ``PartyLink`` pre_delete, which also fires for links
+    removed by a cascading ``Party`` delete.
+    """
+    owner, owned = _pk(owner), _pk(owned)
+    lock_graph()
+    with connection.cursor() as cursor:
+        cursor.execute(_sql(REMOVE_EDGE_SQL), {"owner": owner, "owned": owned})
+        emptied = [row_id for row_id, paths in cursor.fetchall() if paths <= 0]
+    if emptied:
+        PartyClosure.objects.filter(pk__in=emptied).delete()
+
+
+def rebuild() -> int:
+    """Recompute the whole closure from ``PartyLink``; returns the row count."""
+    lock_graph()
+    PartyClosure.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(_sql(REBUILD_SQL))
+        return cursor.rowcount
+
+
+def _nearest(queryset: QuerySet, field: str, max_depth: Optional[int]) -> QuerySet:
+    if max_depth is not None:
+        queryset = queryset.filter(depth__lte=max_depth)
+    return (
+        queryset.values(field)
+        .annotate(distance=Min("depth"))
+        .order_by("distance", field)
+        .values_list(field, "distance")
+    )
+
+
+def ancestors(party: Any, max_depth: Optional[int] = None) -> list[tuple[Any, int]]:
+    """``(party_id, depth)`` of every party owning ``party``, nearest first."""
+    queryset = PartyClosure.objects.filter(descendant=_pk(party))
+    return list(_nearest(queryset, "ancestor_id", max_depth))
+
+
+def descendants(party: Any, max_depth: Optional[int] = None) -> list[tuple[Any, int]]:
+    """``(party_id, depth)`` of every party ``party`` owns, nearest first."""
+    queryset = PartyClosure.objects.filter(ancestor=_pk(party))
+    return list(_nearest(queryset, "descendant_id", max_depth))
+
+
+def ultimate_owners(party: Any) -> QuerySet:
+    """Parties at the top of ``party``'s ownership chains.
+
+    A party nobody owns is its own ultimate owner.
+    """
+    party = _pk(party)
+    chain = PartyClosure.objects.filter(descendant=party).values("ancestor")
+    return Party.objects.filter(Q(pk=party) | Q(pk__in=chain)).exclude(
+        Exists(PartyClosure.objects.filter(descendant=OuterRef("pk")))
+    )
+
+
+def ultimate_controllers(
+    party: Any,
+    roles: Iterable[str] = (PartyUserRole.Role.OWNER,),
+    when: Optional[datetime] = None,
+) -> QuerySet:
+    """Users holding ``roles`` on the ultimate owners of ``party``."""
+    grants = (
+        PartyUserRole.objects.active_at(when)
+        .holding(*roles)
+        .filter(party__in=ultimate_owners(party))
+    )
+    return User.objects.filter(pk__in=grants.values("user"))
+
+
+def parties_for_user(
+    user: Any,
+    roles: Iterable[str] = (PartyUserRole.Role.OWNER, PartyUserRole.Role.SIGNATORY),
+    when: Optional[datetime] = None,
+) -> QuerySet:
+    """Parties ``user`` can act for: those where they hold ``roles`` and
+    everything those parties own, at any depth. One query."""
+    direct = (
+        PartyUserRole.objects.active_at(when)
+        .for_user(_pk(user))
+        .holding(*roles)
+        .values("party")
+    )
+    owned = PartyClosure.objects.filter(ancestor__in=direct).values("descendant")
+    return Party.objects.filter(Q(pk__in=direct) | Q(pk__in=owned))
@@ -0,0 +1,181 @@
+import statistics
+import time
+from typing import Callable
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core_apps.user_profile.authorization import RoleResolver
+from core_apps.user_profile.models import PartyUserRole
+
+TABLE = "bench_partyuserrole"
+SCAN_SETTINGS = ("enable_indexscan", "enable_indexonlyscan", "enable_bitmapscan")
+
+
+class TableResolver(RoleResolver):
+    """Resolver reading the benchmark table and bypassing the cache."""
+
+    def _fetch_rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT party_id, role, valid_from, valid_to FROM {TABLE} "
+                "WHERE user_id = %s AND is_active",
+                [self.user_id],
+            )
+            return cursor.fetchall()
+
+    def _roles(self):
+        if self._effective is None:
+            self._effective = self._reduce(self._fetch_rows())
+        return self._effective
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the active-role queries and RoleResolver against a temporary "
+        "copy of the PartyUserRole table (same indexes) with synthetic rows"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000_000)
+        parser.add_argument("--batch-size", type=int, default=1_000_000)
+        parser.add_argument("--lookups", type=int, default=2_000)
+        parser.add_argument(
+            "--scan-lookups",
+            type=int,
+            default=10,
+            help="Lookups to time with index scans disabled (each reads the table)",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("This benchmark needs PostgreSQL.")
+
+        with transaction.atomic():
+            self._load(options["rows"], options["batch_size"])
+            parties, users = self._sample(options["lookups"])
+            now = timezone.now()
+
+            self.stdout.write(
+                f"\n{'query':<22}{'plan':<8}{'lookups':>9}{'p50 ms':>10}{'p99 ms':>10}"
+            )
+            queries = {
+                "party signatories": lambda party: PartyUserRole.objects.holders(
+                    party, PartyUserRole.Role.SIGNATORY, now
+                ).values_list("user_id", flat=True),
+                "user roles": lambda user: PartyUserRole.objects.for_user(user)
+                .active_at(now)
+                .values_list("party_id", "role"),
+            }
+            for label, build in queries.items():
+                keys = parties if label.startswith("party") else users
+                self._report(label, "index", self._time_query(build, keys))
+                self._report(
+                    label,
+                    "scan",
+                    self._time_query(build, keys[: options["scan_lookups"]], scan=True),
+                )
+
+            first, memoized = self._time_resolver(users, parties)
+            self._report("resolver first check", "index", first)
+            self._report("resolver memoized", "-", memoized)
+            transaction.set_rollback(True)
+
+    def _load(self, rows: int, batch_size: int) -> None:
+        users = max(rows // 3, 4)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMP TABLE {TABLE} "
+                f"(LIKE {PartyUserRole._meta.db_table} INCLUDING INDEXES) "
+                "ON COMMIT DROP"
+            )
+            started = time.perf_counter()
+            for offset in range(0, rows, batch_size):
+                # Four roles per party with exactly one owner; users hold
+                # about three roles each. A fifth of the roles have lapsed,
+                # a tenth lapse in the future and 5% are switched off.
+                cursor.execute(
+                    f"""
+                    INSERT INTO {TABLE}
+                        (id, party_id, user_id, role, is_active, valid_from, valid_to)
+                    SELECT g,
+                           md5('p' || (g / 4))::uuid,
+                           md5('u' || ((g::bigint * 7919) %% %s))::uuid,
+                           (ARRAY['OWNER', 'SIGNATORY', 'VIEWER', 'SIGNATORY'])[g %% 4 + 1],
+                           random() > 0.05,
+                           start,
+                           CASE
+                               WHEN r < 0.2 THEN start + (now() - start) * random()
+                               WHEN r < 0.3 THEN now() + random() * interval '365 days'
+                           END
+                    FROM (
+                        SELECT g,
+                               random() AS r,
+                               now() - random() * interval '3650 days' AS start
+                        FROM generate_series(%s, %s) AS g
+                    ) AS source
+                    """,
+                    [users, offset, min(offset + batch_size, rows) - 1],
+                )
+                self.stdout.write(f"  loaded {min(offset + batch_size, rows):,} rows")
+            cursor.execute(f"ANALYZE {TABLE}")
+            self.stdout.write(
+                f"Loaded {rows:,} rows in {time.perf_counter() - started:.1f}s"
+            )
+            cursor.execute(
+                "SELECT indexrelid::regclass::text, pg_relation_size(indexrelid) "
+                "FROM pg_index WHERE indrelid = %s::regclass ORDER BY 1",
+                [TABLE],
+            )
+            for name, size in cursor.fetchall():
+                self.stdout.write(f"  index {name}: {size / 2**20:.0f} MB")
+
+    def _sample(self, count: int) -> tuple[list, list]:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT party_id, user_id FROM {TABLE} ORDER BY random() LIMIT %s",
+                [count],
+            )
+            rows = cursor.fetchall()
+        return [row[0] for row in rows], [row[1] for row in rows]
+
+    def _time_query(
+        self, build: Callable, keys: list, scan: bool = False
+    ) -> list[float]:
+        source = f'"{PartyUserRole._meta.db_table}"'
+        timings = []
+        with connection.cursor() as cursor:
+            for setting in SCAN_SETTINGS:
+                cursor.execute(f"SET LOCAL {setting} = {'off' if scan else 'on'}")
+            for key in keys:
+                sql, params = build(key).query.sql_with_params()
+                sql = sql.replace(source, TABLE)
+                started = time.perf_counter()
+                cursor.execute(sql, params)
+                cursor.fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            for setting in SCAN_SETTINGS:
+                cursor.execute(f"SET LOCAL {setting} = on")
+        return timings
+
+    def _time_resolver(self, users: list, parties: list) -> tuple[list, list]:
+        first, memoized = [], []
+        for user_id, party_id in zip(users, parties):
+            resolver = TableResolver(user_id)
+            started = time.perf_counter()
+            resolver.can_act_as(party_id, PartyUserRole.Role.SIGNATORY)
+            first.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            for _ in range(100):
+                resolver.can_act_as(party_id, PartyUserRole.Role.SIGNATORY)
+            memoized.append((time.perf_counter() - started) * 10)
+        return first, memoized
+
+    def _report(self, label: str, plan: str, timings: list[float]) -> None:
+        if len(timings) < 2:
+            return
+        cuts = statistics.quantiles(timings, n=100, method="inclusive")
+        self.stdout.write(
+            f"{label:<22}{plan:<8}{len(timings):>9}{cuts[49]:>10.3f}{cuts[98]:>10.3f}"
+        )
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core_apps.user_profile import graph
+from core_apps.user_profile.models import PartyClosure
+
+SNAPSHOT_SQL = f"""
+CREATE TEMP TABLE party_closure_before ON COMMIT DROP AS
+SELECT ancestor_id, descendant_id, depth, paths FROM {PartyClosure._meta.db_table}
+"""
+
+DIFF_SQL = f"""
+SELECT COUNT(*) FROM (
+    (SELECT * FROM party_closure_before
+     EXCEPT ALL
+     SELECT ancestor_id, descendant_id, depth, paths
+     FROM {PartyClosure._meta.db_table})
+    UNION ALL
+    (SELECT ancestor_id, descendant_id, depth, paths
+     FROM {PartyClosure._meta.db_table}
+     EXCEPT ALL
+     SELECT * FROM party_closure_before)
+) AS drift
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the party ownership closure from PartyLink, e.g. after "
+        "bulk loading links; --check reports drift without changing anything"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Compare with a fresh rebuild, then roll back",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("The ownership graph needs PostgreSQL.")
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(SNAPSHOT_SQL)
+            rows = graph.rebuild()
+            with connection.cursor() as cursor:
+                cursor.execute(DIFF_SQL)
+                drift = cursor.fetchone()[0]
+            if options["check"]:
+                transaction.set_rollback(True)
+
+        message = f"{rows} closure rows, {drift} differed from the stored closure"
+        if options["check"] and drift:
+            raise CommandError(message)
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import Any, Optional
+
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class PartyUserRoleQuerySet(models.QuerySet):
+    def active_at(self, when: Optional[datetime] = None) -> "PartyUserRoleQuerySet":
+        """Roles in effect at ``when`` (default: now).
+
+        A role is effective while it is flagged active and ``when`` falls in
+        ``[valid_from, valid_to)``; an open ``valid_to`` never expires.
+        """
+        when = when or timezone.now()
+        return self.filter(
+            Q(valid_to__isnull=True) | Q(valid_to__gt=when),
+            is_active=True,
+            valid_from__lte=when,
+        )
+
+    def for_party(self, party: Any) -> "PartyUserRoleQuerySet":
+        return self.filter(party=party)
+
+    def for_user(self, user: Any) -> "PartyUserRoleQuerySet":
+        return self.filter(user=user)
+
+    def holding(self, *roles: str) -> "PartyUserRoleQuerySet":
+        return self.filter(role__in=roles)
+
+    def holders(
+        self, party: Any, role: str, when: Optional[datetime] = None
+    ) -> "PartyUserRoleQuerySet":
+        """Users holding ``role`` on ``party`` at ``when``, as role rows."""
+        return self.for_party(party).holding(role).active_at(when)
+
+
+PartyUserRoleManager = models.Manager.from_queryset(PartyUserRoleQuerySet)
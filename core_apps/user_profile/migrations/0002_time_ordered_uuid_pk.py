@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:47
+
+import core_apps.common.fields
+import core_apps.common.ids
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='individualprofile',
+            name='id',
+            field=core_apps.common.fields.TimeOrderedUUIDField(default=core_apps.common.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='legalprofile',
+            name='id',
+            field=core_apps.common.fields.TimeOrderedUUIDField(default=core_apps.common.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='nextofkin',
+            name='id',
+            field=core_apps.common.fields.TimeOrderedUUIDField(default=core_apps.common.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='party',
+            name='id',
+            field=core_apps.common.fields.TimeOrderedUUIDField(default=core_apps.common.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user_profile", "0002_time_ordered_uuid_pk"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="partyuserrole",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["party", "role", "valid_from"],
+                include=("user", "valid_to"),
+                name="partyuserrole_party_active_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="partyuserrole",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["user", "valid_from"],
+                include=("party", "role", "valid_to"),
+                name="partyuserrole_user_active_idx",
+            ),
+        ),
+    ]
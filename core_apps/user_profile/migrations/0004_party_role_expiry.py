@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:14
+
+import core_apps.common.fields
+import core_apps.common.ids
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0003_partyuserrole_active_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartyRoleExpiry',
+            fields=[
+                ('id', core_apps.common.fields.TimeOrderedUUIDField(default=core_apps.common.ids.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('cutoff', models.DateTimeField()),
+                ('expired_count', models.PositiveIntegerField()),
+                ('grants', models.JSONField(default=list)),
+            ],
+            options={
+                'verbose_name': 'Party Role Expiry',
+                'verbose_name_plural': 'Party Role Expiries',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='partyuserrole',
+            index=models.Index(condition=models.Q(('is_active', True), ('valid_to__isnull', False)), fields=['valid_to'], name='partyuserrole_expiry_idx'),
+        ),
+    ]
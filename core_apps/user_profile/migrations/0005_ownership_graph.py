@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:17
+
+import core_apps.common.fields
+import core_apps.common.ids
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0004_party_role_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartyClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('paths', models.PositiveBigIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='user_profile.party')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='user_profile.party')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], include=('ancestor',), name='partyclosure_descendant_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant', 'depth'), name='unique_party_closure_path')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PartyLink',
+            fields=[
+                ('id', core_apps.common.fields.TimeOrderedUUIDField(default=core_apps.common.ids.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('share', models.DecimalField(blank=True, decimal_places=2, help_text='Percentage held, if the link is an ownership stake', max_digits=5, null=True)),
+                ('owned', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='owner_links', to='user_profile.party')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='owned_links', to='user_profile.party')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('owner', 'owned'), name='unique_party_link'), models.CheckConstraint(condition=models.Q(('owner', models.F('owned')), _negated=True), name='party_link_not_self')],
+            },
+        ),
+    ]
@@ -3,7 +3,7 @@ from typing import Any
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django_countries.fields import CountryField
@@ -11,6 +11,7 @@ from phonenumber_field.modelfields import PhoneNumberField
 
 from core_apps.common.models import TimeStampedModel
 
+from .managers import PartyUserRoleManager
 from .utils import user_photo_path, user_signature_path
 
 User = get_user_model()
@@ -56,6 +57,8 @@ class PartyUserRole(models.Model):
     valid_from = models.DateTimeField(default=timezone.now)
     valid_to = models.DateTimeField(null=True, blank=True)
 
+    objects = PartyUserRoleManager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -65,11 +68,158 @@ class PartyUserRole(models.Model):
             )
         ]
         unique_together = ("party", "user", "role")
+        # Partial covering indexes for active_at(): inactive rows are left
+        # out, and the validity bounds are read from the index itself.
+        indexes = [
+            models.Index(
+                fields=["party", "role", "valid_from"],
+                include=["user", "valid_to"],
+                condition=models.Q(is_active=True),
+                name="partyuserrole_party_active_idx",
+            ),
+            models.Index(
+                fields=["user", "valid_from"],
+                include=["party", "role", "valid_to"],
+                condition=models.Q(is_active=True),
+                name="partyuserrole_user_active_idx",
+            ),
+            # Drives the expiry task's scan for grants past valid_to.
+            models.Index(
+                fields=["valid_to"],
+                condition=models.Q(is_active=True, valid_to__isnull=False),
+                name="partyuserrole_expiry_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} -> {self.party} ({self.role})"
 
 
+ENDPOINT_FIELDS = frozenset({"owner", "owner_id", "owned", "owned_id"})
+
+
+class PartyLink(TimeStampedModel):
+    """``owner`` owns or controls ``owned``; an edge of the ownership graph.
+
+    The endpoints are fixed once saved, and ``save`` refuses to change
+    them: re-point a link by deleting it and creating a new one, so the
+    closure table can be kept in step.
+    """
+
+    owner = models.ForeignKey(
+        Party, on_delete=models.CASCADE, related_name="owned_links"
+    )
+    owned = models.ForeignKey(
+        Party, on_delete=models.CASCADE, related_name="owner_links"
+    )
+    share = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text=_("Percentage held, if the link is an ownership stake"),
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "owned"], name="unique_party_link"
+            ),
+            models.CheckConstraint(
+                condition=~models.Q(owner=models.F("owned")),
+                name="party_link_not_self",
+            ),
+        ]
+
+    def clean(self) -> None:
+        from .graph import would_create_cycle
+
+        super().clean()
+        if (
+            self._state.adding
+            and self.owner_id
+            and self.owned_id
+            and would_create_cycle(self.owner_id, self.owned_id)
+        ):
+            raise ValidationError(
+                {"owned": _("This party already owns the owner, directly or not.")}
+            )
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        from .graph import add_edge
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not ENDPOINT_FIELDS & set(update_fields):
+            super().save(*args, **kwargs)
+            return
+        with transaction.atomic():
+            stored = None
+            if not self._state.adding:
+                stored = (
+                    PartyLink.objects.filter(pk=self.pk)
+                    .values_list("owner_id", "owned_id")
+                    .first()
+                )
+            if stored is None:
+                # Raises OwnershipCycleError before anything is written.
+                add_edge(self.owner_id, self.owned_id)
+            elif stored != (self.owner_id, self.owned_id):
+                raise ValidationError(
+                    _("A link's parties cannot change; delete it and add a new one.")
+                )
+            super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.owner_id} -> {self.owned_id}"
+
+
+class PartyClosure(models.Model):
+    """Transitive closure of ``PartyLink``, maintained by ``graph``.
+
+    One row per ancestor, descendant and path length, counting the distinct
+    paths of that length; counts let an edge be removed exactly even when
+    several routes join the same two parties. Reflexive pairs are implied,
+    not stored.
+    """
+
+    ancestor = models.ForeignKey(Party, on_delete=models.CASCADE, related_name="+")
+    descendant = models.ForeignKey(Party, on_delete=models.CASCADE, related_name="+")
+    depth = models.PositiveSmallIntegerField()
+    paths = models.PositiveBigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ancestor", "descendant", "depth"],
+                name="unique_party_closure_path",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["descendant", "depth"],
+                include=["ancestor"],
+                name="partyclosure_descendant_idx",
+            )
+        ]
+
+
+class PartyRoleExpiry(TimeStampedModel):
+    """Audit record of one batch of grants deactivated past valid_to."""
+
+    cutoff = models.DateTimeField()
+    expired_count = models.PositiveIntegerField()
+    # [role id, user id, party id, role] per deactivated grant.
+    grants = models.JSONField(default=list)
+
+    class Meta:
+        verbose_name = _("Party Role Expiry")
+        verbose_name_plural = _("Party Role Expiries")
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"PartyRoleExpiry({self.expired_count} at {self.cutoff:%Y-%m-%d %H:%M})"
+
+
 class IndividualProfile(TimeStampedModel):
     class SalutationChoices(models.TextChoices):
         MR = ("Mr", _("Mr"))
@@ -1,13 +1,22 @@
 from typing import Any, Type
 
+from django.db import transaction
 from django.db.models import Model
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from django.utils import timezone
-from loguru import logger
 
 from config.settings.base import AUTH_USER_MODEL
-from core_apps.user_profile.models import Party, PartyUserRole
+from core_apps.common.cache import invalidate_on
+from core_apps.user_auth.models import SecurityEvent
+from core_apps.user_auth.security_events import record_security_event
+from core_apps.user_profile.bootstrap import get_party_bootstrapper
+from core_apps.user_profile.graph import remove_edge
+from core_apps.user_profile.models import (
+    IndividualProfile,
+    Party,
+    PartyLink,
+    PartyUserRole,
+)
 
 
 @receiver(post_save, sender=AUTH_USER_MODEL)
@@ -18,24 +27,60 @@ def bootstrap_individual_party_for_user(
     **kwargs: Any,
 ) -> None:
     """
-    Educational bootstrap only:
-    - Each new user becomes an INDIVIDUAL Party
-    - User is assigned as OWNER
+    Each new user becomes the OWNER of an INDIVIDUAL Party, right away or
+    after commit depending on PARTY_BOOTSTRAP["MODE"].
     """
 
-    if not created:
-        return
+    if created:
+        get_party_bootstrapper().user_created(instance.pk)
 
-    logger.info(f"Bootstrapping party for user {instance.pk}")
 
-    party = Party.objects.create(
-        party_type=Party.PartyType.INDIVIDUAL,
-    )
+@receiver(pre_delete, sender=PartyLink)
+def remove_party_link_from_closure(
+    sender: Type[Model], instance: PartyLink, **kwargs: Any
+) -> None:
+    # pre_delete, not post_delete: when a Party delete cascades, every
+    # pre_delete runs before any row goes, so the closure rows needed to
+    # count the paths through this link are still there.
+    remove_edge(instance.owner_id, instance.owned_id)
+
 
-    PartyUserRole.objects.create(
-        party=party,
-        user=instance,
-        role=PartyUserRole.Role.OWNER,
-        valid_from=timezone.now(),
+def _record_role_event(event_type: str, role: PartyUserRole) -> None:
+    # Recorded once the change is committed, so a rolled back grant leaves
+    # no trace in the log.
+    details = {
+        "party_id": role.party_id,
+        "role": role.role,
+        "is_active": role.is_active,
+        "valid_to": role.valid_to,
+    }
+    transaction.on_commit(
+        lambda: record_security_event(event_type, role.user_id, **details)
     )
-    logger.info(f"Created party {party.pk} for user {instance.pk}")
+
+
+@receiver(post_save, sender=PartyUserRole)
+def record_party_role_saved(
+    sender: Type[Model], instance: PartyUserRole, created: bool, **kwargs: Any
+) -> None:
+    if created:
+        event_type = SecurityEvent.EventType.ROLE_GRANTED
+    elif instance.is_active:
+        event_type = SecurityEvent.EventType.ROLE_CHANGED
+    else:
+        event_type = SecurityEvent.EventType.ROLE_REVOKED
+    _record_role_event(event_type, instance)
+
+
+@receiver(post_delete, sender=PartyUserRole)
+def record_party_role_deleted(
+    sender: Type[Model], instance: PartyUserRole, **kwargs: Any
+) -> None:
+    _record_role_event(SecurityEvent.EventType.ROLE_REVOKED, instance)
+
+
+invalidate_on(Party, "party", lambda party: [party.pk])
+invalidate_on(PartyUserRole, "party_roles", lambda role: [role.user_id])
+invalidate_on(
+    IndividualProfile, "individual_profile", lambda profile: [profile.party_id]
+)
@@ -0,0 +1,22 @@
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from .bootstrap import bootstrap_parties_for_users
+from .expiry import expire_party_roles
+
+
+@shared_task(ignore_result=True)
+def expire_party_role_grants():
+    """Deactivate PartyUserRole grants whose valid_to has passed."""
+    config = settings.PARTY_ROLE_EXPIRY
+    return expire_party_roles(config["BATCH_SIZE"], config["MAX_BATCHES"])
+
+
+@shared_task(ignore_result=True)
+def bootstrap_parties(user_ids):
+    """Create individual parties for users saved in deferred bootstrap mode."""
+    # A user saved in a savepoint that was later rolled back can still be
+    # listed; only users that exist are bootstrapped.
+    existing = get_user_model().objects.filter(pk__in=user_ids)
+    return bootstrap_parties_for_users(existing.values_list("pk", flat=True))
@@ -1,3 +1,473 @@
-from django.test import TestCase
+import random
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core_apps.common.cache import get_tiered_cache
+from core_apps.user_auth.models import SecurityEvent
+from core_apps.user_auth.security_events import maintain_partitions
+
+from .authorization import RoleResolver
+from .bootstrap import get_party_bootstrapper
+from .expiry import expire_party_roles
+from .graph import OwnershipCycleError, descendants
+from .models import Party, PartyClosure, PartyLink, PartyRoleExpiry, PartyUserRole
+
+User = get_user_model()
+Role = PartyUserRole.Role
+
+
+def create_parties(count: int) -> list[Party]:
+    return [
+        Party.objects.create(party_type=Party.PartyType.LEGAL) for _ in range(count)
+    ]
+
+
+def create_user(number: int = 0, **fields) -> User:
+    return User.objects.create_user(
+        email=f"user{number}@example.com",
+        password="correct-horse-battery",
+        first_name="Ada",
+        last_name="Lovelace",
+        id_number=str(1815 + number),
+        security_question="favorite_color",
+        security_answer="Blue",
+        **fields,
+    )
+
+
+class RoleGrantsMixin:
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Outside the test transaction, like AuthTestMixin in user_auth.
+        maintain_partitions(ahead=1, retention_months=1200)
+        super().setUpClass()
+
+    def setUp(self) -> None:
+        super().setUp()
+        get_tiered_cache.cache_clear()
+        self.now = timezone.now().replace(microsecond=0)
+        self.user = create_user()
+        self.first, self.second, self.third = create_parties(3)
+
+    def grant(self, party: Party, role: str, **fields) -> PartyUserRole:
+        return PartyUserRole.objects.create(
+            party=party, user=self.user, role=role, **fields
+        )
+
+
+class PartyClosureTests(TestCase):
+    def setUp(self) -> None:
+        self.a, self.b, self.c, self.d = create_parties(4)
+
+    def link(self, owner: Party, owned: Party) -> PartyLink:
+        return PartyLink.objects.create(owner=owner, owned=owned)
+
+    def diamond(self) -> None:
+        # a owns d through b and through c.
+        self.link(self.a, self.b)
+        self.link(self.a, self.c)
+        self.link(self.b, self.d)
+        self.link(self.c, self.d)
+
+    def paths(self, ancestor: Party, descendant: Party) -> dict[int, int]:
+        return dict(
+            PartyClosure.objects.filter(
+                ancestor=ancestor, descendant=descendant
+            ).values_list("depth", "paths")
+        )
+
+    def assertNoDrift(self) -> None:
+        # Raises CommandError when the stored closure differs from a rebuild.
+        call_command("rebuild_party_closure", "--check", stdout=StringIO())
+
+    def test_diamond(self) -> None:
+        self.diamond()
+        self.assertEqual(self.paths(self.a, self.d), {2: 2})
+        self.assertCountEqual(
+            descendants(self.a), [(self.b.pk, 1), (self.c.pk, 1), (self.d.pk, 2)]
+        )
+        self.assertNoDrift()
+
+    def test_removing_one_route_keeps_the_other(self) -> None:
+        self.diamond()
+        PartyLink.objects.get(owner=self.b, owned=self.d).delete()
+
+        self.assertEqual(self.paths(self.a, self.d), {2: 1})
+        self.assertEqual(self.paths(self.b, self.d), {})
+        self.assertNoDrift()
+
+        PartyLink.objects.get(owner=self.c, owned=self.d).delete()
+        self.assertEqual(self.paths(self.a, self.d), {})
+        self.assertNoDrift()
+
+    def test_cascading_party_delete(self) -> None:
+        self.diamond()
+        self.b.delete()
+
+        self.assertEqual(self.paths(self.a, self.d), {2: 1})
+        self.assertFalse(
+            PartyClosure.objects.filter(ancestor=self.b.pk).exists()
+            or PartyClosure.objects.filter(descendant=self.b.pk).exists()
+        )
+        self.assertNoDrift()
+
+    def test_cycle_is_rejected(self) -> None:
+        self.link(self.a, self.b)
+        self.link(self.b, self.c)
+        closure = list(PartyClosure.objects.values_list("pk", "paths"))
+
+        with self.assertRaises(OwnershipCycleError):
+            self.link(self.c, self.a)
+        self.assertFalse(PartyLink.objects.filter(owner=self.c).exists())
+        self.assertEqual(list(PartyClosure.objects.values_list("pk", "paths")), closure)
+        self.assertNoDrift()
+
+    def test_endpoints_cannot_change(self) -> None:
+        link = self.link(self.a, self.b)
+        link.owned = self.c
+        with self.assertRaises(ValidationError):
+            link.save()
+        link.refresh_from_db()
+        self.assertEqual(link.owned, self.b)
+        self.assertEqual(self.paths(self.a, self.c), {})
+
+        link.share = Decimal("25.00")
+        link.save()
+        link.save(update_fields=["share"])
+        self.assertNoDrift()
+
+    def test_random_edits_leave_no_drift(self) -> None:
+        parties = [self.a, self.b, self.c, self.d, *create_parties(4)]
+        rng = random.Random(17)
+        for step in range(80):
+            links = list(PartyLink.objects.all())
+            if links and rng.random() < 0.35:
+                rng.choice(links).delete()
+            else:
+                owner, owned = rng.sample(parties, 2)
+                if not PartyLink.objects.filter(owner=owner, owned=owned).exists():
+                    try:
+                        self.link(owner, owned)
+                    except OwnershipCycleError:
+                        pass
+            if step % 10 == 9:
+                with self.subTest(step=step):
+                    self.assertNoDrift()
+
+
+class PartyRoleExpiryTests(RoleGrantsMixin, TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        hour = timedelta(hours=1)
+        start = self.now - 3 * hour
+        self.expired = [
+            self.grant(self.first, Role.VIEWER, valid_from=start, valid_to=start),
+            self.grant(
+                self.first, Role.SIGNATORY, valid_from=start, valid_to=self.now - hour
+            ),
+            # valid_to is exclusive, so a grant ending at the cutoff is over.
+            self.grant(self.second, Role.VIEWER, valid_from=start, valid_to=self.now),
+        ]
+        self.current = self.grant(
+            self.third, Role.VIEWER, valid_from=start, valid_to=self.now + hour
+        )
+        self.revoked = self.grant(
+            self.second,
+            Role.SIGNATORY,
+            valid_from=start,
+            valid_to=start,
+            is_active=False,
+        )
+
+    def expire(self) -> int:
+        with self.captureOnCommitCallbacks(execute=True):
+            return expire_party_roles(batch_size=2, max_batches=10, cutoff=self.now)
+
+    def test_expires_in_audited_batches(self) -> None:
+        self.assertEqual(self.expire(), 3)
+
+        self.assertCountEqual(
+            PartyUserRole.objects.filter(user=self.user, is_active=False),
+            [*self.expired, self.revoked],
+        )
+        audits = PartyRoleExpiry.objects.order_by("created_at")
+        self.assertEqual([audit.expired_count for audit in audits], [2, 1])
+        self.assertCountEqual(
+            [grant[0] for audit in audits for grant in audit.grants],
+            [grant.pk for grant in self.expired],
+        )
+        self.assertEqual(
+            SecurityEvent.objects.for_user(self.user)
+            .of_type(SecurityEvent.EventType.ROLE_EXPIRED)
+            .count(),
+            3,
+        )
+
+    def test_second_run_does_nothing(self) -> None:
+        self.expire()
+        self.assertEqual(self.expire(), 0)
+        self.assertEqual(PartyRoleExpiry.objects.count(), 2)
+        self.assertEqual(
+            SecurityEvent.objects.of_type(SecurityEvent.EventType.ROLE_EXPIRED).count(),
+            3,
+        )
+
+    def test_cached_grants_are_dropped_on_commit(self) -> None:
+        before = self.now - timedelta(minutes=30)
+        self.assertTrue(
+            RoleResolver(self.user.pk, before).can_act_as(self.second, Role.VIEWER)
+        )
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            expire_party_roles(batch_size=10, max_batches=1, cutoff=self.now)
+        # Until the batch commits, readers keep the grants they cached.
+        self.assertTrue(
+            RoleResolver(self.user.pk, before).can_act_as(self.second, Role.VIEWER)
+        )
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(
+            RoleResolver(self.user.pk, before).can_act_as(self.second, Role.VIEWER)
+        )
+        self.assertTrue(
+            RoleResolver(self.user.pk, before).can_act_as(self.third, Role.VIEWER)
+        )
+
+
+class ConcurrentPartyRoleExpiryTests(RoleGrantsMixin, TransactionTestCase):
+    def test_locked_grants_are_skipped(self) -> None:
+        past = self.now - timedelta(hours=1)
+        locked, free = (
+            self.grant(party, Role.VIEWER, valid_from=past, valid_to=past)
+            for party in (self.first, self.second)
+        )
+        holding, release = threading.Event(), threading.Event()
+
+        def hold_lock() -> None:
+            try:
+                with transaction.atomic():
+                    PartyUserRole.objects.select_for_update().get(pk=locked.pk)
+                    holding.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            holding.wait(5)
+            self.assertEqual(expire_party_roles(10, 1, cutoff=self.now), 1)
+            free.refresh_from_db()
+            self.assertFalse(free.is_active)
+        finally:
+            release.set()
+            holder.join()
+
+        self.assertEqual(expire_party_roles(10, 1, cutoff=self.now), 1)
+        locked.refresh_from_db()
+        self.assertFalse(locked.is_active)
+        self.assertEqual(PartyRoleExpiry.objects.count(), 2)
+
+
+class RoleValidityTests(RoleGrantsMixin, TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.start, self.end = self.now, self.now + timedelta(days=30)
+        self.grant(self.first, Role.OWNER, valid_from=self.start, valid_to=self.end)
+        self.grant(self.second, Role.SIGNATORY, valid_from=self.start)
+        self.grant(self.third, Role.VIEWER, valid_from=self.start, is_active=False)
+        self.instants = {
+            "before": self.start - timedelta(microseconds=1),
+            "from": self.start,
+            "last": self.end - timedelta(microseconds=1),
+            "to": self.end,
+        }
+
+    def active_parties(self, when) -> set:
+        return set(
+            PartyUserRole.objects.for_user(self.user)
+            .active_at(when)
+            .exclude(party__party_type=Party.PartyType.INDIVIDUAL)
+            .values_list("party_id", flat=True)
+        )
+
+    def test_window_includes_valid_from_and_excludes_valid_to(self) -> None:
+        first, second = self.first.pk, self.second.pk
+        expected = {
+            "before": set(),
+            "from": {first, second},
+            "last": {first, second},
+            "to": {second},
+        }
+        for name, when in self.instants.items():
+            with self.subTest(name):
+                self.assertEqual(self.active_parties(when), expected[name])
+
+    def test_resolver_agrees_with_active_at(self) -> None:
+        for name, when in self.instants.items():
+            resolver = RoleResolver(self.user.pk, when)
+            with self.subTest(name):
+                self.assertEqual(
+                    {
+                        party.pk
+                        for party in (self.first, self.second, self.third)
+                        if resolver.roles_on(party)
+                    },
+                    self.active_parties(when),
+                )
+
+    def test_holders(self) -> None:
+        self.assertEqual(
+            list(
+                PartyUserRole.objects.holders(
+                    self.first, Role.OWNER, self.start
+                ).values_list("user_id", flat=True)
+            ),
+            [self.user.pk],
+        )
+        self.assertFalse(
+            PartyUserRole.objects.holders(self.first, Role.OWNER, self.end).exists()
+        )
+
+    def test_implied_roles(self) -> None:
+        resolver = RoleResolver(self.user.pk, self.start)
+        self.assertEqual(
+            resolver.roles_on(self.first), {Role.OWNER, Role.SIGNATORY, Role.VIEWER}
+        )
+        self.assertEqual(resolver.roles_on(self.second), {Role.SIGNATORY, Role.VIEWER})
+        self.assertFalse(resolver.can_act_as(self.second, Role.OWNER))
+        self.assertEqual(resolver.roles_on(self.third), frozenset())
+
+    def test_one_lookup_per_user(self) -> None:
+        with self.assertNumQueries(1):
+            resolver = RoleResolver(self.user.pk, self.start)
+            resolver.can_act_as(self.first, Role.OWNER)
+            resolver.can_act_as(self.second, Role.VIEWER)
+        with self.assertNumQueries(0):
+            # Another request: the rows come from the cache.
+            self.assertTrue(
+                RoleResolver(self.user.pk, self.start).can_act_as(
+                    self.first, Role.VIEWER
+                )
+            )
+            self.assertFalse(RoleResolver(None).can_act_as(self.first, Role.VIEWER))
+
+    def test_grant_invalidates_cached_rows(self) -> None:
+        RoleResolver(self.user.pk, self.start).roles_on(self.third)
+        self.grant(self.third, Role.SIGNATORY, valid_from=self.start)
+        self.assertTrue(
+            RoleResolver(self.user.pk, self.start).can_act_as(self.third, Role.VIEWER)
+        )
+
+    async def test_async_resolver(self) -> None:
+        resolver = RoleResolver(self.user.pk, self.start)
+        self.assertTrue(await resolver.acan_act_as(self.first, Role.SIGNATORY))
+        self.assertFalse(await resolver.acan_act_as(self.third, Role.VIEWER))
+
+
+class PartyBootstrapTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        maintain_partitions(ahead=1, retention_months=1200)
+        super().setUpClass()
+
+    def setUp(self) -> None:
+        get_tiered_cache.cache_clear()
+        get_party_bootstrapper.cache_clear()
+        self.addCleanup(get_party_bootstrapper.cache_clear)
+
+    def use_mode(self, mode: str, batch_size: int = 1000) -> None:
+        get_party_bootstrapper.cache_clear()
+        settings = override_settings(
+            PARTY_BOOTSTRAP={"MODE": mode, "BATCH_SIZE": batch_size}
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def create_users(self, first: int, count: int) -> list[User]:
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                return [create_user(first + number) for number in range(count)]
+
+    def snapshot(self, users: list[User]) -> list[tuple]:
+        """What each user ended up with, in a form both modes can share."""
+        rows = []
+        for user in users:
+            roles = PartyUserRole.objects.filter(user=user).select_related("party")
+            rows.append(
+                (
+                    sorted(
+                        (
+                            role.party.party_type,
+                            role.role,
+                            role.is_active,
+                            role.valid_to,
+                            role.party.partyuserrole_set.count(),
+                        )
+                        for role in roles
+                    ),
+                    SecurityEvent.objects.filter(
+                        user=user, event_type=SecurityEvent.EventType.ROLE_GRANTED
+                    ).count(),
+                    RoleResolver(user.pk).can_act_as(roles[0].party, Role.OWNER),
+                )
+            )
+        return rows
+
+    def test_modes_produce_the_same_parties_and_roles(self) -> None:
+        self.use_mode("immediate")
+        immediate = self.snapshot(self.create_users(0, 3))
+        self.use_mode("deferred")
+        deferred = self.snapshot(self.create_users(10, 3))
+
+        self.assertEqual(
+            immediate,
+            [([(Party.PartyType.INDIVIDUAL, Role.OWNER, True, None, 1)], 1, True)] * 3,
+        )
+        self.assertEqual(deferred, immediate)
+        self.assertEqual(Party.objects.count(), 6)
+
+    def test_deferred_mode_waits_for_commit(self) -> None:
+        self.use_mode("deferred")
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            with transaction.atomic():
+                create_user()
+        self.assertFalse(Party.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(PartyUserRole.objects.count(), 1)
+
+    def test_deferred_mode_batches_a_transaction(self) -> None:
+        self.use_mode("deferred", batch_size=2)
+        with mock.patch(
+            "core_apps.user_profile.tasks.bootstrap_parties.delay"
+        ) as delay:
+            users = self.create_users(0, 3)
+        self.assertEqual(
+            [batch for (batch,), _ in delay.call_args_list],
+            [[str(users[0].pk), str(users[1].pk)], [str(users[2].pk)]],
+        )
+
+    def test_deferred_mode_forgets_rolled_back_users(self) -> None:
+        self.use_mode("deferred")
+        with mock.patch(
+            "core_apps.user_profile.tasks.bootstrap_parties.delay"
+        ) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    with transaction.atomic():
+                        create_user(0)
+                        transaction.set_rollback(True)
+                    kept = create_user(1)
+        delay.assert_called_once_with([str(kept.pk)])
@@ -3,5 +3,11 @@
 set -o errexit
 set -o nounset
 
-exec watchfiles --filter python celery.__main__.main \ 
-    --args '-A config.celery_app worker -l INFO' 
\ No newline at end of file
+# Each worker service in local.yml drains its own queues with its own
+# concurrency and prefetch; see CELERY_TASK_QUEUES in the settings.
+exec watchfiles --filter python celery.__main__.main \
+    --args "-A config.celery_app worker -l INFO -O fair \
+    -n ${CELERY_WORKER_NAME:-default}@%h \
+    -Q ${CELERY_WORKER_QUEUES:-default} \
+    -c ${CELERY_WORKER_CONCURRENCY:-4} \
+    --prefetch-multiplier ${CELERY_WORKER_PREFETCH_MULTIPLIER:-4}"
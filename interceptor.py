@@ -1,22 +1,321 @@
+import json
 import logging
+import logging.config
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+import zipfile
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Optional
 
 from loguru import logger
 
+WARNING_NO = logging.WARNING
+
 
 class InterceptHandler(logging.Handler):
-    def emit(self, record):
-        try:
-            level = logger.level(record.levelname).name
+    """Forwards stdlib records to loguru, attributed to the original caller.
+
+    Level names are resolved once (``logger.level`` takes loguru's lock) and
+    only the logging module's own frames are skipped, so a record costs a
+    few frame hops on top of loguru itself.
+    """
 
-        except ValueError:
-            level = record.levelno
+    _levels: dict[str, Any] = {}
 
-        frame, depth = logging.currentframe(), 2
+    def emit(self, record: logging.LogRecord) -> None:
+        level = self._levels.get(record.levelname)
+        if level is None:
+            try:
+                level = logger.level(record.levelname).name
+            except ValueError:
+                level = record.levelno
+            self._levels[record.levelname] = level
 
-        while frame.f_code == logging.__file__:
+        frame, depth = sys._getframe(1), 1
+        while frame is not None and frame.f_code.co_filename == logging.__file__:
             frame = frame.f_back
             depth += 1
 
         logger.opt(depth=depth, exception=record.exc_info).log(
             level, record.getMessage()
         )
+
+
+class _Rule:
+    def __init__(self, sample_rate: float, rate_limit: Optional[float]) -> None:
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self.tokens = rate_limit or 0.0
+        self.refilled_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return False
+        if self.rate_limit is None:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.rate_limit,
+                self.tokens + (now - self.refilled_at) * self.rate_limit,
+            )
+            self.refilled_at = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class LogSampler:
+    """Loguru filter that thins out records below WARNING from noisy modules.
+
+    ``sample_rates`` keeps that fraction of a module's records and
+    ``rate_limits`` caps them per second; both are keyed by module prefix
+    and the longest matching prefix wins. Warnings and errors always pass,
+    as does anything outside ``max_level`` when it is set.
+    """
+
+    def __init__(
+        self,
+        sample_rates: dict[str, float],
+        rate_limits: dict[str, float],
+        max_level: Optional[int] = None,
+    ) -> None:
+        self.max_level = max_level
+        self._prefixes = {
+            prefix: _Rule(sample_rates.get(prefix, 1.0), rate_limits.get(prefix))
+            for prefix in {*sample_rates, *rate_limits}
+        }
+        self._rules: dict[str, Optional[_Rule]] = {}
+
+    def _rule(self, name: str) -> Optional[_Rule]:
+        try:
+            return self._rules[name]
+        except KeyError:
+            pass
+        matches = [
+            prefix
+            for prefix in self._prefixes
+            if name == prefix or name.startswith(prefix + ".")
+        ]
+        rule = self._prefixes[max(matches, key=len)] if matches else None
+        self._rules[name] = rule
+        return rule
+
+    def __call__(self, record: dict) -> bool:
+        level = record["level"].no
+        if self.max_level is not None and level > self.max_level:
+            return False
+        if level >= WARNING_NO:
+            return True
+        rule = self._rule(record["name"] or "")
+        return rule is None or rule.allow()
+
+
+def json_line(record: dict) -> str:
+    """One JSON object per line with the fields worth indexing."""
+    entry = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "name": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+        "process": record["process"].id,
+        "thread": record["thread"].name,
+    }
+    extra = {key: value for key, value in record["extra"].items() if key != "json"}
+    if extra:
+        entry["extra"] = extra
+    if record["exception"] is not None:
+        exc_type, exc_value, exc_traceback = record["exception"]
+        entry["exception"] = {
+            "type": getattr(exc_type, "__name__", None),
+            "value": str(exc_value),
+            "traceback": "".join(traceback.format_tb(exc_traceback)),
+        }
+    return json.dumps(entry, default=str) + "\n"
+
+
+def json_format(record: dict) -> str:
+    record["extra"]["json"] = json_line(record)
+    # Loguru formats the returned template; the JSON goes in verbatim.
+    return "{extra[json]}"
+
+
+class QueuedFileSink:
+    """Loguru sink that hands formatted records to a writer thread.
+
+    ``write`` only appends to an in-process deque; the thread writes what
+    has piled up every ``flush_interval`` seconds in a single call, then
+    rotates and zips the file past ``rotation_bytes`` and prunes archives
+    older than ``retention_days``. With ``render`` the raw record is queued
+    and rendered on the writer thread too, so JSON encoding is also kept
+    off the caller. Loguru's own ``enqueue`` is not used: it pickles every
+    record into a multiprocessing pipe, which costs more on the calling
+    thread than writing the line directly. Past ``max_queued`` records (a
+    stalled disk) new ones are dropped and counted.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        rotation_bytes: int,
+        retention_days: int,
+        flush_interval: float = 0.2,
+        max_queued: int = 100_000,
+        render: Optional[Callable[[dict], str]] = None,
+    ) -> None:
+        self.path = Path(path)
+        self.render = render
+        self.rotation_bytes = rotation_bytes
+        self.retention_days = retention_days
+        self.flush_interval = flush_interval
+        self.max_queued = max_queued
+        self._reset()
+        # The writer thread does not survive a fork; the child starts its own.
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._queue: deque[Any] = deque()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._dropped = 0
+
+    def write(self, message: Any) -> None:
+        if len(self._queue) >= self.max_queued:
+            self._dropped += 1
+            return
+        self._queue.append(message if self.render is None else message.record)
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="log-writer", daemon=True
+                    )
+                    self._thread.start()
+
+    def flush(self) -> None:
+        """Write out what is queued now, leaving the file open."""
+        self._drain()
+
+    def stop(self) -> None:
+        # Called by logger.remove(), including loguru's own at exit.
+        self._drain()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            try:
+                self._drain()
+            except Exception as e:
+                sys.stderr.write(f"Log writer for {self.path} failed: {e!r}\n")
+
+    def _drain(self) -> None:
+        with self._lock:
+            batch = []
+            while self._queue:
+                item = self._queue.popleft()
+                batch.append(item if self.render is None else self.render(item))
+            if self._dropped:
+                batch.append(f"[log-writer dropped {self._dropped} records]\n")
+                self._dropped = 0
+            if not batch:
+                return
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf8")
+            self._file.write("".join(batch))
+            self._file.flush()
+            if self._file.tell() >= self.rotation_bytes:
+                self._rotate()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._file = None
+        rotated = self.path.with_name(
+            f"{self.path.stem}.{datetime.now():%Y-%m-%d_%H-%M-%S_%f}{self.path.suffix}"
+        )
+        os.replace(self.path, rotated)
+        with zipfile.ZipFile(f"{rotated}.zip", "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.write(rotated, rotated.name)
+        rotated.unlink()
+
+        cutoff = time.time() - self.retention_days * 86400
+        pattern = f"{self.path.stem}.*{self.path.suffix}.zip"
+        for archive in self.path.parent.glob(pattern):
+            if archive.stat().st_mtime < cutoff:
+                archive.unlink()
+
+
+TEXT_FORMAT = "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}"
+
+
+def build_loguru_handlers(config: dict, logs_dir: Path) -> list[dict]:
+    """Loguru handlers for ``LOG_PIPELINE``.
+
+    In "async" mode each file gets a ``QueuedFileSink``, so file writes,
+    rotation and compression never run on the logging thread.
+    """
+    as_json = config["FORMAT"] == "json"
+    suffix = "jsonl" if as_json else "log"
+
+    def sink(name: str) -> dict:
+        path = logs_dir / f"{name}.{suffix}"
+        if config["MODE"] == "async":
+            return {
+                "sink": QueuedFileSink(
+                    path,
+                    rotation_bytes=10_000_000,
+                    retention_days=30,
+                    render=json_line if as_json else None,
+                ),
+                # The record itself is rendered by the sink's thread.
+                "format": "{message}" if as_json else TEXT_FORMAT,
+            }
+        return {
+            "sink": path,
+            "format": json_format if as_json else TEXT_FORMAT,
+            "rotation": "10MB",
+            "retention": "30 days",
+            "compression": "zip",
+        }
+
+    return [
+        {
+            **sink("debug"),
+            "level": config["LEVEL"],
+            "filter": LogSampler(
+                config["SAMPLING"], config["RATE_LIMITS"], max_level=WARNING_NO
+            ),
+        },
+        {
+            **sink("error"),
+            "level": "ERROR",
+            "backtrace": True,
+            "diagnose": config["DIAGNOSE"],
+        },
+    ]
+
+
+def configure_logging(config: dict, logs_dir: Path, stdlib_config: dict) -> None:
+    """Install the ``LOG_PIPELINE`` handlers and route the logging module
+    through them with ``stdlib_config`` (the ``LOGGING`` setting)."""
+    try:
+        logger.configure(handlers=build_loguru_handlers(config, logs_dir))
+    except PermissionError:
+        # Fallback to console logging if file logging fails
+        logger.configure(handlers=[{"level": "INFO", "sink": sys.stderr}])
+    logging.config.dictConfig(stdlib_config)